@@ -6,15 +6,33 @@ from pkg import pymysql
 import time
 import datetime
 from pkg.pymysqlreplication import BinLogStreamReader
+from pkg.pymysqlreplication.event import XidEvent, GtidEvent, FormatDescriptionEvent
+from pkg.pymysqlreplication.binlogfile import (
+    BinLogFileReader,
+    binlog_files,
+    first_event_timestamp,
+    seek_timestamp,
+)
+from pkg.pymysqlreplication.schema import SchemaSnapshot, SchemaCache
+from pkg.pymysqlreplication.prefetch import StageStats
 from binlog2sql_util import (
     PY_VERSION,
     command_line_args,
     is_dml_event,
     is_ddl_event,
     generate_sql,
+    generate_row_insert,
     type_convert,
-    print_line,
+    bisect_binlog_files,
+    OfflineCursor,
+    ENCODERS,
 )
+from binlog2sql_output import OutputSink, SinkWriter
+from binlog2sql_parallel import process_binlog_parallel
+from binlog2sql_flashback import FlashbackBuffer
+from binlog2sql_batch import InsertBatch
+from binlog2sql_checkpoint import Checkpoint
+import functools
 import json
 import logging
 import os
@@ -23,17 +41,46 @@ class Binlog2sql(object):
     def __init__(self, connection_settings, start_file=None, stop_file=None, start_position=None, stop_position=None,
                  start_time=None, stop_time=None, databases=None, tables=None, no_pk=False,
                  flashback=False, stop_never=False, output_file=None, only_dml=False, sql_type=None, json=False,
-                 debug=False,logger=None):
+                 debug=False,logger=None, output_buffer=None, flush_interval=1.0, fsync=False,
+                 binlog_path=None, schema_snapshot=None, parallel=1, flashback_buffer=None, slave_uuid=None,
+                 schema_cache=None, literal_values=False, batch_insert=None, where='row', pipeline=0,
+                 checkpoint=None, resume=False, start_gtid=None, include_gtids=None, exclude_gtids=None,
+                 verify_checksum=True):
         """
         conn_setting: {'host': 127.0.0.1, 'port': 3306, 'user': user, 'passwd': passwd, 'charset': 'utf8'}
+        binlog_path: read local binlog files or directories instead of the binlog of mysql server
+        schema_snapshot: table schema file of --dump-schema, used with binlog_path instead of mysql server
+        parallel: decode binlog files with this many worker processes
+        flashback_buffer: bytes of undo sql kept in memory before spilling to disk
+        slave_uuid: @slave_uuid of the binlog dump connection
+        schema_cache: file keeping table columns across runs, see SchemaCache
+        literal_values: decode DECIMAL and DATETIME values straight to their sql text, JSON values to their json text
+        batch_insert: merge up to this many consecutive INSERTs into one table of a transaction, see InsertBatch
+        where: 'row' compares every column in the WHERE of UPDATE and DELETE, 'pk' the primary or a unique key
+        pipeline: read packets and write sql in threads of their own, with queues of this many items, 0 for none
+        checkpoint: file to save the binlog position and output size in at the end of transactions, see Checkpoint
+        resume: start at the position of checkpoint instead of start_file and start_position, if it has one
+        start_gtid: GTID set executed already, read the binlog of mysql server from the first transaction not in it
+        include_gtids: only decode the transactions in this GTID set
+        exclude_gtids: skip the transactions in this GTID set
+        verify_checksum: check the CRC32 checksum of the events of binlog_path files, if they have one
         """
         self.logger = logger
         connection_settings.update({'charset': 'utf8'})
         self.conn_setting = connection_settings
 
+        self.checkpoint, self.resume = checkpoint, resume
+        resumed = False
+        if checkpoint and resume:
+            last = Checkpoint(checkpoint)
+            if last.log_file:
+                # the stop of the interval is kept, the latest binlog unless given
+                start_file, start_position, resumed = last.log_file, last.log_pos, True
+                self.logger.info('resume from %s:%s of checkpoint %s' % (start_file, start_position, checkpoint))
+
         # interval filter
         self.start_file = start_file or None
-        self.stop_file = stop_file or self.start_file
+        self.stop_file = stop_file or (None if resumed else self.start_file)
         self.start_position = start_position or 4  # use binlog v4
         self.stop_position = stop_position
 
@@ -57,7 +104,41 @@ class Binlog2sql(object):
         self.no_pk, self.flashback, self.stop_never, self.output_file, self.json, self.debug = (
             no_pk, flashback, stop_never, output_file, json, debug
         )
+        self.output_buffer, self.flush_interval, self.fsync = output_buffer, flush_interval, fsync
+        self.flashback_buffer, self.slave_uuid, self.schema_cache = flashback_buffer, slave_uuid, schema_cache
+        self.binlog_path, self.schema_snapshot, self.parallel = binlog_path, schema_snapshot, parallel or 1
+        self.literal_values, self.batch_insert, self.where = literal_values, batch_insert, where or 'row'
+        self.pipeline = pipeline or 0
+        # a resumed run starts at the position of the checkpoint
+        self.start_gtid = None if resumed else start_gtid or None
+        self.include_gtids, self.exclude_gtids = include_gtids or None, exclude_gtids or None
+        self.verify_checksum = verify_checksum
         self.py_version = PY_VERSION
+
+        if self.binlog_path:
+            # local binlog files, mysql server is only needed for table schema
+            self.connection = None if self.schema_snapshot else pymysql.connect(**self.conn_setting)
+            self.log_files = binlog_files(self.binlog_path)
+            names = [os.path.basename(f) for f in self.log_files]
+            if not names:
+                error = 'parameter error: no binlog file in %s' % self.binlog_path
+                self.logger.error(error)
+                raise ValueError(error)
+            self.start_file = self.start_file or names[0]
+            self.stop_file = stop_file or (start_file and not resumed and self.start_file) or names[-1]
+            for name in (self.start_file, self.stop_file):
+                if name not in names:
+                    error = 'parameter error: binlog file %s not in %s' % (name, self.binlog_path)
+                    self.logger.error(error)
+                    raise ValueError(error)
+            self.log_files = self.log_files[names.index(self.start_file):names.index(self.stop_file) + 1]
+            self.binlog_files = [os.path.basename(f) for f in self.log_files]
+            if not self.stop_position:
+                self.stop_position = os.path.getsize(self.log_files[-1])
+            if start_time and not start_position:
+                self.seek_start_time()
+            return
+
         self.connection = pymysql.connect(**self.conn_setting)
 
         with self.connection as cursor:
@@ -65,7 +146,7 @@ class Binlog2sql(object):
             rows = cursor.fetchall()
             if self.start_file:
                 for row in rows:
-                    if self.start_file <= row[0] <= self.stop_file:
+                    if self.start_file <= row[0] <= (self.stop_file or row[0]):
                         stop_file, stop_position = row
                 if stop_file:
                     self.stop_file, self.stop_position = stop_file, stop_position
@@ -76,6 +157,7 @@ class Binlog2sql(object):
             else:
                 self.stop_file, self.stop_position = rows[-1]
                 self.start_file = self.stop_file
+            self.binlog_files = [row[0] for row in rows if self.start_file <= row[0] <= self.stop_file]
 
             cursor.execute("SELECT @@server_id")
             self.server_id = cursor.fetchone()[0]
@@ -84,7 +166,46 @@ class Binlog2sql(object):
                 self.logger.error(error)
                 raise ValueError(error)
 
-    def process_binlog(self):
+        if start_time and not start_position:
+            self.seek_start_time()
+
+    def first_event_timestamp(self, index):
+        """Timestamp of the first event in self.binlog_files[index]"""
+        if self.binlog_path:
+            return first_event_timestamp(self.log_files[index])
+        stream = BinLogStreamReader(connection_settings=self.conn_setting, server_id=self.server_id,
+                                    log_file=self.binlog_files[index], log_pos=4, resume_stream=True,
+                                    only_events=[FormatDescriptionEvent], slave_uuid=self.slave_uuid)
+        try:
+            binlog_event = stream.fetchone()
+        finally:
+            stream.close()
+        return binlog_event.timestamp if binlog_event else 0
+
+    def seek_start_time(self):
+        """Skip binlog files and, for local files, events older than start_time.
+
+        Binlog files are opened in time order, so the file holding start_time is the
+        last one opened before it, found by binary search over the timestamp of the
+        first event of each file. Local files are then walked header by header to
+        the transaction holding start_time. Binlog of mysql server has no index to
+        seek by time inside a file, so reading starts from the beginning of the file.
+        """
+        index = bisect_binlog_files(len(self.binlog_files), self.start_time, self.first_event_timestamp)
+        self.binlog_files = self.binlog_files[index:]
+        self.start_file = self.binlog_files[0]
+        if self.binlog_path:
+            self.log_files = self.log_files[index:]
+            self.start_position = seek_timestamp(self.log_files[0], self.start_time)
+            if self.start_file == self.stop_file:
+                self.start_position = min(self.start_position, self.stop_position)
+        self.logger.info('seek to %s:%s for start_time %s' % (self.start_file, self.start_position,
+                                                                datetime.datetime.fromtimestamp(self.start_time)))
+
+    def process_binlog(self, sink=None):
+        """
+        sink: OutputSink to write sql to, default: stdout and output_file
+        """
         start_time = time.time()
         config = {}
         total_row = 0
@@ -105,17 +226,60 @@ class Binlog2sql(object):
         self.logger.info(config)
         if self.debug:
             return
-        stream = BinLogStreamReader(connection_settings=self.conn_setting, server_id=self.server_id,
-                                    log_file=self.start_file, log_pos=self.start_position,
-                                    only_schemas=self.only_schemas, only_tables=self.tables, resume_stream=True,
-                                    blocking=True, skip_to_timestamp=self.start_time)
-        with self.connection as cursor:
+        checkpoint = None
+        if self.checkpoint:
+            # the GTID set of the checkpoint includes the transactions skipped by --start-gtid
+            checkpoint = Checkpoint(self.checkpoint, load=self.resume, gtid_set=self.start_gtid)
+            # sql of a transaction written in part by the last run is written again
+            if checkpoint.log_file and self.output_file and not checkpoint.rewind(self.output_file):
+                self.logger.warning('output file %s is not the one of checkpoint %s, not truncated' %
+                                    (self.output_file, self.checkpoint))
+        if sink is None:
+            sink = OutputSink(self.output_file, buffer_size=self.output_buffer, flush_interval=self.flush_interval,
+                              fsync=self.fsync)
+        if self.pipeline:
+            # the writer stage, packets are read ahead by BinLogStreamReader
+            sink = SinkWriter(sink, self.pipeline)
+        if self.parallel > 1 and len(self.binlog_files) > 1:
+            return process_binlog_parallel(self, sink)
+
+        # columns of a table are fetched once, not again after every binlog rotation
+        schema_cache = SchemaCache(self.schema_cache)
+        if self.binlog_path:
+            stream = BinLogFileReader(self.log_files, ctl_connection_settings=self.conn_setting,
+                                      schema_snapshot=self.schema_snapshot and SchemaSnapshot.load(self.schema_snapshot),
+                                      log_pos=self.start_position, only_schemas=self.only_schemas,
+                                      only_tables=self.tables, skip_to_timestamp=self.start_time,
+                                      schema_cache=schema_cache, literal_values=self.literal_values,
+                                      include_gtids=self.include_gtids, exclude_gtids=self.exclude_gtids,
+                                      verify_checksum=self.verify_checksum)
+        else:
+            stream = BinLogStreamReader(connection_settings=self.conn_setting, server_id=self.server_id,
+                                        log_file=self.start_file, log_pos=self.start_position,
+                                        only_schemas=self.only_schemas, only_tables=self.tables, resume_stream=True,
+                                        blocking=True, skip_to_timestamp=self.start_time,
+                                        slave_uuid=self.slave_uuid, schema_cache=schema_cache,
+                                        literal_values=self.literal_values, prefetch=self.pipeline,
+                                        auto_position=self.start_gtid, include_gtids=self.include_gtids,
+                                        exclude_gtids=self.exclude_gtids)
+        if self.connection:
+            self.connection.encoders.update(ENCODERS)
+        with (self.connection or OfflineCursor()) as cursor, sink, FlashbackBuffer(self.flashback_buffer) as undo, \
+                schema_cache:
+            # undo sql is applied newest first
+            output = undo if self.flashback else sink
+            batch = None
+            if self.batch_insert and self.batch_insert > 1:
+                # the undo rows of a multi-row INSERT are reversed with it
+                output = batch = InsertBatch(output, self.batch_insert, reverse=self.flashback)
             #sql = '# {0} #\n# {1} binlog2sql start! #\n# {2} #'.format('=' * 50, datetime.datetime.now(), '=' * 50)
             sql = '# binlog2sql start...'
             self.logger.info(sql)
             #print_line(sql, self.output_file)
 
             start_pos, print_interval, print_time = 4, 60 * 10, 0
+            commit_time = time.time()
+            decode_start = time.time()
             for binlog_event in stream:
                 total_row +=1
                 if (print_time + print_interval) < binlog_event.timestamp < self.start_time:
@@ -132,7 +296,7 @@ class Binlog2sql(object):
                 event_type = is_dml_event(binlog_event)
                 if event_type in self.sql_type:
                     filter_row +=1
-                    for row in binlog_event.rows:
+                    for row in binlog_event.iter_rows():
                         if event_type == 'INSERT':
                             if self.flashback:
                                 dml['delete'] +=1
@@ -145,43 +309,92 @@ class Binlog2sql(object):
                                 dml['delete'] += 1
                         if event_type == 'UPDATE':
                             dml['update'] +=1
-                        if self.json:
+                        # with literal_values JSON values are json text already
+                        if self.json and not self.literal_values:
                             for column in binlog_event.columns:
                                 if column.type == 245:
                                     for k, v in row.items():
                                         row[k][column.name] = json.dumps(type_convert(v[column.name]),
                                                                          ensure_ascii=False)
+                        insert = batch and generate_row_insert(cursor, binlog_event, row, flashback=self.flashback,
+                                                               no_pk=self.no_pk)
+                        if insert:
+                            batch.add(insert[0], insert[1], start_pos, binlog_event.packet.log_pos,
+                                      binlog_event.timestamp)
+                            continue
                         sql = generate_sql(cursor=cursor, binlog_event=binlog_event, no_pk=self.no_pk, row=row,
-                                           e_start_pos=start_pos, flashback=self.flashback)
-                        print_line(sql, self.output_file)
+                                           e_start_pos=start_pos, flashback=self.flashback, where=self.where)
+                        output.write(sql)
                 # ddl
                 elif is_ddl_event(binlog_event):
+                    # multi-row INSERTs do not span transactions
+                    if batch is not None:
+                        batch.flush()
                     start_pos = binlog_event.packet.log_pos
                     if not self.only_dml and binlog_event.query != 'BEGIN':
                         filter_row += 1
                         ddl +=1
                         sql = generate_sql(cursor=cursor, binlog_event=binlog_event, no_pk=self.no_pk,
                                            e_start_pos=start_pos, flashback=self.flashback)
-                        print_line(sql, self.output_file)
+                        output.write(sql)
+                elif isinstance(binlog_event, XidEvent):
+                    if batch is not None:
+                        batch.flush()
+                    if self.stop_never:
+                        # when tailing, the next event may come much later than flush_interval
+                        sink.flush()
+                elif isinstance(binlog_event, GtidEvent) and checkpoint is not None:
+                    checkpoint.begin(binlog_event.gtid)
+
+                # DDL and COMMIT of non-transactional tables end a transaction without XidEvent
+                if checkpoint is not None and (isinstance(binlog_event, XidEvent) or (
+                        is_ddl_event(binlog_event) and binlog_event.query != 'BEGIN')):
+                    sink.mark(functools.partial(checkpoint.save, checkpoint.end(stream.log_file, stream.log_pos)))
+                    # at most one checkpoint per flush_interval
+                    if time.time() - commit_time >= (self.flush_interval or 0):
+                        # a checkpoint past a DDL must not keep the columns it changed in the cache file
+                        if schema_cache.invalidated:
+                            schema_cache.save()
+                        sink.commit()
+                        commit_time = time.time()
 
                 # exceed the end position of the end binlog file
-                if stream.log_file == self.stop_file and (
-                        binlog_event.packet.log_pos >= self.stop_position or binlog_event.timestamp >= self.stop_time
-                ) and not self.stop_never:
-                    res = {
-                        "total_rows":total_row,
-                        "filter_rows":filter_row,
-                        "DML":dml,
-                        "DDL":ddl,
-                        "cost_time":time.time()-start_time
-                    }
-                    self.logger.info(res)
+                if not self.stop_never and (
+                        (stream.log_file, stream.log_pos) >= (self.stop_file, self.stop_position) or
+                        (stream.log_file == self.stop_file and binlog_event.timestamp >= self.stop_time)
+                ):
                     #sql = '# {0} #\n# {1} binlog2sql stop!  #\n# {2} #'.format('=' * 50, datetime.datetime.now(), '=' * 50)
                     sql = '# binlog2sql stop!'
                     self.logger.info(sql)
                     #print_line(sql, self.output_file)
                     break
             stream.close()
+            if checkpoint is not None:
+                schema_cache.save()
+                sink.commit()
+            if batch is not None:
+                batch.flush()
+            if self.flashback:
+                for sql in undo:
+                    sink.write(sql)
+            decode_time = time.time() - decode_start
+        res = {
+            "total_rows":total_row,
+            "filter_rows":filter_row,
+            "DML":dml,
+            "DDL":ddl,
+            "cost_time":time.time()-start_time
+        }
+        if self.pipeline:
+            decode = StageStats()
+            decode.items = total_row
+            decode.waited = sink.blocked + getattr(stream, 'prefetch_waited', 0.0)
+            decode.busy = decode_time - decode.waited
+            res['pipeline'] = {'decode': decode.report(), 'write': sink.stats.report()}
+            if not self.binlog_path:
+                res['pipeline']['read'] = stream.prefetch_stats.report()
+        self.logger.info(res)
+        return res
 
 
 if __name__ == '__main__':
@@ -199,6 +412,9 @@ if __name__ == '__main__':
     logger.addHandler(handler)
     
     conn_setting = {'host': args.host, 'port': args.port, 'user': args.user, 'passwd': args.password}
+    if args.dump_schema:
+        SchemaSnapshot.dump(conn_setting, only_schemas=args.databases, only_tables=args.tables).save(args.dump_schema)
+        sys.exit(0)
     binlog2sql = Binlog2sql(connection_settings=conn_setting, start_file=args.start_file, stop_file=args.stop_file,
                             start_position=args.start_position, stop_position=args.stop_position,
                             start_time=args.start_time,
@@ -207,7 +423,15 @@ if __name__ == '__main__':
                             only_dml=args.only_dml, sql_type=args.sql_type,
                             no_pk=args.no_pk, flashback=args.flashback, stop_never=args.stop_never,
                             output_file=args.output_file, json=args.json,
-                            debug=args.debug,logger=logger)
+                            debug=args.debug,logger=logger, output_buffer=args.output_buffer,
+                            flush_interval=args.flush_interval, fsync=args.fsync,
+                            binlog_path=args.binlog_path, schema_snapshot=args.schema_snapshot,
+                            parallel=args.parallel, flashback_buffer=args.flashback_buffer,
+                            schema_cache=args.schema_cache, literal_values=args.literal_values,
+                            batch_insert=args.batch_insert, where=args.where, pipeline=args.pipeline,
+                            checkpoint=args.checkpoint, resume=args.resume, start_gtid=args.start_gtid,
+                            include_gtids=args.include_gtids, exclude_gtids=args.exclude_gtids,
+                            verify_checksum=args.verify_checksum)
     binlog2sql.process_binlog()
 
     # conn_setting = {'host': '127.0.0.1', 'port': 3306, 'user': 'root', 'passwd': '123100'}
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+from pkg.pymysql.cursors import Cursor
+from binlog2sql_util import position_comment
+
+# bytes of a multi-row INSERT at most, the limit of pymysql executemany
+MAX_STATEMENT_LENGTH = Cursor.max_stmt_length
+
+
+class InsertBatch(object):
+    """Merge consecutive INSERTs into one table into multi-row INSERTs.
+
+    A row comes as the head of its INSERT, 'INSERT INTO ... VALUES ', and
+    its (...) values. Rows of the same head go to one statement of at most
+    `rows` rows and `max_length` bytes; any other statement written through
+    the batch ends it, and so does flush at the end of a transaction. The
+    comment of a statement gives the binlog positions from its first row to
+    its last one and how many rows it has.
+    """
+
+    def __init__(self, output, rows, max_length=MAX_STATEMENT_LENGTH, reverse=False):
+        """
+        output: writer of the statements, OutputSink or FlashbackBuffer
+        rows: rows of a statement at most
+        reverse: write the rows of a statement last one first, as FlashbackBuffer reverses the undo sql
+        """
+        self.output = output
+        self.rows = rows
+        self.max_length = max_length
+        self.reverse = reverse
+        self._head = None
+        self._values = []
+        self._length = 0
+        self._start_pos = self._end_pos = self._timestamp = None
+
+    @staticmethod
+    def _size(text):
+        if sys.version_info[0] >= 3:
+            return len(text.encode('utf-8'))
+        return len(text)
+
+    def add(self, head, values, start_pos, end_pos, timestamp):
+        """Add the row of values to the statement of head, at start_pos and end_pos of the binlog"""
+        size = self._size(values)
+        if self._head is not None and (
+                head != self._head or len(self._values) >= self.rows or
+                self._length + len(', ') + size + len(';') > self.max_length):
+            self.flush()
+        if self._head is None:
+            self._head = head
+            self._length = self._size(head)
+            self._start_pos, self._timestamp = start_pos, timestamp
+        else:
+            self._length += len(', ')
+        self._values.append(values)
+        self._length += size
+        self._end_pos = end_pos
+
+    def write(self, line):
+        self.flush()
+        self.output.write(line)
+
+    def flush(self):
+        """Write the statement of the rows added so far"""
+        if self._head is None:
+            return
+        values = self._values
+        if self.reverse:
+            values.reverse()
+        sql = self._head + ', '.join(values) + ';' + position_comment(self._start_pos, self._end_pos, self._timestamp)
+        if len(values) > 1:
+            sql += ' rows %d' % len(values)
+        self._head = None
+        self._values = []
+        self._length = 0
+        self.output.write(sql)
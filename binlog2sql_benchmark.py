@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Benchmarks for binlog2sql hot paths, no mysql server needed.
+#
+# shell> python binlog2sql_benchmark.py output -n 200000
+# shell> python binlog2sql_benchmark.py rows -n 20000
+# shell> python binlog2sql_benchmark.py numeric -n 20000
+# shell> python binlog2sql_benchmark.py sparse -n 20000
+# shell> python binlog2sql_benchmark.py decimal -n 20000
+# shell> python binlog2sql_benchmark.py temporal -n 20000
+# shell> python binlog2sql_benchmark.py json -n 20000
+# shell> python binlog2sql_benchmark.py sql -n 20000
+# shell> python binlog2sql_benchmark.py filter -n 200000
+# shell> python binlog2sql_benchmark.py skip -n 200000
+# shell> python binlog2sql_benchmark.py packet -n 100000
+#
+
+from __future__ import print_function
+import os
+import sys
+import time
+import shutil
+import socket
+import struct
+import binascii
+import threading
+import argparse
+import tempfile
+from binlog2sql_util import print_line
+from binlog2sql_output import OutputSink
+
+SAMPLE_SQL = "INSERT INTO `test`.`tbl`(`id`, `name`, `amount`) VALUES (1, 'binlog2sql', 3.14); " \
+             "#start 4 end 388 time 2019-04-07 10:00:00"
+
+
+def report(name, count, cost, unit='statements'):
+    print('%-30s %10d %s %8.3fs %12.0f %s/sec' % (name, count, unit, cost, count / cost, unit),
+          file=sys.stderr)
+
+
+def bench_output(count):
+    """per-line open/append print_line vs buffered OutputSink"""
+    tmp_dir = tempfile.mkdtemp()
+    devnull = open(os.devnull, 'w')
+    stdout, sys.stdout = sys.stdout, devnull
+    try:
+        output_file = os.path.join(tmp_dir, 'print_line.sql')
+        start = time.time()
+        for _ in range(count):
+            print_line(SAMPLE_SQL, output_file)
+        report('print_line', count, time.time() - start)
+
+        output_file = os.path.join(tmp_dir, 'sink.sql')
+        start = time.time()
+        with OutputSink(output_file) as sink:
+            for _ in range(count):
+                sink.write(SAMPLE_SQL)
+        report('OutputSink', count, time.time() - start)
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+        shutil.rmtree(tmp_dir)
+
+
+# (FIELD_TYPE, COLUMN_TYPE, table map metadata, packed value) of one group of columns in the wide table
+WIDE_COLUMNS = [
+    (3, 'int(11)', b'', struct.pack('<i', -42)),
+    (8, 'bigint(20) unsigned', b'', struct.pack('<Q', 2 ** 40)),
+    (2, 'smallint(6)', b'', struct.pack('<h', 7)),
+    (5, 'double', struct.pack('<B', 8), struct.pack('<d', 3.14)),
+    (15, 'varchar(50)', struct.pack('<H', 150), struct.pack('<B', 10) + b'binlog2sql'),
+    (18, 'datetime', struct.pack('<B', 0),
+     struct.pack('>Q', 1 << 39 | (2019 * 13 + 4) << 22 | 7 << 17 | 10 << 12 | 30 << 6 | 15)[3:]),
+    (246, 'decimal(10,2)', struct.pack('<BB', 10, 2), b'\x80\x00\x00\x7b\x2d'),
+]
+WIDE_GROUPS = 4
+NUMERIC_COLUMNS = [
+    (3, 'int(11)', b'', struct.pack('<i', -42)),
+    (8, 'bigint(20) unsigned', b'', struct.pack('<Q', 2 ** 40)),
+    (5, 'double', struct.pack('<B', 8), struct.pack('<d', 3.14)),
+    (17, 'timestamp', struct.pack('<B', 0), struct.pack('>i', 1554602400)),
+    (2, 'smallint(6)', b'', struct.pack('<h', 7)),
+]
+
+# DECIMAL(20,6) 12345678901234.005678, groups of 3, 4 and 3 bytes
+LEDGER_COLUMNS = [(8, 'bigint(20) unsigned', b'', struct.pack('<Q', 2 ** 40))] + [
+    (246, 'decimal(20,6)', struct.pack('<BB', 20, 6),
+     struct.pack('>I', 0x800000 | 12345)[1:] + struct.pack('>I', 678901234) + struct.pack('>I', 5678)[1:]),
+] * 12
+
+DATETIME2 = 1 << 39 | (2019 * 13 + 4) << 22 | 7 << 17 | 10 << 12 | 30 << 6 | 15
+TEMPORAL_COLUMNS = [(8, 'bigint(20) unsigned', b'', struct.pack('<Q', 2 ** 40))] + [
+    (18, 'datetime', struct.pack('<B', 0), struct.pack('>Q', DATETIME2)[3:]),
+    (18, 'datetime(6)', struct.pack('<B', 6), struct.pack('>Q', DATETIME2)[3:] + struct.pack('>I', 123456)[1:]),
+    (19, 'time(3)', struct.pack('<B', 3), struct.pack('>I', 0x800000 | 12 << 12 | 34 << 6 | 56)[1:] +
+     struct.pack('>h', 1230)),
+    (17, 'timestamp(3)', struct.pack('<B', 3), struct.pack('>ih', 1554602400, 1230)),
+] * 3
+
+# {"id": 42, "name": "binlog2sql", "tags": ["mysql", "binlog", "json"], "price": 3.14, "ok": true,
+#  "owner": {"id": 7, "email": "dba@example.com"}} in the binary JSON format
+JSON_DOCUMENT = binascii.unhexlify(
+    b'0006009f002e0002003000040034000400380005003d0002003f000500052a000c4400024f000b6e0004010000760069'
+    b'646e616d657461677370726963656f6b6f776e65720a62696e6c6f673273716c03001f000c0d000c13000c1a00056d79'
+    b'73716c0662696e6c6f67046a736f6e1f85eb51b81e09400200290012000200140005000507000c19006964656d61696c'
+    b'0f646261406578616d706c652e636f6d')
+JSON_COLUMNS = [(8, 'bigint(20) unsigned', b'', struct.pack('<Q', 2 ** 40))] + [
+    (245, 'json', struct.pack('<B', 4), struct.pack('<I', len(JSON_DOCUMENT)) + JSON_DOCUMENT),
+] * 4
+
+
+def binlog_event(event_type, body, timestamp=1554602400):
+    return b'\x00' + struct.pack('<IBIIIH', timestamp, event_type, 1, 19 + len(body), 0, 0) + body
+
+
+def write_binlog(path, events):
+    """A binlog file of FormatDescriptionEvent and the packets of binlog_event, without their OK byte"""
+    format_description = binlog_event(0x0f, struct.pack('<H', 4) + b'5.7.26-log'.ljust(50, b'\x00') +
+                                      struct.pack('<IB', 0, 19) + b'\x00' * 39)
+    with open(path, 'wb') as f:
+        f.write(b'\xfebin' + format_description[1:])
+        for event in events:
+            f.write(event[1:])
+
+
+def table_events(columns, nulls, table_id=1, table=b'wide'):
+    """TableMapEvent and WriteRowsEvent packets of a table of `columns`, one row per set of NULL column indexes"""
+    n = len(columns)
+    bitmap = b'\xff' * ((n + 7) // 8)
+    table_map = struct.pack('<Q', table_id)[:6] + struct.pack('<H', 1) + b'\x04test\x00'
+    table_map += struct.pack('<B', len(table)) + table + b'\x00'
+    table_map += struct.pack('<B', n) + struct.pack('<%dB' % n, *[c[0] for c in columns])
+    metadata = b''.join(c[2] for c in columns)
+    table_map += struct.pack('<B', len(metadata)) + metadata + bitmap
+    rows = []
+    for null in nulls:
+        null_bitmap = bytearray((n + 7) // 8)
+        for i in null:
+            null_bitmap[i // 8] |= 1 << (i % 8)
+        rows.append(bytes(null_bitmap) + b''.join(c[3] for i, c in enumerate(columns) if i not in null))
+    rows = struct.pack('<Q', table_id)[:6] + struct.pack('<HHB', 1, 2, n) + bitmap + b''.join(rows)
+    schema = [{'COLUMN_NAME': 'c%d' % i, 'COLLATION_NAME': 'utf8_general_ci' if c[0] == 15 else None,
+               'CHARACTER_SET_NAME': 'utf8' if c[0] == 15 else None, 'COLUMN_COMMENT': '',
+               'COLUMN_TYPE': c[1], 'COLUMN_KEY': 'PRI' if i == 0 else '', 'ORDINAL_POSITION': i + 1}
+              for i, c in enumerate(columns)]
+    return binlog_event(0x13, table_map), binlog_event(0x1e, rows), schema
+
+
+def wide_table_events(count, table_id=1, table=b'wide'):
+    """`count` rows of a table of WIDE_GROUPS * 7 columns, the varchar of the last group is NULL"""
+    columns = WIDE_COLUMNS * WIDE_GROUPS
+    return table_events(columns, [set([len(columns) - 3])] * count, table_id, table)
+
+
+def bench_rows(count, events=wide_table_events, literal_values=False):
+    """decode rows of a wide table"""
+    from pkg.pymysqlreplication.packet import BinLogPacketWrapper
+    from pkg.pymysqlreplication.row_event import TableMapEvent, WriteRowsEvent
+    from pkg.pymysqlreplication.schema import SchemaSnapshot
+
+    table_map_packet, rows_packet, schema = events(count)
+    snapshot = SchemaSnapshot({'test': {'wide': schema}})
+    allowed_events = frozenset([TableMapEvent, WriteRowsEvent])
+
+    def wrap(packet, table_map):
+        return BinLogPacketWrapper(Packet(packet), table_map, snapshot, False, allowed_events,
+                                   None, None, None, None, False, False, literal_values).event
+
+    table_map = {}
+    table_map[1] = wrap(table_map_packet, table_map).get_table()
+    start = time.time()
+    event = wrap(rows_packet, table_map)
+    rows = event.rows
+    report('%d columns%s' % (len(schema), ' as literals' if literal_values else ''), len(rows),
+           time.time() - start, 'rows')
+    return event
+
+
+def bench_numeric(count):
+    """decode rows of a table of fixed width columns, a NULL in every fourth row"""
+    columns = NUMERIC_COLUMNS * WIDE_GROUPS
+    bench_rows(count, lambda count: table_events(columns, [set([1]) if i % 4 == 0 else set() for i in range(count)]))
+
+
+def bench_sparse(count):
+    """decode rows of a wide table, half of the columns are NULL in one of 16 patterns"""
+    columns = WIDE_COLUMNS * WIDE_GROUPS
+    patterns = [set(i for i in range(1, len(columns)) if (i + p) % 4 < 2) for p in range(4)]
+    patterns = [pattern | set([p + 1]) for pattern in patterns for p in range(4)]
+    bench_rows(count, lambda count: table_events(columns, [patterns[i % len(patterns)] for i in range(count)]))
+
+
+def bench_decimal(count):
+    """decode rows of a table of DECIMAL(20,6) columns, as Decimal and as sql text"""
+    for literal_values in (False, True):
+        bench_rows(count, lambda count: table_events(LEDGER_COLUMNS, [set()] * count), literal_values)
+
+
+def bench_temporal(count):
+    """decode rows of a table of DATETIME2, TIME2 and TIMESTAMP2 columns, as datetime and as sql text"""
+    for literal_values in (False, True):
+        bench_rows(count, lambda count: table_events(TEMPORAL_COLUMNS, [set()] * count), literal_values)
+
+
+def bench_json(count):
+    """decode rows of a table of JSON columns and dump them to json text as --json does, and as json text"""
+    import json
+    from binlog2sql_util import type_convert
+
+    events = lambda count: table_events(JSON_COLUMNS, [set()] * count)
+    rows = bench_rows(count, events).rows
+    start = time.time()
+    for row in rows:
+        values = row['values']
+        for name in values:
+            values[name] = json.dumps(type_convert(values[name]), ensure_ascii=False)
+    report('--json json.dumps', len(rows), time.time() - start, 'rows')
+    bench_rows(count, events, True)
+
+
+def bench_sql(count):
+    """generate the INSERT and the flashback DELETE of decoded rows of a wide table"""
+    from binlog2sql_util import generate_sql, OfflineCursor
+
+    event = bench_rows(count)
+    cursor = OfflineCursor()
+    for flashback in (False, True):
+        start = time.time()
+        for row in event.rows:
+            generate_sql(cursor, event, row, 4, flashback)
+        report('%s sql' % ('DELETE' if flashback else 'INSERT'), len(event.rows), time.time() - start)
+
+
+def bench_filter(count):
+    """read a local binlog with --tables, 95% of the events belong to another table"""
+    from pkg.pymysqlreplication.binlogfile import BinLogFileReader
+    from pkg.pymysqlreplication.row_event import WriteRowsEvent
+    from pkg.pymysqlreplication.schema import SchemaSnapshot
+
+    other = wide_table_events(1, 1, b'other')
+    wide = wide_table_events(1, 2, b'wide')
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, 'mysql-bin.000001')
+        write_binlog(path, (event for i in range(count // 2) for event in (wide if i % 20 == 0 else other)[:2]))
+        snapshot = SchemaSnapshot({'test': {'wide': wide[2], 'other': other[2]}})
+        start = time.time()
+        stream = BinLogFileReader(path, schema_snapshot=snapshot, only_tables=['wide'], only_events=[WriteRowsEvent])
+        rows = sum(len(event.rows) for event in stream)
+        report('%d rows of wide' % rows, count // 2 * 2, time.time() - start, 'events')
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def bench_skip(count):
+    """read a local binlog with skip_to_timestamp, 99% of the events are older"""
+    from pkg.pymysqlreplication.binlogfile import BinLogFileReader
+    from pkg.pymysqlreplication.row_event import WriteRowsEvent
+    from pkg.pymysqlreplication.schema import SchemaSnapshot
+
+    table_map, rows, schema = wide_table_events(1)
+    timestamp = 1554602400
+
+    def events():
+        for i in range(count // 2):
+            ts = timestamp + (1 if i >= count // 2 * 99 // 100 else 0)
+            yield binlog_event(0x13, table_map[20:], ts)
+            yield binlog_event(0x1e, rows[20:], ts)
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, 'mysql-bin.000001')
+        write_binlog(path, events())
+        start = time.time()
+        stream = BinLogFileReader(path, schema_snapshot=SchemaSnapshot({'test': {'wide': schema}}),
+                                  skip_to_timestamp=timestamp + 1, only_events=[WriteRowsEvent])
+        rows = sum(len(event.rows) for event in stream)
+        report('%d rows after timestamp' % rows, count // 2 * 2, time.time() - start, 'events')
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def bench_packet(count):
+    """receive 64 MB events through a local socket pair, one per 25000 of count"""
+    from pkg.pymysql import connections
+
+    events = max(1, count // 25000)
+    payload = b'\x00' + b'x' * (64 * 1024 * 1024 - 1)
+    chunks = []
+    for seq, start in enumerate(range(0, len(payload) + 1, connections.MAX_PACKET_LEN)):
+        chunk = payload[start:start + connections.MAX_PACKET_LEN]
+        chunks.append(struct.pack('<HBB', len(chunk) & 0xffff, len(chunk) >> 16, seq) + chunk)
+    server, client = socket.socketpair()
+    connection = connections.Connection(defer_connect=True)
+    connection._sock, connection._sock_timeout = client, client.gettimeout()
+    connection._rfile = connections._makefile(client, 'rb')
+
+    def send():
+        for _ in range(events):
+            for chunk in chunks:
+                server.sendall(chunk)
+    sender = threading.Thread(target=send)
+    sender.daemon = True
+    try:
+        start = time.time()
+        sender.start()
+        for _ in range(events):
+            connection._next_seq_id = 0
+            assert len(connection._read_packet().get_all_data()) == len(payload)
+        report('64 MB packets', events, time.time() - start, 'events')
+    finally:
+        server.close()
+        client.close()
+
+
+class Packet(object):
+    """The part of pymysql MysqlPacket BinLogPacketWrapper reads from"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def get_all_data(self):
+        return self.data
+
+
+BENCHMARKS = {
+    'output': bench_output,
+    'rows': bench_rows,
+    'numeric': bench_numeric,
+    'sparse': bench_sparse,
+    'decimal': bench_decimal,
+    'temporal': bench_temporal,
+    'json': bench_json,
+    'sql': bench_sql,
+    'filter': bench_filter,
+    'skip': bench_skip,
+    'packet': bench_packet,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='binlog2sql benchmarks')
+    parser.add_argument('cases', nargs='*', default=sorted(BENCHMARKS), help='%s' % ', '.join(sorted(BENCHMARKS)))
+    parser.add_argument('-n', '--number', dest='number', type=int, default=100000, help='statements per case')
+    args = parser.parse_args()
+    for case in args.cases:
+        BENCHMARKS[case](args.number)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import json
+import tempfile
+from pkg.pymysqlreplication.gtid import Gtid, GtidSet
+
+
+class Checkpoint(object):
+    """Where the sql written out ends in the binlog, kept in a file across runs.
+
+    A checkpoint is taken at the end of a transaction, its XidEvent or the
+    QueryEvent of a DDL or of a non-transactional COMMIT, once the sql
+    written so far is flushed and fsynced. It holds the binlog file and
+    position after the transaction, the GTID set executed up to it and the
+    size of the output file. A resumed run truncates the output file to that
+    size, dropping the sql of a transaction the last run wrote only in part,
+    and reads the binlog from that position, so every transaction is written
+    once. The file is replaced in one step, a crash keeps the previous
+    checkpoint.
+
+    File format (json):
+        {"log_file": "mysql-bin.000003", "log_pos": 1234, "gtid_set": "sid:1-100",
+         "output_file": "backup.sql", "output_offset": 56789}
+    """
+
+    def __init__(self, path, load=True, gtid_set=None):
+        """
+        path: checkpoint file
+        load: start from the checkpoint in path if there is one, else from an empty one
+        gtid_set: GTID set executed before the first transaction read, when the checkpoint is not loaded
+        """
+        self.path = path
+        self.log_file = self.log_pos = None
+        self.output_file = self.output_offset = None
+        self.gtid_set = GtidSet(gtid_set or None)
+        # gtid of the transaction being read
+        self._gtid = None
+        if load and os.path.exists(path):
+            with io.open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.log_file, self.log_pos = data['log_file'], data['log_pos']
+            self.output_file, self.output_offset = data.get('output_file'), data.get('output_offset')
+            self.gtid_set = GtidSet(data.get('gtid_set') or None)
+
+    def begin(self, gtid):
+        """Start the transaction of gtid, of a GtidEvent"""
+        self._gtid = gtid
+
+    def end(self, log_file, log_pos):
+        """End the transaction read so far at log_pos of log_file, return the
+        state to save once its sql is written out"""
+        if self._gtid is not None:
+            gtid = Gtid(self._gtid)
+            if gtid not in self.gtid_set:
+                self.gtid_set.merge_gtid(gtid)
+            self._gtid = None
+        return {'log_file': log_file, 'log_pos': log_pos, 'gtid_set': str(self.gtid_set)}
+
+    def save(self, state, output_file=None, output_offset=None):
+        """Save state of end() with the output file and its size, see OutputSink.commit"""
+        data = dict(state, output_file=output_file and os.path.abspath(output_file), output_offset=output_offset)
+        text = json.dumps(data, ensure_ascii=False, sort_keys=True)
+        if not isinstance(text, type(u'')):
+            text = text.decode('utf-8')
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)))
+        with io.open(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        getattr(os, 'replace', os.rename)(tmp, self.path)
+
+    def rewind(self, output_file):
+        """Truncate output_file to the size it had at the checkpoint.
+
+        Return False when output_file is not the output file of the checkpoint
+        or is shorter than it was, then it is left alone.
+        """
+        if not output_file or not self.output_file or self.output_offset is None:
+            return False
+        if os.path.abspath(output_file) != os.path.abspath(self.output_file) or \
+                not os.path.exists(output_file) or os.path.getsize(output_file) < self.output_offset:
+            return False
+        with open(output_file, 'r+b') as f:
+            f.truncate(self.output_offset)
+            os.fsync(f.fileno())
+        return True
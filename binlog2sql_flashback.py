@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import shutil
+import tempfile
+
+DEFAULT_MEMORY_LIMIT = 16 * 1024 * 1024  # 16M
+
+
+class FlashbackBuffer(object):
+    """Reverse the order of undo sql, spilling to disk.
+
+    Lines are kept in memory up to `memory_limit` bytes, then written to a chunk
+    file in reverse order. Reading starts from the lines still in memory and goes
+    through the chunk files from the newest one, so the last statement comes first
+    and no more than one chunk is in memory at a time.
+    """
+
+    def __init__(self, memory_limit=DEFAULT_MEMORY_LIMIT, tmp_dir=None):
+        """
+        memory_limit: bytes of sql kept in memory, also the size of a chunk file
+        tmp_dir: directory for chunk files, default: tempfile.gettempdir()
+        """
+        self.memory_limit = memory_limit if memory_limit and memory_limit > 0 else DEFAULT_MEMORY_LIMIT
+        self.tmp_dir = tmp_dir
+        self.chunks = []
+        self._lines = []
+        self._size = 0
+        self._chunk_dir = None
+
+    def write(self, line):
+        if not isinstance(line, bytes):
+            line = line.encode('utf-8')
+        self._lines.append(line)
+        self._size += len(line) + 1
+        if self._size >= self.memory_limit:
+            self._spill()
+
+    def _spill(self):
+        if self._chunk_dir is None:
+            self._chunk_dir = tempfile.mkdtemp(prefix='binlog2sql-flashback-', dir=self.tmp_dir)
+        path = os.path.join(self._chunk_dir, '%08d.sql' % len(self.chunks))
+        self._lines.reverse()
+        with open(path, 'wb') as f:
+            f.write(b'\n'.join(self._lines))
+            f.write(b'\n')
+        self.chunks.append(path)
+        self._lines = []
+        self._size = 0
+
+    def __iter__(self):
+        """Yield lines newest first, chunk files are removed once read"""
+        while self._lines:
+            yield self._decode(self._lines.pop())
+        self._size = 0
+        while self.chunks:
+            path = self.chunks.pop()
+            with open(path, 'rb') as f:
+                for line in f:
+                    yield self._decode(line[:-1])
+            os.remove(path)
+
+    @staticmethod
+    def _decode(line):
+        if sys.version_info[0] >= 3:
+            return line.decode('utf-8')
+        return line
+
+    def close(self):
+        self._lines = []
+        self.chunks = []
+        if self._chunk_dir:
+            shutil.rmtree(self._chunk_dir, ignore_errors=True)
+            self._chunk_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
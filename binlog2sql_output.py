@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import io
+import os
+import sys
+import time
+import platform
+import threading
+from operator import methodcaller
+from binlog2sql_util import PY3PLUS
+from pkg.pymysqlreplication.prefetch import StageStats
+
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024  # 1M
+DEFAULT_FLUSH_INTERVAL = 1.0  # seconds
+# lines handed to the writer thread of SinkWriter at once
+WRITER_BATCH = 256
+
+
+class OutputSink(object):
+    """Buffered writer for generated sql.
+
+    Lines are kept in memory and written out in one chunk once `buffer_size` bytes
+    are pending or `flush_interval` seconds passed since the last flush. The output
+    file is opened once and kept open until close().
+
+    mark() notes the end of a transaction after the lines written so far, and
+    commit() makes the output durable up to the last mark before saving it,
+    see Checkpoint.
+    """
+
+    def __init__(self, output_file=None, stdout=True, buffer_size=DEFAULT_BUFFER_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, fsync=False):
+        """
+        output_file: append sql to this file, None means no file
+        stdout: print sql to stdout as well
+        buffer_size: flush when pending data reaches this many bytes
+        flush_interval: flush when the oldest pending line is older than this many seconds
+        fsync: fsync output file on every flush
+        """
+        self.output_file = output_file or None
+        self.stdout = stdout
+        self.buffer_size = buffer_size if buffer_size and buffer_size > 0 else DEFAULT_BUFFER_SIZE
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+
+        self._lines = []
+        self._pending = 0
+        self._last_flush = time.time()
+        self._file = None
+        # size of the output file after the last flush
+        self._size = 0
+        # (save, pending lines) of the last mark, (save, size of the output file) once flushed
+        self._mark = self._marked = None
+        # windows cmd(gbk)
+        self._gbk = not PY3PLUS and platform.system() == 'Windows'
+
+        if self.output_file:
+            if PY3PLUS:
+                self._file = io.open(self.output_file, 'a', encoding='utf-8', buffering=self.buffer_size)
+            else:
+                self._file = open(self.output_file, 'a', self.buffer_size)
+            self._size = os.fstat(self._file.fileno()).st_size
+
+    def write(self, line):
+        self._lines.append(line)
+        self._pending += len(line) + 1
+        if self._pending >= self.buffer_size:
+            self.flush()
+        elif self.flush_interval is not None and time.time() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.time()
+        if self._mark is not None:
+            save, count = self._mark
+            self._marked = (save, self._offset(count))
+            self._mark = None
+        if not self._lines:
+            return
+        self._lines.append('')
+        chunk = '\n'.join(self._lines)
+        self._lines = []
+        self._pending = 0
+
+        if self.stdout:
+            if self._gbk:
+                sys.stdout.write(chunk.decode('utf-8').encode('gbk'))
+            else:
+                sys.stdout.write(chunk)
+            sys.stdout.flush()
+        if self._file:
+            self._file.write(chunk)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._size = os.fstat(self._file.fileno()).st_size
+
+    def _offset(self, count):
+        """Size of the output file once the first count pending lines are written"""
+        if self._file is None:
+            return None
+        if not count:
+            return self._size
+        text = '\n'.join(self._lines[:count]) + '\n'
+        return self._size + len(text.encode('utf-8') if PY3PLUS else text)
+
+    def sync(self):
+        """Flush pending lines and fsync the output file"""
+        self.flush()
+        if self._file:
+            os.fsync(self._file.fileno())
+
+    def mark(self, save):
+        """End a transaction after the lines written so far, commit calls save(output_file, its size there)"""
+        self._mark = (save, len(self._lines))
+
+    def commit(self):
+        """Flush pending lines, fsync the output file and save the last mark"""
+        self.sync()
+        if self._marked is not None:
+            save, size = self._marked
+            self._marked = None
+            save(self.output_file, size)
+
+    def close(self):
+        if self._file is None and not self._lines:
+            return
+        try:
+            self.flush()
+            if self._file and self.fsync:
+                os.fsync(self._file.fileno())
+        finally:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class SinkWriter(object):
+    """Write lines to a sink, OutputSink, in a thread.
+
+    Lines go to the thread in batches of WRITER_BATCH through a queue of
+    queue_size batches; write blocks while the queue is full, so a slow
+    output holds the producer back instead of piling up in memory. The
+    thread writes the lines in the order they came, and passes on flush,
+    mark and commit after the lines written before them. An error of the
+    sink is raised by the next write, flush or close.
+
+    stats counts the lines written, the seconds in the sink and the seconds
+    waiting for lines, blocked the seconds write waited for room.
+    """
+
+    def __init__(self, sink, queue_size):
+        self.sink = sink
+        self.queue = Queue(max(queue_size, 1))
+        self.stats = StageStats()
+        self.blocked = 0.0
+        self._lines = []
+        # (save, lines) of the last mark in self._lines
+        self._mark = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='binlog2sql-writer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        stats = self.stats
+        while True:
+            start = time.time()
+            item = self.queue.get()
+            got = time.time()
+            stats.waited += got - start
+            if item is None:
+                return
+            if self._error is not None:
+                # keep draining, the producer raises the error
+                continue
+            lines, mark, then = item
+            try:
+                count = len(lines) if mark is None else mark[1]
+                for line in lines[:count]:
+                    self.sink.write(line)
+                if mark is not None:
+                    self.sink.mark(mark[0])
+                    for line in lines[count:]:
+                        self.sink.write(line)
+                if then is not None:
+                    then(self.sink)
+            except Exception as error:
+                self._error = error
+            stats.items += len(lines)
+            stats.busy += time.time() - got
+
+    def _put(self, then):
+        if self._error is not None:
+            raise self._error
+        start = time.time()
+        self.queue.put((self._lines, self._mark, then))
+        self.blocked += time.time() - start
+        self._lines = []
+        self._mark = None
+
+    def write(self, line):
+        self._lines.append(line)
+        if len(self._lines) >= WRITER_BATCH:
+            self._put(None)
+
+    def flush(self):
+        self._put(methodcaller('flush'))
+
+    def mark(self, save):
+        self._mark = (save, len(self._lines))
+
+    def commit(self):
+        self._put(methodcaller('commit'))
+
+    def close(self):
+        if self._thread is None:
+            return
+        try:
+            if self._error is None:
+                self._put(None)
+        finally:
+            self.queue.put(None)
+            self._thread.join()
+            self._thread = None
+            self.sink.close()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
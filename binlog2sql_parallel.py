@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import time
+import uuid
+import shutil
+import logging
+import tempfile
+import multiprocessing
+from binlog2sql_util import PY3PLUS
+from binlog2sql_output import OutputSink
+
+
+def format_time(timestamp):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+
+
+def decode_file(task):
+    """Worker: decode one binlog file into a temporary sql file, return the stats of process_binlog"""
+    from binlog2sql import Binlog2sql
+
+    task = dict(task)
+    output_file = task.pop('output_file')
+    logger = logging.getLogger(task.pop('logger_name'))
+    binlog2sql = Binlog2sql(logger=logger, **task)
+    return binlog2sql.process_binlog(sink=OutputSink(output_file, stdout=False, flush_interval=None))
+
+
+def file_tasks(binlog2sql, tmp_dir):
+    """One Binlog2sql setting per binlog file; the first file keeps start_position, the last one stop_position
+    and stop_time, just as they work in a serial run"""
+    tasks = []
+    files = binlog2sql.binlog_files
+    for i, name in enumerate(files):
+        first, last = i == 0, i == len(files) - 1
+        tasks.append({
+            'connection_settings': dict(binlog2sql.conn_setting),
+            'start_file': name,
+            'stop_file': name,
+            'start_position': binlog2sql.start_position if first else None,
+            'stop_position': binlog2sql.stop_position if last else None,
+            'start_time': format_time(binlog2sql.start_time),
+            'stop_time': format_time(binlog2sql.stop_time) if last else None,
+            'databases': binlog2sql.only_schemas,
+            'tables': binlog2sql.tables,
+            'no_pk': binlog2sql.no_pk,
+            'flashback': binlog2sql.flashback,
+            'flashback_buffer': binlog2sql.flashback_buffer,
+            'only_dml': binlog2sql.only_dml,
+            'sql_type': binlog2sql.sql_type,
+            'json': binlog2sql.json,
+            'binlog_path': binlog2sql.binlog_path and [binlog2sql.log_files[i]],
+            'schema_snapshot': binlog2sql.schema_snapshot,
+            'verify_checksum': binlog2sql.verify_checksum,
+            'schema_cache': binlog2sql.schema_cache,
+            'literal_values': binlog2sql.literal_values,
+            'batch_insert': binlog2sql.batch_insert,
+            'where': binlog2sql.where,
+            'pipeline': binlog2sql.pipeline,
+            # a transaction does not span binlog files
+            'include_gtids': binlog2sql.include_gtids,
+            'exclude_gtids': binlog2sql.exclude_gtids,
+            # mysql kills the other dump threads of the same server_id unless they have different slave_uuid
+            'slave_uuid': str(uuid.uuid4()),
+            'output_file': os.path.join(tmp_dir, name + '.sql'),
+            'logger_name': binlog2sql.logger.name,
+        })
+    return tasks
+
+
+def merge_stats(total, stats):
+    for k, v in stats.items():
+        if isinstance(v, dict):
+            merge_stats(total.setdefault(k, {}), v)
+        elif k != 'cost_time':
+            total[k] = total.get(k, 0) + v
+    return total
+
+
+def copy_output(output_file, sink):
+    if PY3PLUS:
+        f = io.open(output_file, encoding='utf-8')
+    else:
+        f = open(output_file)
+    with f:
+        for line in f:
+            sink.write(line.rstrip('\n'))
+    os.remove(output_file)
+
+
+def process_binlog_parallel(binlog2sql, sink):
+    """Decode binlog files in binlog2sql.parallel worker processes.
+
+    Every binlog file starts with a FormatDescriptionEvent and its own table
+    map, so files are decoded independently. Workers write to temporary files
+    and the sql is copied to sink file by file in binlog order. At most
+    2 * parallel files are decoded ahead of the file being copied, which
+    bounds the reorder buffer.
+
+    With flashback every worker reverses its own file, and the files are
+    copied from the last one after all of them are decoded.
+    """
+    start_time = time.time()
+    tmp_dir = tempfile.mkdtemp(prefix='binlog2sql-')
+    pool = multiprocessing.Pool(binlog2sql.parallel)
+    window = binlog2sql.parallel * 2
+    tasks = file_tasks(binlog2sql, tmp_dir)
+    pending = []
+    decoded = []
+    res = {}
+    try:
+        with sink:
+            for i, task in enumerate(tasks):
+                pending.append((task, pool.apply_async(decode_file, (task,))))
+                while pending and (len(pending) >= window or i == len(tasks) - 1):
+                    task, result = pending.pop(0)
+                    merge_stats(res, result.get())
+                    if binlog2sql.flashback:
+                        decoded.insert(0, task['output_file'])
+                    else:
+                        copy_output(task['output_file'], sink)
+            for output_file in decoded:
+                copy_output(output_file, sink)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    res['cost_time'] = time.time() - start_time
+    binlog2sql.logger.info(res)
+    return res
+
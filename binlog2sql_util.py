@@ -7,16 +7,34 @@ import platform
 import argparse
 import datetime
 import getpass
+from collections import OrderedDict
 from pkg.pymysqlreplication.row_event import WriteRowsEvent,UpdateRowsEvent,DeleteRowsEvent
 from pkg.pymysqlreplication.event import QueryEvent
+from pkg.pymysqlreplication.gtid import GtidSet
+from pkg.pymysqlreplication.constants import FIELD_TYPE
+from pkg.pymysqlreplication.decoder import Literal
+from pkg.pymysql.converters import escape_item, escape_object, encoders, escape_string, escape_float, \
+    escape_datetime, escape_date, escape_timedelta
 
 PY_VERSION = platform.python_version()
 
+# values read with literal_values are sql text already
+ENCODERS = dict(encoders)
+ENCODERS[Literal] = escape_object
+
 if PY_VERSION > '3':
     PY3PLUS = True
 else:
     PY3PLUS = False
 
+# statement builders kept at the same time by a cursor
+MAX_STATEMENT_BUILDERS = 1024
+
+INTEGER_TYPES = frozenset([FIELD_TYPE.TINY, FIELD_TYPE.SHORT, FIELD_TYPE.LONG, FIELD_TYPE.LONGLONG,
+                           FIELD_TYPE.INT24, FIELD_TYPE.YEAR])
+DATETIME_TYPES = frozenset([FIELD_TYPE.DATETIME, FIELD_TYPE.DATETIME2, FIELD_TYPE.TIMESTAMP, FIELD_TYPE.TIMESTAMP2])
+STRING_TYPES = frozenset([FIELD_TYPE.VARCHAR, FIELD_TYPE.STRING, FIELD_TYPE.BLOB])
+
 
 def parse_args():
     """parse args for binlog2sql"""
@@ -40,11 +58,29 @@ def parse_args():
                           help="Stop position. default: latest position of '--stop-file'")
     interval.add_argument('--start-time', dest='start_time', type=str, help="Start time. format yyyy-MM-dd[ hh:mm:ss]")
     interval.add_argument('--stop-time', dest='stop_time', type=str, help="Stop Time. format yyyy-MM-dd[ hh:mm:ss]")
+    interval.add_argument('--start-gtid', dest='start_gtid', type=str,
+                          help='GTID set executed already, read the binlog of mysql server from the first '
+                               'transaction not in it instead of --start-file and --start-position')
+    interval.add_argument('--include-gtids', dest='include_gtids', type=str,
+                          help='Only parse the transactions in this GTID set, e.g. uuid:1-100,uuid2:7')
+    interval.add_argument('--exclude-gtids', dest='exclude_gtids', type=str,
+                          help='Skip the transactions in this GTID set')
+    interval.add_argument('--binlog-path', dest='binlog_path', type=str, nargs='*',
+                          help='Local binlog files or directories to parse instead of the binlog of mysql server')
+    interval.add_argument('--no-verify-checksum', dest='verify_checksum', action='store_false', default=True,
+                          help='Do not check the CRC32 checksum of the events of --binlog-path files')
 
     # schema filter
     schema = parser.add_argument_group('schema filter')
     schema.add_argument('-d', '--databases', dest='databases', type=str, nargs='*', help='dbs you want to process')
     schema.add_argument('-t', '--tables', dest='tables', type=str, nargs='*', help='tables you want to process')
+    schema.add_argument('--schema-snapshot', dest='schema_snapshot', type=str,
+                        help='Table schema file written by --dump-schema, used with --binlog-path without mysql server')
+    schema.add_argument('--dump-schema', dest='dump_schema', type=str,
+                        help='Write table schema of mysql server to file and exit')
+    schema.add_argument('--schema-cache', dest='schema_cache', type=str,
+                        help='Keep table schema fetched from mysql server in this file across runs, '
+                             'DDL in binlog invalidates the changed tables')
 
     # type filter
     event = parser.add_argument_group('type filter')
@@ -59,9 +95,38 @@ def parse_args():
                           help='Generate insert sql without primary key if exists', default=False)
     optional.add_argument('-B', '--flashback', dest='flashback', action='store_true',
                           help='Flashback data to start_position of start_file', default=False)
+    optional.add_argument('--flashback-buffer', dest='flashback_buffer', type=int, default=16 * 1024 * 1024,
+                          help='Bytes of undo sql kept in memory for --flashback, the rest spills to disk. '
+                               'default: 16777216')
     optional.add_argument('--stop-never', dest='stop_never', action='store_true', default=False,
                           help="Continuously parse binlog. default: stop at the latest event when you start.")
+    optional.add_argument('--checkpoint', dest='checkpoint', type=str,
+                          help='Save the binlog position, executed GTID set and output file size in this file at '
+                               'the end of transactions, at most every --flush-interval seconds')
+    optional.add_argument('--resume', dest='resume', action='store_true', default=False,
+                          help='Start at the position of --checkpoint instead of --start-file and --start-position, '
+                               'truncating --output-file to the size it had there')
     optional.add_argument('--output-file', dest='output_file', default='', help='Write SQL to output file')
+    optional.add_argument('--output-buffer', dest='output_buffer', type=int, default=1024 * 1024,
+                          help='Output buffer size in bytes. default: 1048576')
+    optional.add_argument('--flush-interval', dest='flush_interval', type=float, default=1.0,
+                          help='Flush output at least every N seconds. default: 1')
+    optional.add_argument('--fsync', dest='fsync', action='store_true', default=False,
+                          help='fsync output file on every flush')
+    optional.add_argument('--parallel', dest='parallel', type=int, default=1,
+                          help='Decode binlog files in N processes, output keeps binlog order. default: 1')
+    optional.add_argument('--literal-values', dest='literal_values', action='store_true', default=False,
+                          help='Decode DECIMAL and DATETIME values straight to their sql text, '
+                               'JSON values to their json text, without Decimal, datetime and dict objects')
+    optional.add_argument('--batch-insert', dest='batch_insert', type=int, default=0,
+                          help='Merge up to N consecutive INSERTs into one table of a transaction into a multi-row '
+                               'INSERT. default: 0, an INSERT per row')
+    optional.add_argument('--where', dest='where', choices=['row', 'pk'], default='row',
+                          help='WHERE of UPDATE and DELETE: row compares every column, pk only the primary key or '
+                               'a unique key, every column when the table has none. default: row')
+    optional.add_argument('--pipeline', dest='pipeline', type=int, default=0,
+                          help='Read binlog packets from mysql server and write sql in threads of their own, '
+                               'with queues of N packets and N batches of sql. default: 0, all in one thread')
     optional.add_argument('--json', dest='json', action='store_true', default=False,
                           help='Support MySQL 5.7 JSON type')
     optional.add_argument('--help', dest='help', action='store_true', help='help information', default=False)
@@ -78,6 +143,18 @@ def command_line_args(args):
         sys.exit(1)
     if args.flashback and args.stop_never:
         raise ValueError('Only one of flashback or stop-never can be True')
+    if args.parallel > 1 and args.stop_never:
+        raise ValueError('Only one of parallel or stop-never can be set')
+    if args.resume and not args.checkpoint:
+        raise ValueError('resume needs checkpoint')
+    if args.checkpoint and (args.flashback or args.parallel > 1):
+        raise ValueError('checkpoint cannot be used with flashback or parallel')
+    if args.start_gtid and (args.binlog_path or args.parallel > 1):
+        raise ValueError('start-gtid cannot be used with binlog-path or parallel')
+    for gtid_set in (args.start_gtid, args.include_gtids, args.exclude_gtids):
+        if gtid_set:
+            # raises ValueError on a malformed set
+            GtidSet(gtid_set)
     if args.flashback and args.no_pk:
         raise ValueError('Only one of flashback or no_pk can be True')
     if args.flashback and not args.only_dml:
@@ -85,7 +162,9 @@ def command_line_args(args):
     if (args.start_time and not is_valid_datetime(args.start_time)) or \
             (args.stop_time and not is_valid_datetime(args.stop_time)):
         raise ValueError('Incorrect datetime argument')
-    if not args.password or not args.password[0]:
+    if args.binlog_path and args.schema_snapshot:
+        args.password = ''
+    elif not args.password or not args.password[0]:
         args.password = getpass.getpass()
     else:
         args.password = args.password[0]
@@ -100,6 +179,22 @@ def is_valid_datetime(string):
         return False
 
 
+def bisect_binlog_files(count, timestamp, first_timestamp):
+    """Index of the last binlog file opened before timestamp, 0 if there is none.
+
+    first_timestamp(i) returns the timestamp of the first event of file i, it is
+    called O(log(count)) times.
+    """
+    lo, hi = 0, count - 1
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if first_timestamp(mid) < timestamp:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
 def compare_items(items):
     # caution: if v is NULL, may need to process
     (k, v) = items
@@ -141,22 +236,187 @@ def is_ddl_event(event):
         return False
 
 
-def generate_sql(cursor, binlog_event, row=None, e_start_pos=None, flashback=False, no_pk=False):
+def generate_sql(cursor, binlog_event, row=None, e_start_pos=None, flashback=False, no_pk=False, where='row'):
     if row:
-        pattern = generate_sql_pattern(binlog_event, row=row, flashback=flashback, no_pk=no_pk)
-        sql = cursor.mogrify(pattern['template'], pattern['values'])
+        sql = generate_row_sql(cursor, binlog_event, row, flashback=flashback, no_pk=no_pk, where=where)
     else:
         if binlog_event.schema:
             sql = 'USE {0};\n'.format(type_convert(binlog_event.schema))
         else:
             sql = ''
         sql += '{0};'.format(type_convert(binlog_event.query))
-    time = datetime.datetime.fromtimestamp(binlog_event.timestamp)
-    sql += ' #start %s end %s time %s' % (e_start_pos, binlog_event.packet.log_pos, time)
+    sql += position_comment(e_start_pos, binlog_event.packet.log_pos, binlog_event.timestamp)
 
     return sql
 
 
+def position_comment(start_pos, end_pos, timestamp):
+    return ' #start %s end %s time %s' % (start_pos, end_pos, datetime.datetime.fromtimestamp(timestamp))
+
+
+def _escape_temporal(value, escape):
+    if value.__class__ is Literal:
+        return value.text
+    return escape(value)
+
+
+def _string_escaper(escape):
+    def escape_text(value):
+        if PY3PLUS and isinstance(value, bytes):
+            value = value.decode('utf-8')
+        elif not PY3PLUS and isinstance(value, unicode):
+            value = value.encode('utf-8')
+        return "'" + escape(value) + "'"
+    return escape_text
+
+
+def value_escaper(column, escape, literal):
+    """Return a callable giving the sql text of a non NULL value of column, the one of cursor.mogrify.
+
+    escape escapes a string without quoting it, literal is the sql text of any value.
+    """
+    if column.type in INTEGER_TYPES:
+        return str
+    elif column.type == FIELD_TYPE.FLOAT or column.type == FIELD_TYPE.DOUBLE:
+        return escape_float
+    elif column.type == FIELD_TYPE.NEWDECIMAL:
+        # Decimal, or its Literal text
+        return str
+    elif column.type in DATETIME_TYPES:
+        return lambda value: _escape_temporal(value, escape_datetime)
+    elif column.type == FIELD_TYPE.TIME or column.type == FIELD_TYPE.TIME2:
+        return escape_timedelta
+    elif column.type == FIELD_TYPE.DATE:
+        return escape_date
+    elif column.type in STRING_TYPES:
+        return _string_escaper(escape)
+    return lambda value: literal(type_convert(value))
+
+
+def row_key(binlog_event):
+    """Names of the columns of the primary key of the table of a rows event, else of a unique key, () if there is
+    neither. information_schema marks a column UNI only as the single column of a unique key"""
+    primary_key = binlog_event.primary_key
+    if primary_key:
+        return primary_key if isinstance(primary_key, tuple) else (primary_key,)
+    for column in binlog_event.columns:
+        if getattr(column, 'is_unique', False):
+            return (column.name,)
+    return ()
+
+
+class StatementBuilder(object):
+    """SQL of the rows of a table, for one order of its columns.
+
+    The quoted names and the escaper of every column are resolved once, a
+    statement joins the escaped values between the constant parts.
+
+    Given the key columns, a WHERE compares only them, and every column
+    for a row missing a key column or with a NULL one.
+    """
+
+    def __init__(self, schema, table, columns, names, escape, literal, key=()):
+        by_name = dict((column.name, column) for column in columns)
+        names = [type_convert(name) for name in names]
+        table = '`%s`.`%s`' % (type_convert(schema), type_convert(table))
+        self.escapers = [value_escaper(by_name[name], escape, literal) if name in by_name
+                         else lambda value: literal(type_convert(value)) for name in names]
+        self.insert_head = 'INSERT INTO %s(%s) VALUES ' % (table, ', '.join('`%s`' % name for name in names))
+        self.delete_head = 'DELETE FROM %s WHERE ' % table
+        self.update_head = 'UPDATE %s SET ' % table
+        self.assigns = ['`%s`=' % name for name in names]
+        self.null_compares = ['`%s` IS NULL' % name for name in names]
+        key = [type_convert(name) for name in key]
+        self.key = None
+        if key and all(name in names for name in key):
+            self.key = [names.index(name) for name in key]
+
+    def values(self, values):
+        return ['NULL' if value is None else escape(value) for escape, value in zip(self.escapers, values)]
+
+    def where(self, values):
+        if self.key is not None:
+            key = [values[i] for i in self.key]
+            if None not in key:
+                return ' AND '.join([self.assigns[i] + self.escapers[i](value) for i, value in zip(self.key, key)])
+        return ' AND '.join([null if value is None else assign + escape(value) for null, assign, escape, value
+                             in zip(self.null_compares, self.assigns, self.escapers, values)])
+
+    def row(self, values):
+        """(...) of the values of a row in an INSERT"""
+        return '(' + ', '.join(self.values(values)) + ')'
+
+    def insert(self, values):
+        return self.insert_head + self.row(values) + ';'
+
+    def delete(self, values):
+        return self.delete_head + self.where(values) + ' LIMIT 1;'
+
+    def update(self, values, where):
+        assigns = ', '.join([assign + value for assign, value in zip(self.assigns, self.values(values))])
+        return self.update_head + assigns + ' WHERE ' + self.where(where) + ' LIMIT 1;'
+
+
+def statement_builder(cursor, binlog_event, names, where='row'):
+    """StatementBuilder of the table of a rows event for columns names, shared by the events of the same
+    table definition. where is 'row' or 'pk', see row_key
+
+    The builders are kept on cursor and released with it.
+    """
+    builders = getattr(cursor, '_statement_builders', None)
+    if builders is None:
+        builders = cursor._statement_builders = OrderedDict()
+    plan = binlog_event.table_map[binlog_event.table_id].decoder_plan
+    key = (plan, binlog_event.schema, binlog_event.table, names, where)
+    builder = builders.get(key)
+    if builder is None:
+        connection = getattr(cursor, 'connection', None)
+        if connection is None:
+            escape, literal = escape_string, cursor.literal
+        else:
+            # the connection escapes strings by the sql_mode of the server
+            escape, literal = connection.escape_string, connection.literal
+        if len(builders) >= MAX_STATEMENT_BUILDERS:
+            # drop the oldest one
+            builders.popitem(last=False)
+        builder = builders[key] = StatementBuilder(
+            binlog_event.schema, binlog_event.table, binlog_event.columns, names, escape, literal,
+            key=row_key(binlog_event) if where == 'pk' else ())
+    return builder
+
+
+def generate_row_sql(cursor, binlog_event, row, flashback=False, no_pk=False, where='row'):
+    """SQL of a row of a rows event, the same as cursor.mogrify of generate_sql_pattern for where 'row'.
+
+    where 'pk' keys the WHERE of UPDATE and DELETE on the primary key or a unique key, see row_key
+    """
+    if isinstance(binlog_event, UpdateRowsEvent):
+        before, after = row['before_values'], row['after_values']
+        builder = statement_builder(cursor, binlog_event, tuple(before), where)
+        if flashback:
+            return builder.update(list(before.values()), list(after.values()))
+        return builder.update(list(after.values()), list(before.values()))
+
+    insert = generate_row_insert(cursor, binlog_event, row, flashback=flashback, no_pk=no_pk)
+    if insert is not None:
+        return insert[0] + insert[1] + ';'
+    values = row['values']
+    return statement_builder(cursor, binlog_event, tuple(values), where).delete(list(values.values()))
+
+
+def generate_row_insert(cursor, binlog_event, row, flashback=False, no_pk=False):
+    """('INSERT INTO ... VALUES ', '(...)') of a row generate_row_sql turns into an INSERT, None for the other
+    rows"""
+    # flashback deletes the inserted rows and inserts the deleted ones
+    if isinstance(binlog_event, UpdateRowsEvent) or isinstance(binlog_event, WriteRowsEvent) == flashback:
+        return None
+    values = row['values']
+    if no_pk and not flashback and binlog_event.primary_key:
+        values.pop(binlog_event.primary_key)
+    builder = statement_builder(cursor, binlog_event, tuple(values))
+    return builder.insert_head, builder.row(list(values.values()))
+
+
 def generate_sql_pattern(binlog_event, row=None, flashback=False, no_pk=False):
     template = ''
     values = []
@@ -211,6 +471,28 @@ def generate_sql_pattern(binlog_event, row=None, flashback=False, no_pk=False):
     return {'template': template, 'values': list(values)}
 
 
+class OfflineCursor(object):
+    """Stand-in for pymysql cursor when sql is generated without mysql server"""
+
+    charset = 'utf8'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def literal(self, arg):
+        if not PY3PLUS and isinstance(arg, unicode):
+            arg = arg.encode(self.charset)
+        return escape_item(arg, self.charset, ENCODERS)
+
+    def mogrify(self, query, args=None):
+        if args is not None:
+            query = query % tuple(map(self.literal, args))
+        return query
+
+
 def write_file(file, line):
     if PY3PLUS:
         with open(file, 'a', encoding='utf-8') as f:
@@ -901,6 +901,7 @@ class Connection(object):
                 sock.settimeout(None)
                 sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
             self._sock = sock
+            self._sock_timeout = sock.gettimeout()
             self._rfile = _makefile(sock, 'rb')
             self._next_seq_id = 0
 
@@ -958,33 +959,77 @@ class Connection(object):
         """Read an entire "mysql packet" in its entirety from the network
         and return a MysqlPacket type that represents the results.
         """
-        buff = b''
-        while True:
-            packet_header = self._read_bytes(4)
-            if DEBUG: dump_packet(packet_header)
-
-            btrl, btrh, packet_number = struct.unpack('<HBB', packet_header)
-            bytes_to_read = btrl + (btrh << 16)
-            if packet_number != self._next_seq_id:
-                raise err.InternalError("Packet sequence number wrong - got %d expected %d" %
-                                        (packet_number, self._next_seq_id))
-            self._next_seq_id = (self._next_seq_id + 1) % 256
-
-            recv_data = self._read_bytes(bytes_to_read)
-            if DEBUG: dump_packet(recv_data)
-            buff += recv_data
-            # https://dev.mysql.com/doc/internals/en/sending-more-than-16mbyte.html
-            if bytes_to_read == 0xffffff:
-                continue
-            if bytes_to_read < MAX_PACKET_LEN:
-                break
+        bytes_to_read = self._read_packet_header()
+        if bytes_to_read < MAX_PACKET_LEN:
+            buff = self._read_bytes(bytes_to_read)
+        else:
+            buff = self._read_large_packet(bytes_to_read)
+        if DEBUG: dump_packet(buff)
 
         packet = packet_type(buff, self.encoding)
         packet.check_error()
         return packet
 
+    def _read_packet_header(self):
+        """Read the header of the next packet and return the length of its payload"""
+        packet_header = self._read_bytes(4)
+        if DEBUG: dump_packet(packet_header)
+
+        btrl, btrh, packet_number = struct.unpack('<HBB', packet_header)
+        if packet_number != self._next_seq_id:
+            raise err.InternalError("Packet sequence number wrong - got %d expected %d" %
+                                    (packet_number, self._next_seq_id))
+        self._next_seq_id = (self._next_seq_id + 1) % 256
+        return btrl + (btrh << 16)
+
+    if PY2:
+        def _read_large_packet(self, bytes_to_read):
+            """Read a payload sent in chunks of MAX_PACKET_LEN bytes, the first one
+            of bytes_to_read bytes, up to the first shorter chunk.
+
+            https://dev.mysql.com/doc/internals/en/sending-more-than-16mbyte.html
+
+            The chunks are joined once at the end instead of growing the payload
+            chunk by chunk. Packets are read as str on Python 2, a str would be
+            copied out of a bytearray again.
+            """
+            chunks = []
+            while True:
+                chunks.append(self._read_bytes(bytes_to_read))
+                if bytes_to_read < MAX_PACKET_LEN:
+                    break
+                bytes_to_read = self._read_packet_header()
+            return b''.join(chunks)
+    else:
+        def _read_large_packet(self, bytes_to_read):
+            """Read a payload sent in chunks of MAX_PACKET_LEN bytes, the first one
+            of bytes_to_read bytes, up to the first shorter chunk.
+
+            https://dev.mysql.com/doc/internals/en/sending-more-than-16mbyte.html
+
+            Every chunk is received into the tail of one bytearray, grown by the
+            size in its header, which is returned as the payload.
+            """
+            data = bytearray(bytes_to_read)
+            start = 0
+            while True:
+                with memoryview(data) as view:
+                    self._read_bytes_into(view[start:])
+                if bytes_to_read < MAX_PACKET_LEN:
+                    break
+                bytes_to_read = self._read_packet_header()
+                start = len(data)
+                data += bytes(bytes_to_read)
+            return data
+
+    def _set_timeout(self, timeout):
+        # settimeout costs a system call, the socket keeps the last one
+        if timeout != self._sock_timeout:
+            self._sock.settimeout(timeout)
+            self._sock_timeout = timeout
+
     def _read_bytes(self, num_bytes):
-        self._sock.settimeout(self._read_timeout)
+        self._set_timeout(self._read_timeout)
         while True:
             try:
                 data = self._rfile.read(num_bytes)
@@ -1000,8 +1045,26 @@ class Connection(object):
                 2013, "Lost connection to MySQL server during query")
         return data
 
+    def _read_bytes_into(self, view):
+        """Fill the writable memoryview view from the socket"""
+        self._set_timeout(self._read_timeout)
+        position = 0
+        while position < len(view):
+            try:
+                received = self._rfile.readinto(view[position:])
+            except (IOError, OSError) as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise err.OperationalError(
+                    2013,
+                    "Lost connection to MySQL server during query (%s)" % (e,))
+            if not received:
+                raise err.OperationalError(
+                    2013, "Lost connection to MySQL server during query")
+            position += received
+
     def _write_bytes(self, data):
-        self._sock.settimeout(self._write_timeout)
+        self._set_timeout(self._write_timeout)
         try:
             self._sock.sendall(data)
         except IOError as e:
@@ -1086,6 +1149,7 @@ class Connection(object):
             self.write_packet(data_init)
 
             self._sock = self.ctx.wrap_socket(self._sock, server_hostname=self.host)
+            self._sock_timeout = self._sock.gettimeout()
             self._rfile = _makefile(self._sock, 'rb')
 
         data = data_init + self.user + b'\0'
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""asyncio binlog stream reader, Python 3.5+.
+
+One process can tail the binlog of many servers, each with an
+AsyncBinLogStreamReader on the same event loop:
+
+    async def tail(settings):
+        async with AsyncBinLogStreamReader(settings, server_id=100, blocking=True,
+                                           resume_stream=True) as stream:
+            async for event in stream:
+                ...
+
+The connection is set up by BinLogStreamReader with pymysql (handshake,
+checksum and COM_BINLOG_DUMP), in a thread of the executor. Its socket
+is then handed over to asyncio streams, and the packets of the binlog
+dump are read without blocking. Events are decoded by
+BinLogStreamReader as usual. Only the queries of table schemas, for the
+TableMapEvents of tables not mapped yet, run in the executor, so many
+readers share a bounded number of threads.
+"""
+
+import asyncio
+import struct
+
+from ..pymysql import err
+from ..pymysql.connections import MysqlPacket, MAX_PACKET_LEN
+from .binlogstream import BinLogStreamReader
+from .constants.BINLOG import TABLE_MAP_EVENT
+from .packet import peek_header, peek_table_id
+
+PACKET_HEADER = struct.Struct('<HBB')
+
+
+class AsyncBinLogStreamReader(object):
+    """Read binlog events of a server with asyncio, see BinLogStreamReader.
+
+    executor: concurrent.futures.Executor for connecting and for table
+              schema queries, default: the executor of the event loop
+    The other arguments are the ones of BinLogStreamReader, but prefetch.
+    SSL connections are not supported.
+    """
+
+    def __init__(self, connection_settings, server_id, executor=None, loop=None, **kwargs):
+        if connection_settings.get('ssl'):
+            raise ValueError('ssl is not supported by AsyncBinLogStreamReader')
+        if kwargs.get('prefetch'):
+            raise ValueError('prefetch is not supported by AsyncBinLogStreamReader')
+        self.stream = BinLogStreamReader(connection_settings, server_id, **kwargs)
+        self.executor = executor
+        self._loop = loop
+        self._reader = None
+        self._writer = None
+        self._next_seq_id = 0
+
+    @property
+    def log_file(self):
+        return self.stream.log_file
+
+    @property
+    def log_pos(self):
+        return self.stream.log_pos
+
+    @property
+    def loop(self):
+        if self._loop is None:
+            self._loop = asyncio.get_event_loop()
+        return self._loop
+
+    async def _connect(self):
+        await self.loop.run_in_executor(self.executor, self.stream._connect)
+        connection = self.stream._stream_connection
+        self._reader, self._writer = await asyncio.open_connection(sock=connection._sock)
+        self._next_seq_id = connection._next_seq_id
+
+    def _close_stream(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def _read_packet(self):
+        """Read the next packet of the binlog dump, see Connection._read_packet"""
+        chunks = []
+        while True:
+            btrl, btrh, packet_number = PACKET_HEADER.unpack(await self._reader.readexactly(4))
+            if packet_number != self._next_seq_id:
+                raise err.InternalError("Packet sequence number wrong - got %d expected %d" %
+                                        (packet_number, self._next_seq_id))
+            self._next_seq_id = (self._next_seq_id + 1) % 256
+            bytes_to_read = btrl + (btrh << 16)
+            chunks.append(await self._reader.readexactly(bytes_to_read))
+            if bytes_to_read < MAX_PACKET_LEN:
+                break
+        packet = MysqlPacket(b''.join(chunks), None)
+        packet.check_error()
+        return packet
+
+    async def fetchone(self):
+        """Return the next event, None at the end of a non blocking stream"""
+        stream = self.stream
+        while True:
+            if self._reader is None:
+                await self._connect()
+
+            try:
+                pkt = await self._read_packet()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                # lost connection, dump again from log_file and log_pos
+                self._close_stream()
+                await self.loop.run_in_executor(self.executor, stream._close_stream)
+                continue
+
+            if pkt.is_eof_packet():
+                await self.close()
+                return None
+
+            if not pkt.is_ok_packet():
+                continue
+
+            data = pkt.get_all_data()
+            if peek_header(data)[1] == TABLE_MAP_EVENT and peek_table_id(data) not in stream.table_map:
+                # may query the schema of the table
+                binlog_event = await self.loop.run_in_executor(self.executor, stream._decode_packet, pkt)
+            else:
+                binlog_event = stream._decode_packet(pkt)
+            if binlog_event is not None:
+                return binlog_event
+
+    async def close(self):
+        self._close_stream()
+        await self.loop.run_in_executor(self.executor, self.stream.close)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        binlog_event = await self.fetchone()
+        if binlog_event is None:
+            raise StopAsyncIteration
+        return binlog_event
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import mmap
+import struct
+import zlib
+
+from .. import pymysql
+from ..pymysql.cursors import DictCursor
+
+from ._compat import text_type
+from .binlogstream import BinLogEventDecoder
+from .constants.BINLOG import FORMAT_DESCRIPTION_EVENT, QUERY_EVENT, XID_EVENT
+from .exceptions import BinLogChecksumError
+
+BINLOG_MAGIC = b'\xfebin'
+EVENT_HEADER = struct.Struct('<IBIIIH')
+EVENT_HEADER_LENGTH = 19
+BINLOG_CHECKSUM_LENGTH = 4
+BINLOG_CHECKSUM_ALG_OFF = 0
+BINLOG_CHECKSUM_ALG_UNDEF = 255
+
+
+def binlog_files(paths):
+    """Expand files and directories to binlog files sorted by sequence number"""
+    if isinstance(paths, (str, text_type)):
+        paths = [paths]
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in os.listdir(path):
+                if re.search(r'\.\d+$', name) and os.path.isfile(os.path.join(path, name)):
+                    files.append(os.path.join(path, name))
+        else:
+            files.append(path)
+
+    def sequence(path):
+        name = os.path.basename(path)
+        base, _, number = name.rpartition('.')
+        return base, int(number) if number.isdigit() else -1, name
+
+    return sorted(files, key=sequence)
+
+
+def server_version_has_checksum(server_version):
+    """Binlog checksum is available since mysql 5.6.1"""
+    version = re.match(r'(\d+)\.(\d+)\.(\d+)', server_version)
+    if not version:
+        return False
+    return tuple(int(v) for v in version.groups()) >= (5, 6, 1)
+
+
+def checksum_enabled(buffer, size):
+    """Read binlog checksum algorithm from the FormatDescriptionEvent"""
+    start = len(BINLOG_MAGIC)
+    if size < start + EVENT_HEADER_LENGTH:
+        return False
+    event_type, event_size = EVENT_HEADER.unpack_from(buffer, start)[1:4:2]
+    if event_type != FORMAT_DESCRIPTION_EVENT:
+        return False
+    body = start + EVENT_HEADER_LENGTH
+    server_version = buffer[body + 2:body + 52].split(b'\x00', 1)[0].decode()
+    if not server_version_has_checksum(server_version):
+        return False
+    alg = struct.unpack('<B', buffer[start + event_size - 5:start + event_size - 4])[0]
+    return alg not in (BINLOG_CHECKSUM_ALG_OFF, BINLOG_CHECKSUM_ALG_UNDEF)
+
+
+def first_event_timestamp(path):
+    """Timestamp of the FormatDescriptionEvent, i.e. when the binlog file was opened"""
+    with open(path, 'rb') as f:
+        header = f.read(len(BINLOG_MAGIC) + EVENT_HEADER_LENGTH)
+    if len(header) < len(BINLOG_MAGIC) + EVENT_HEADER_LENGTH or header[:len(BINLOG_MAGIC)] != BINLOG_MAGIC:
+        raise ValueError('%s is not a binlog file' % path)
+    return EVENT_HEADER.unpack_from(header, len(BINLOG_MAGIC))[0]
+
+
+def seek_timestamp(path, timestamp):
+    """Position of the transaction holding the first event not older than timestamp.
+
+    Only event headers are read. Events are walked from the start of the file and
+    the last transaction boundary (after an XidEvent, or a QueryEvent other than
+    BEGIN) before the first event with timestamp >= `timestamp` is returned, so
+    reading from there never starts in the middle of a transaction. Returns the
+    size of the file if every event is older.
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < len(BINLOG_MAGIC) + EVENT_HEADER_LENGTH:
+            return size
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        if buffer[:len(BINLOG_MAGIC)] != BINLOG_MAGIC:
+            raise ValueError('%s is not a binlog file' % path)
+        tail = BINLOG_CHECKSUM_LENGTH if checksum_enabled(buffer, size) else 0
+        boundary = position = len(BINLOG_MAGIC)
+        while position + EVENT_HEADER_LENGTH <= size:
+            event_timestamp, event_type, _, event_size = EVENT_HEADER.unpack_from(buffer, position)[:4]
+            end = position + event_size
+            if event_size < EVENT_HEADER_LENGTH or end > size:
+                break
+            if event_timestamp >= timestamp and event_type != FORMAT_DESCRIPTION_EVENT:
+                return boundary
+            if event_type == XID_EVENT or \
+                    (event_type == QUERY_EVENT and buffer[end - tail - 5:end - tail] != b'BEGIN'):
+                boundary = end
+            position = end
+        return size
+    finally:
+        buffer.close()
+
+
+class EventPacket(object):
+    """One event of a memory mapped binlog file.
+
+    It looks like the packet of COM_BINLOG_DUMP for BinLogPacketWrapper, which
+    reads the event in place from the file. The OK byte of a packet is not
+    stored in binlog files, the byte before the event stands for it.
+    """
+
+    def __init__(self, buffer, start, end):
+        self.buffer = buffer
+        self.start = start
+        self.end = end
+        self.offset = start - 1
+
+    def get_all_data(self):
+        return self.buffer
+
+
+class BinLogFileReader(BinLogEventDecoder):
+
+    """Read events from local binlog files, without COM_BINLOG_DUMP.
+
+    Events are the same objects BinLogStreamReader returns. Table schemas are
+    read from a SchemaSnapshot or from a stand-in mysql server.
+    """
+
+    def __init__(self, log_files, ctl_connection_settings=None,
+                 schema_snapshot=None, only_events=None, ignored_events=None,
+                 filter_non_implemented_events=True, log_file=None,
+                 log_pos=None, only_tables=None, ignored_tables=None,
+                 only_schemas=None, ignored_schemas=None,
+                 freeze_schema=False, skip_to_timestamp=None,
+                 fail_on_table_metadata_unavailable=False,
+                 verify_checksum=False, schema_cache=None, literal_values=False,
+                 include_gtids=None, exclude_gtids=None):
+        """
+        Attributes:
+            log_files: binlog files or directories, read in binlog order
+            ctl_connection_settings: Connection settings for the server
+                                     holding schema information
+            schema_snapshot: SchemaSnapshot used instead of a ctl connection
+            log_file: Name of the file to start with, default: the first one
+            log_pos: Position in log_file to start with
+            verify_checksum: Check CRC32 of every event if binlog_checksum
+                             was enabled when the file was written
+            schema_cache: SchemaCache of table columns, queried before the
+                          stand-in mysql server, see BinLogStreamReader
+            See BinLogStreamReader for the other attributes
+        """
+        super(BinLogFileReader, self).__init__(
+            only_events, ignored_events, filter_non_implemented_events,
+            only_tables, ignored_tables, only_schemas, ignored_schemas,
+            freeze_schema, skip_to_timestamp, fail_on_table_metadata_unavailable,
+            schema_cache, literal_values, include_gtids, exclude_gtids)
+
+        self.log_files = binlog_files(log_files)
+        if log_file:
+            names = [os.path.basename(f) for f in self.log_files]
+            if log_file not in names:
+                raise ValueError('binlog file %s not found' % log_file)
+            self.log_files = self.log_files[names.index(log_file):]
+
+        self._ctl_connection_settings = ctl_connection_settings
+        if ctl_connection_settings:
+            self._ctl_connection_settings = dict(ctl_connection_settings)
+            self._ctl_connection_settings.setdefault("charset", "utf8")
+        self.schema_snapshot = schema_snapshot
+        if schema_snapshot is None and not ctl_connection_settings:
+            raise ValueError('schema_snapshot or ctl_connection_settings is required')
+        self.verify_checksum = verify_checksum
+
+        self.log_file = None
+        self.log_pos = None
+        self.__start_pos = log_pos
+        self.__file_index = -1
+        self.__buffer = None
+        self.__size = 0
+
+    def close(self):
+        # mmap is closed once the last event read from it is released
+        self.__buffer = None
+        self.__file_index = len(self.log_files)
+        if self._connected_ctl:
+            self._ctl_connection._get_table_information = None
+            self._ctl_connection.close()
+            self._connected_ctl = False
+        self._ctl_connection = None
+
+    def _connect_to_ctl(self):
+        if self.schema_snapshot is not None:
+            self._ctl_connection = self.schema_snapshot
+            return
+        self._ctl_connection_settings["db"] = "information_schema"
+        self._ctl_connection_settings["cursorclass"] = DictCursor
+        self._use_ctl_connection(pymysql.connect(**self._ctl_connection_settings))
+
+    def __open_next_file(self):
+        self.__buffer = None
+        self.__file_index += 1
+        if self.__file_index >= len(self.log_files):
+            return False
+
+        path = self.log_files[self.__file_index]
+        with open(path, 'rb') as f:
+            self.__size = os.fstat(f.fileno()).st_size
+            if self.__size < len(BINLOG_MAGIC):
+                raise ValueError('%s is not a binlog file' % path)
+            self.__buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.__buffer[:len(BINLOG_MAGIC)] != BINLOG_MAGIC:
+            raise ValueError('%s is not a binlog file' % path)
+
+        self.log_file = os.path.basename(path)
+        self.log_pos = len(BINLOG_MAGIC)
+        self._use_checksum = checksum_enabled(self.__buffer, self.__size)
+        # Table ids are only valid inside one binlog file, see
+        # BinLogStreamReader._update_position
+        self.table_map = {}
+        self._ignored_table_ids = set()
+        if self.__file_index == 0 and self.__start_pos and self.__start_pos > self.log_pos:
+            self.log_pos = self.__start_pos
+        return True
+
+    def __read_packet(self):
+        """Return the packet of the next event or None at the end of files"""
+        while True:
+            if self.__buffer is None or self.log_pos + EVENT_HEADER_LENGTH > self.__size:
+                # end of file, or an event only partially written
+                if not self.__open_next_file():
+                    return None
+                continue
+
+            start = self.log_pos
+            event_size = EVENT_HEADER.unpack_from(self.__buffer, start)[3]
+            end = start + event_size
+            if event_size < EVENT_HEADER_LENGTH or end > self.__size:
+                if not self.__open_next_file():
+                    return None
+                continue
+
+            if self.verify_checksum and self._use_checksum:
+                checksum = struct.unpack('<I', self.__buffer[end - BINLOG_CHECKSUM_LENGTH:end])[0]
+                if zlib.crc32(self.__buffer[start:end - BINLOG_CHECKSUM_LENGTH]) & 0xffffffff != checksum:
+                    raise BinLogChecksumError(self.log_file, start)
+            self.log_pos = end
+            return EventPacket(self.__buffer, start, end)
+
+    def fetchone(self):
+        while True:
+            if self._ctl_connection is None:
+                self._connect_to_ctl()
+
+            pkt = self.__read_packet()
+            if pkt is None:
+                return None
+
+            # log_pos is kept by __read_packet, event headers of relay logs hold the positions of the master
+            binlog_event = self._decode_packet(pkt)
+            if binlog_event is not None:
+                return binlog_event
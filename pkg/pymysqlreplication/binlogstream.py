@@ -1,21 +1,27 @@
 # -*- coding: utf-8 -*-
 
 from .. import pymysql
+import socket
 import struct
+import time
 
 from ..pymysql.constants.COMMAND import COM_BINLOG_DUMP, COM_REGISTER_SLAVE
 from ..pymysql.cursors import DictCursor
 from ..pymysql.util import int2byte
 
-from .packet import BinLogPacketWrapper
-from .constants.BINLOG import TABLE_MAP_EVENT, ROTATE_EVENT
-from .gtid import GtidSet
+from .packet import (
+    BinLogPacketWrapper, peek_header, peek_table_id, peek_gtid,
+    TABLE_EVENTS, GTID_EVENTS, NON_TRANSACTION_EVENTS)
+from .constants.BINLOG import TABLE_MAP_EVENT, ROTATE_EVENT, QUERY_EVENT
+from .gtid import GtidSet, GtidFilter
 from .event import (
     QueryEvent, RotateEvent, FormatDescriptionEvent,
     XidEvent, GtidEvent, StopEvent,
     BeginLoadQueryEvent, ExecuteLoadQueryEvent,
     HeartbeatLogEvent, NotImplementedEvent)
 from .exceptions import BinLogNotEnabled
+from .schema import fetch_columns
+from .prefetch import PacketPrefetcher, StageStats
 from .row_event import (
     UpdateRowsEvent, WriteRowsEvent, DeleteRowsEvent, TableMapEvent)
 
@@ -121,7 +127,265 @@ class ReportSlave(object):
                 struct.pack('<l', master_id))
 
 
-class BinLogStreamReader(object):
+class BinLogEventDecoder(object):
+
+    """Filters and decoding of events shared by BinLogStreamReader and
+    BinLogFileReader.
+
+    Subclasses read the packets of events, open the ctl connection in
+    _connect_to_ctl and keep log_file and log_pos, see _update_position.
+    _decode_packet turns a packet into its event, dropping it from its
+    header when it is filtered out, and keeps table_map and the schema
+    cache up to date.
+    """
+
+    def __init__(self, only_events=None, ignored_events=None,
+                 filter_non_implemented_events=True,
+                 only_tables=None, ignored_tables=None,
+                 only_schemas=None, ignored_schemas=None,
+                 freeze_schema=False, skip_to_timestamp=None,
+                 fail_on_table_metadata_unavailable=False,
+                 schema_cache=None, literal_values=False,
+                 include_gtids=None, exclude_gtids=None):
+        """See BinLogStreamReader for the attributes"""
+        self._ctl_connection = None
+        self._connected_ctl = False
+        self._use_checksum = False
+
+        self.__only_tables = only_tables
+        self.__ignored_tables = ignored_tables
+        self.__only_schemas = only_schemas
+        self.__ignored_schemas = ignored_schemas
+        self.__freeze_schema = freeze_schema
+        self.__allowed_events = self._allowed_event_list(
+            only_events, ignored_events, filter_non_implemented_events)
+        self.__fail_on_table_metadata_unavailable = fail_on_table_metadata_unavailable
+        self.__literal_values = literal_values
+
+        # We can't filter on packet level TABLE_MAP and rotate event because
+        # we need them for handling other operations
+        self.__allowed_events_in_packet = frozenset(
+            [TableMapEvent, RotateEvent]).union(self.__allowed_events)
+        self.schema_cache = schema_cache
+        # columns of the filtered tables are fetched in one query when connected
+        self.__prefetch = schema_cache is not None and (only_schemas is not None or only_tables is not None)
+        if schema_cache is not None:
+            # DDL invalidates the cache
+            self.__allowed_events_in_packet |= frozenset([QueryEvent])
+
+        # Store table meta information
+        self.table_map = {}
+        # ids of the tables filtered out by their TableMapEvent
+        self._ignored_table_ids = set()
+        self.skip_to_timestamp = skip_to_timestamp
+        self.__gtid_filter = None
+        if include_gtids or exclude_gtids:
+            self.__gtid_filter = GtidFilter(include_gtids or None, exclude_gtids or None)
+        # the transaction being read is skipped by the GTID filter
+        self.__skip_transaction = bool(include_gtids)
+
+    def _connect_to_ctl(self):
+        """Open the ctl connection, see _use_ctl_connection"""
+        raise NotImplementedError()
+
+    def _use_ctl_connection(self, connection):
+        """Query the schemas of tables with connection, a ctl connection to information_schema"""
+        self._ctl_connection = connection
+        self._ctl_connection._get_table_information = self.__get_table_information
+        self._connected_ctl = True
+        if self.__prefetch:
+            self.__prefetch_table_information()
+
+    def _update_position(self, log_pos, binlog_event=None):
+        """Follow an event read, with the log_pos of its header, binlog_event
+        being None when the event is dropped from its header"""
+
+    def _decode_packet(self, pkt):
+        """Return the event of an OK packet of the binlog dump, None if it is
+        filtered out. Keeps table_map up to date, see _update_position"""
+        data = pkt.get_all_data()
+        # a local binlog packet starts at `offset`, see BinLogPacketWrapper
+        offset = getattr(pkt, 'offset', 0)
+        timestamp, event_type, log_pos = peek_header(data, offset)
+        if event_type in GTID_EVENTS and self.__gtid_filter is not None:
+            self.__skip_transaction = not self.__gtid_filter.match(*peek_gtid(data, offset))
+        table_id = peek_table_id(data, offset) if event_type in TABLE_EVENTS else None
+        if self.__skip_event(timestamp, event_type, table_id):
+            self._update_position(log_pos)
+            return None
+
+        binlog_event = BinLogPacketWrapper(pkt, self.table_map,
+                                           self._ctl_connection,
+                                           self._use_checksum,
+                                           self.__allowed_events_in_packet,
+                                           self.__only_tables,
+                                           self.__ignored_tables,
+                                           self.__only_schemas,
+                                           self.__ignored_schemas,
+                                           self.__freeze_schema,
+                                           self.__fail_on_table_metadata_unavailable,
+                                           self.__literal_values)
+        self._update_position(log_pos, binlog_event)
+
+        if binlog_event.event_type == TABLE_MAP_EVENT and binlog_event.event is None and \
+                table_id not in self.table_map:
+            self._ignored_table_ids.add(table_id)
+
+        if binlog_event.event_type == QUERY_EVENT and self.schema_cache is not None:
+            self.schema_cache.invalidate_query(binlog_event.event.query, binlog_event.event.schema)
+
+        if self.__skip_transaction and event_type not in NON_TRANSACTION_EVENTS:
+            # a QueryEvent of a skipped transaction, read for the schema cache only
+            return None
+
+        # This check must not occur before clearing the ``table_map`` as a
+        # result of a RotateEvent.
+        #
+        # The first RotateEvent in a binlog file has a timestamp of
+        # zero.  If the server has moved to a new log and not written a
+        # timestamped RotateEvent at the end of the previous log, the
+        # RotateEvent at the beginning of the new log will be ignored
+        # if the caller provided a positive ``skip_to_timestamp``
+        # value.  This will result in the ``table_map`` becoming
+        # corrupt.
+        #
+        # https://dev.mysql.com/doc/internals/en/event-data-for-specific-event-types.html
+        # From the MySQL Internals Manual:
+        #
+        #   ROTATE_EVENT is generated locally and written to the binary
+        #   log on the master. It is written to the relay log on the
+        #   slave when FLUSH LOGS occurs, and when receiving a
+        #   ROTATE_EVENT from the master. In the latter case, there
+        #   will be two rotate events in total originating on different
+        #   servers.
+        #
+        #   There are conditions under which the terminating
+        #   log-rotation event does not occur. For example, the server
+        #   might crash.
+        if self.skip_to_timestamp and binlog_event.timestamp < self.skip_to_timestamp:
+            return None
+
+        if binlog_event.event_type == TABLE_MAP_EVENT and \
+                binlog_event.event is not None:
+            self.table_map[binlog_event.event.table_id] = \
+                binlog_event.event.get_table()
+
+        # event is none if we have filter it on packet level
+        # we filter also not allowed events
+        if binlog_event.event is None or (binlog_event.event.__class__ not in self.__allowed_events):
+            return None
+
+        return binlog_event.event
+
+    def __skip_event(self, timestamp, event_type, table_id):
+        """Drop an event from its header, before any parsing.
+
+        Events older than skip_to_timestamp are dropped, except RotateEvent
+        (see _decode_packet) and QueryEvent which may invalidate the schema
+        cache.
+
+        table_map only keeps the tables passing the filters, and a table id
+        maps to one table in a binlog file, so the rows of other tables and
+        the TableMapEvents of rejected tables are dropped too.
+
+        The events of a transaction skipped by the GTID filter are dropped
+        up to the GtidEvent of the next transaction, but for QueryEvent as
+        above.
+        """
+        if self.skip_to_timestamp and timestamp < self.skip_to_timestamp and event_type != ROTATE_EVENT and \
+                not (event_type == QUERY_EVENT and self.schema_cache is not None):
+            return True
+        if self.__skip_transaction and event_type not in NON_TRANSACTION_EVENTS and \
+                not (event_type == QUERY_EVENT and self.schema_cache is not None):
+            return True
+        if table_id is None:
+            return False
+        if table_id in self._ignored_table_ids:
+            return True
+        return event_type != TABLE_MAP_EVENT and table_id not in self.table_map
+
+    @staticmethod
+    def _allowed_event_list(only_events, ignored_events,
+                            filter_non_implemented_events):
+        if only_events is not None:
+            events = set(only_events)
+        else:
+            events = set((
+                QueryEvent,
+                RotateEvent,
+                StopEvent,
+                FormatDescriptionEvent,
+                XidEvent,
+                GtidEvent,
+                BeginLoadQueryEvent,
+                ExecuteLoadQueryEvent,
+                UpdateRowsEvent,
+                WriteRowsEvent,
+                DeleteRowsEvent,
+                TableMapEvent,
+                HeartbeatLogEvent,
+                NotImplementedEvent,
+                ))
+        if ignored_events is not None:
+            for e in ignored_events:
+                events.remove(e)
+        if filter_non_implemented_events:
+            try:
+                events.remove(NotImplementedEvent)
+            except KeyError:
+                pass
+        return frozenset(events)
+
+    def __get_table_information(self, schema, table, signature=None):
+        if self.schema_cache is not None and signature is not None:
+            columns = self.schema_cache.get(schema, table, signature)
+            if columns is None:
+                columns = self.__query_table_information(schema, table)
+                if columns:
+                    self.schema_cache.put(schema, table, signature, columns)
+            return columns
+        return self.__query_table_information(schema, table)
+
+    def __prefetch_table_information(self):
+        cur = self._ctl_connection.cursor()
+        try:
+            self.schema_cache.prefetch(fetch_columns(cur, self.__only_schemas, self.__only_tables))
+        finally:
+            cur.close()
+        self.__prefetch = False
+
+    def __query_table_information(self, schema, table):
+        for i in range(1, 3):
+            try:
+                if not self._connected_ctl:
+                    self._connect_to_ctl()
+
+                cur = self._ctl_connection.cursor()
+                cur.execute("""
+                    SELECT
+                        COLUMN_NAME, COLLATION_NAME, CHARACTER_SET_NAME,
+                        COLUMN_COMMENT, COLUMN_TYPE, COLUMN_KEY, ORDINAL_POSITION
+                    FROM
+                        information_schema.columns
+                    WHERE
+                        table_schema = %s AND table_name = %s
+                    ORDER BY ORDINAL_POSITION
+                    """, (schema, table))
+
+                return cur.fetchall()
+            except pymysql.OperationalError as error:
+                code, message = error.args
+                if code in MYSQL_EXPECTED_ERROR_CODES:
+                    self._connected_ctl = False
+                    continue
+                else:
+                    raise error
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+
+class BinLogStreamReader(BinLogEventDecoder):
 
     """Connect to replication stream and read event
     """
@@ -138,7 +402,8 @@ class BinLogStreamReader(object):
                  report_slave=None, slave_uuid=None,
                  pymysql_wrapper=None,
                  fail_on_table_metadata_unavailable=False,
-                 slave_heartbeat=None):
+                 slave_heartbeat=None, schema_cache=None, literal_values=False,
+                 prefetch=0, include_gtids=None, exclude_gtids=None):
         """
         Attributes:
             ctl_connection_settings: Connection settings for cluster holding
@@ -172,42 +437,45 @@ class BinLogStreamReader(object):
                              many event to skip in binlog). See
                              MASTER_HEARTBEAT_PERIOD in mysql documentation
                              for semantics
+            schema_cache: SchemaCache of table columns, queried before the
+                          ctl connection and invalidated by DDL QueryEvents.
+                          With only_schemas / only_tables the columns of all
+                          matching tables are prefetched in one query.
+            literal_values: Read DECIMAL and DATETIME2 values as
+                            decoder.Literal, their SQL text, instead of
+                            decimal.Decimal and datetime.datetime, and
+                            JSON values as their JSON text
+            prefetch: Read up to this many packets ahead in a thread while
+                      events are decoded, see PacketPrefetcher. 0 reads a
+                      packet when the next event is fetched
+            include_gtids: GtidSet or its text, only read the transactions
+                           in it
+            exclude_gtids: GtidSet or its text, skip the transactions in it.
+                           Events of skipped transactions are dropped from
+                           their header, see GtidFilter
         """
 
+        super(BinLogStreamReader, self).__init__(
+            only_events, ignored_events, filter_non_implemented_events,
+            only_tables, ignored_tables, only_schemas, ignored_schemas,
+            freeze_schema, skip_to_timestamp, fail_on_table_metadata_unavailable,
+            schema_cache, literal_values, include_gtids, exclude_gtids)
+
         self.__connection_settings = connection_settings
         self.__connection_settings.setdefault("charset", "utf8")
 
         self.__connected_stream = False
-        self.__connected_ctl = False
         self.__resume_stream = resume_stream
         self.__blocking = blocking
         self._ctl_connection_settings = ctl_connection_settings
         if ctl_connection_settings:
             self._ctl_connection_settings.setdefault("charset", "utf8")
 
-        self.__only_tables = only_tables
-        self.__ignored_tables = ignored_tables
-        self.__only_schemas = only_schemas
-        self.__ignored_schemas = ignored_schemas
-        self.__freeze_schema = freeze_schema
-        self.__allowed_events = self._allowed_event_list(
-            only_events, ignored_events, filter_non_implemented_events)
-        self.__fail_on_table_metadata_unavailable = fail_on_table_metadata_unavailable
-
-        # We can't filter on packet level TABLE_MAP and rotate event because
-        # we need them for handling other operations
-        self.__allowed_events_in_packet = frozenset(
-            [TableMapEvent, RotateEvent]).union(self.__allowed_events)
-
         self.__server_id = server_id
-        self.__use_checksum = False
 
-        # Store table meta information
-        self.table_map = {}
         self.log_pos = log_pos
         self.log_file = log_file
         self.auto_position = auto_position
-        self.skip_to_timestamp = skip_to_timestamp
 
         if report_slave:
             self.report_slave = ReportSlave(report_slave)
@@ -219,25 +487,38 @@ class BinLogStreamReader(object):
         else:
             self.pymysql_wrapper = pymysql.connect
 
+        self.__prefetch_packets = prefetch or 0
+        self.__prefetcher = None
+        # packets read by the prefetch thread, and seconds fetchone waited for them
+        self.prefetch_stats = StageStats()
+        self.prefetch_waited = 0.0
+
     def close(self):
+        if self.__prefetcher is not None:
+            self.__prefetcher.stop(0)
+            self.__prefetcher = None
+            if self.__connected_stream:
+                # wake the prefetch thread up from recv
+                try:
+                    self._stream_connection._sock.shutdown(socket.SHUT_RDWR)
+                except (socket.error, AttributeError):
+                    pass
         if self.__connected_stream:
             self._stream_connection.close()
             self.__connected_stream = False
-        if self.__connected_ctl:
+        if self._connected_ctl:
             # break reference cycle between stream reader and underlying
             # mysql connection object
             self._ctl_connection._get_table_information = None
             self._ctl_connection.close()
-            self.__connected_ctl = False
+            self._connected_ctl = False
 
-    def __connect_to_ctl(self):
+    def _connect_to_ctl(self):
         if not self._ctl_connection_settings:
             self._ctl_connection_settings = dict(self.__connection_settings)
         self._ctl_connection_settings["db"] = "information_schema"
         self._ctl_connection_settings["cursorclass"] = DictCursor
-        self._ctl_connection = self.pymysql_wrapper(**self._ctl_connection_settings)
-        self._ctl_connection._get_table_information = self.__get_table_information
-        self.__connected_ctl = True
+        self._use_ctl_connection(self.pymysql_wrapper(**self._ctl_connection_settings))
 
     def __checksum_enabled(self):
         """Return True if binlog-checksum = CRC32. Only for MySQL > 5.6"""
@@ -275,11 +556,11 @@ class BinLogStreamReader(object):
         # log_file (string.EOF) -- filename of the binlog on the master
         self._stream_connection = self.pymysql_wrapper(**self.__connection_settings)
 
-        self.__use_checksum = self.__checksum_enabled()
+        self._use_checksum = self.__checksum_enabled()
 
         # If checksum is enabled we need to inform the server about the that
         # we support it
-        if self.__use_checksum:
+        if self._use_checksum:
             cur = self._stream_connection.cursor()
             cur.execute("set @master_binlog_checksum= @@global.binlog_checksum")
             cur.close()
@@ -417,22 +698,27 @@ class BinLogStreamReader(object):
 
     def fetchone(self):
         while True:
-            if not self.__connected_stream:
-                self.__connect_to_stream()
+            self._connect()
 
-            if not self.__connected_ctl:
-                self.__connect_to_ctl()
+            if self.__prefetch_packets and self.__prefetcher is None:
+                self.__prefetcher = PacketPrefetcher(self._stream_connection._read_packet, self.__prefetch_packets,
+                                                     self.prefetch_stats)
 
             try:
-                if pymysql.__version__ < "0.6":
+                if self.__prefetcher is not None:
+                    start = time.time()
+                    pkt = self.__prefetcher.get()
+                    self.prefetch_waited += time.time() - start
+                elif pymysql.__version__ < "0.6":
                     pkt = self._stream_connection.read_packet()
                 else:
                     pkt = self._stream_connection._read_packet()
             except pymysql.OperationalError as error:
                 code, message = error.args
                 if code in MYSQL_EXPECTED_ERROR_CODES:
-                    self._stream_connection.close()
-                    self.__connected_stream = False
+                    # the prefetch thread ended with the error
+                    self.__prefetcher = None
+                    self._close_stream()
                     continue
                 raise
 
@@ -443,129 +729,38 @@ class BinLogStreamReader(object):
             if not pkt.is_ok_packet():
                 continue
 
-            binlog_event = BinLogPacketWrapper(pkt, self.table_map,
-                                               self._ctl_connection,
-                                               self.__use_checksum,
-                                               self.__allowed_events_in_packet,
-                                               self.__only_tables,
-                                               self.__ignored_tables,
-                                               self.__only_schemas,
-                                               self.__ignored_schemas,
-                                               self.__freeze_schema,
-                                               self.__fail_on_table_metadata_unavailable)
-
-            if binlog_event.event_type == ROTATE_EVENT:
-                self.log_pos = binlog_event.event.position
-                self.log_file = binlog_event.event.next_binlog
-                # Table Id in binlog are NOT persistent in MySQL - they are in-memory identifiers
-                # that means that when MySQL master restarts, it will reuse same table id for different tables
-                # which will cause errors for us since our in-memory map will try to decode row data with
-                # wrong table schema.
-                # The fix is to rely on the fact that MySQL will also rotate to a new binlog file every time it
-                # restarts. That means every rotation we see *could* be a sign of restart and so potentially
-                # invalidates all our cached table id to schema mappings. This means we have to load them all
-                # again for each logfile which is potentially wasted effort but we can't really do much better
-                # without being broken in restart case
-                self.table_map = {}
-            elif binlog_event.log_pos:
-                self.log_pos = binlog_event.log_pos
-
-            # This check must not occur before clearing the ``table_map`` as a
-            # result of a RotateEvent.
-            #
-            # The first RotateEvent in a binlog file has a timestamp of
-            # zero.  If the server has moved to a new log and not written a
-            # timestamped RotateEvent at the end of the previous log, the
-            # RotateEvent at the beginning of the new log will be ignored
-            # if the caller provided a positive ``skip_to_timestamp``
-            # value.  This will result in the ``table_map`` becoming
-            # corrupt.
-            #
-            # https://dev.mysql.com/doc/internals/en/event-data-for-specific-event-types.html
-            # From the MySQL Internals Manual:
-            #
-            #   ROTATE_EVENT is generated locally and written to the binary
-            #   log on the master. It is written to the relay log on the
-            #   slave when FLUSH LOGS occurs, and when receiving a
-            #   ROTATE_EVENT from the master. In the latter case, there
-            #   will be two rotate events in total originating on different
-            #   servers.
-            #
-            #   There are conditions under which the terminating
-            #   log-rotation event does not occur. For example, the server
-            #   might crash.
-            if self.skip_to_timestamp and binlog_event.timestamp < self.skip_to_timestamp:
-                continue
-
-            if binlog_event.event_type == TABLE_MAP_EVENT and \
-                    binlog_event.event is not None:
-                self.table_map[binlog_event.event.table_id] = \
-                    binlog_event.event.get_table()
-
-            # event is none if we have filter it on packet level
-            # we filter also not allowed events
-            if binlog_event.event is None or (binlog_event.event.__class__ not in self.__allowed_events):
-                continue
-
-            return binlog_event.event
-
-    def _allowed_event_list(self, only_events, ignored_events,
-                            filter_non_implemented_events):
-        if only_events is not None:
-            events = set(only_events)
-        else:
-            events = set((
-                QueryEvent,
-                RotateEvent,
-                StopEvent,
-                FormatDescriptionEvent,
-                XidEvent,
-                GtidEvent,
-                BeginLoadQueryEvent,
-                ExecuteLoadQueryEvent,
-                UpdateRowsEvent,
-                WriteRowsEvent,
-                DeleteRowsEvent,
-                TableMapEvent,
-                HeartbeatLogEvent,
-                NotImplementedEvent,
-                ))
-        if ignored_events is not None:
-            for e in ignored_events:
-                events.remove(e)
-        if filter_non_implemented_events:
-            try:
-                events.remove(NotImplementedEvent)
-            except KeyError:
-                pass
-        return frozenset(events)
+            binlog_event = self._decode_packet(pkt)
+            if binlog_event is not None:
+                return binlog_event
 
-    def __get_table_information(self, schema, table):
-        for i in range(1, 3):
-            try:
-                if not self.__connected_ctl:
-                    self.__connect_to_ctl()
+    def _connect(self):
+        """Open the binlog dump connection and the ctl connection unless they are open"""
+        if not self.__connected_stream:
+            self.__connect_to_stream()
 
-                cur = self._ctl_connection.cursor()
-                cur.execute("""
-                    SELECT
-                        COLUMN_NAME, COLLATION_NAME, CHARACTER_SET_NAME,
-                        COLUMN_COMMENT, COLUMN_TYPE, COLUMN_KEY, ORDINAL_POSITION
-                    FROM
-                        information_schema.columns
-                    WHERE
-                        table_schema = %s AND table_name = %s
-                    ORDER BY ORDINAL_POSITION
-                    """, (schema, table))
+        if not self._connected_ctl:
+            self._connect_to_ctl()
 
-                return cur.fetchall()
-            except pymysql.OperationalError as error:
-                code, message = error.args
-                if code in MYSQL_EXPECTED_ERROR_CODES:
-                    self.__connected_ctl = False
-                    continue
-                else:
-                    raise error
+    def _close_stream(self):
+        """Close the binlog dump connection, fetchone opens it again at log_file and log_pos"""
+        self._stream_connection.close()
+        self.__connected_stream = False
 
-    def __iter__(self):
-        return iter(self.fetchone, None)
+    def _update_position(self, log_pos, binlog_event=None):
+        """Follow log_pos of the event headers and RotateEvents"""
+        if binlog_event is not None and binlog_event.event_type == ROTATE_EVENT:
+            self.log_pos = binlog_event.event.position
+            self.log_file = binlog_event.event.next_binlog
+            # Table Id in binlog are NOT persistent in MySQL - they are in-memory identifiers
+            # that means that when MySQL master restarts, it will reuse same table id for different tables
+            # which will cause errors for us since our in-memory map will try to decode row data with
+            # wrong table schema.
+            # The fix is to rely on the fact that MySQL will also rotate to a new binlog file every time it
+            # restarts. That means every rotation we see *could* be a sign of restart and so potentially
+            # invalidates all our cached table id to schema mappings. This means we have to load them all
+            # again for each logfile which is potentially wasted effort but we can't really do much better
+            # without being broken in restart case
+            self.table_map = {}
+            self._ignored_table_ids = set()
+        elif log_pos:
+            self.log_pos = log_pos
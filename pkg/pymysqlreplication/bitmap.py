@@ -1,37 +1,37 @@
 # -*- coding: utf-8 -*-
+import binascii
+
+# Indexes of the bits set in a byte
+bitIndexesInByte = [tuple(i for i in range(8) if byte & (1 << i)) for byte in range(256)]
+
+
+# The bitmap as an integer, bit i of the bitmap is bit i of the integer
+if hasattr(int, 'from_bytes'):
+    def BitInt(bitmap):
+        return int.from_bytes(bitmap, 'little')
+else:
+    def BitInt(bitmap):
+        return int(binascii.hexlify(bitmap[::-1]), 16) if bitmap else 0
 
-bitCountInByte = [
-    0, 1, 1, 2, 1, 2, 2, 3, 1, 2, 2, 3, 2, 3, 3, 4,
-    1, 2, 2, 3, 2, 3, 3, 4, 2, 3, 3, 4, 3, 4, 4, 5,
-    1, 2, 2, 3, 2, 3, 3, 4, 2, 3, 3, 4, 3, 4, 4, 5,
-    2, 3, 3, 4, 3, 4, 4, 5, 3, 4, 4, 5, 4, 5, 5, 6,
-    1, 2, 2, 3, 2, 3, 3, 4, 2, 3, 3, 4, 3, 4, 4, 5,
-    2, 3, 3, 4, 3, 4, 4, 5, 3, 4, 4, 5, 4, 5, 5, 6,
-    2, 3, 3, 4, 3, 4, 4, 5, 3, 4, 4, 5, 4, 5, 5, 6,
-    3, 4, 4, 5, 4, 5, 5, 6, 4, 5, 5, 6, 5, 6, 6, 7,
-    1, 2, 2, 3, 2, 3, 3, 4, 2, 3, 3, 4, 3, 4, 4, 5,
-    2, 3, 3, 4, 3, 4, 4, 5, 3, 4, 4, 5, 4, 5, 5, 6,
-    2, 3, 3, 4, 3, 4, 4, 5, 3, 4, 4, 5, 4, 5, 5, 6,
-    3, 4, 4, 5, 4, 5, 5, 6, 4, 5, 5, 6, 5, 6, 6, 7,
-    2, 3, 3, 4, 3, 4, 4, 5, 3, 4, 4, 5, 4, 5, 5, 6,
-    3, 4, 4, 5, 4, 5, 5, 6, 4, 5, 5, 6, 5, 6, 6, 7,
-    3, 4, 4, 5, 4, 5, 5, 6, 4, 5, 5, 6, 5, 6, 6, 7,
-    4, 5, 5, 6, 5, 6, 6, 7, 5, 6, 6, 7, 6, 7, 7, 8,
-]
 
 # Calculate totol bit counts in a bitmap
 def BitCount(bitmap):
-    n = 0
-    for i in range(0, len(bitmap)):
-        bit = bitmap[i]
-        if type(bit) is str:
-            bit = ord(bit)
-        n += bitCountInByte[bit]
-    return n
+    return bin(BitInt(bitmap)).count('1')
+
 
 # Get the bit set at offset position in bitmap
 def BitGet(bitmap, position):
-    bit = bitmap[int(position / 8)]
+    bit = bitmap[position >> 3]
     if type(bit) is str:
         bit = ord(bit)
     return bit & (1 << (position & 7))
+
+
+# Indexes of the bits set in bitmap, in increasing order
+def BitIndexes(bitmap):
+    indexes = []
+    for i, byte in enumerate(bytearray(bitmap)):
+        if byte:
+            offset = i << 3
+            indexes.extend([offset + j for j in bitIndexesInByte[byte]])
+    return tuple(indexes)
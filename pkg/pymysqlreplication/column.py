@@ -24,6 +24,7 @@ class Column(object):
         self.unsigned = column_schema["COLUMN_TYPE"].find("unsigned") != -1
         self.type_is_bool = False
         self.is_primary = column_schema["COLUMN_KEY"] == "PRI"
+        self.is_unique = column_schema["COLUMN_KEY"] == "UNI"
 
         if self.type == FIELD_TYPE.VARCHAR:
             self.max_length = struct.unpack('<H', packet.read(2))[0]
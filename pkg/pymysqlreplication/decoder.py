@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+"""Row decoder plans.
+
+The reader of every column is resolved once per table definition, so decoding
+a row of a RowsEvent calls the readers in column order without looking at
+column types again.
+"""
+
+import struct
+import decimal
+import datetime
+from collections import OrderedDict
+from operator import methodcaller
+
+from ..pymysql._compat import PY2
+from ..pymysql.charset import charset_to_encoding
+
+from .constants import FIELD_TYPE
+from .bitmap import BitCount, BitIndexes
+from .temporal import (
+    datetime2_reader,
+    time2_reader,
+    timestamp2_reader,
+    timestamp2_value,
+    read_date,
+    read_datetime,
+    read_time,
+    read_timestamp,
+)
+
+# plans of different table definitions kept at the same time
+MAX_PLANS = 1024
+# compiled row layouts of a table, one per columns-present and NULL bitmap
+MAX_ROW_LAYOUTS = 256
+
+COMPRESSED_BYTES = [0, 1, 1, 2, 2, 3, 3, 4, 4, 4]
+DIGITS_PER_INTEGER = 9
+
+# struct format of columns read as is, (signed, unsigned)
+FIXED_FORMATS = {
+    FIELD_TYPE.TINY: ('b', 'B'),
+    FIELD_TYPE.SHORT: ('h', 'H'),
+    FIELD_TYPE.LONG: ('i', 'I'),
+    FIELD_TYPE.LONGLONG: ('q', 'Q'),
+    FIELD_TYPE.FLOAT: ('f', 'f'),
+    FIELD_TYPE.DOUBLE: ('d', 'd'),
+}
+
+LENGTH_STRUCTS = {
+    1: struct.Struct('<B'),
+    2: struct.Struct('<H'),
+    4: struct.Struct('<I'),
+}
+
+
+def fixed_format(column):
+    """struct format of a fixed width column, None for the other columns"""
+    formats = FIXED_FORMATS.get(column.type)
+    return formats and formats[bool(column.unsigned)]
+
+
+def row_format(column):
+    """(struct format, convert) of a column of fixed width, None for the other columns.
+
+    convert turns the unpacked value into the column value, None if it is the value.
+    """
+    fmt = fixed_format(column)
+    if fmt:
+        return fmt, None
+    elif column.type == FIELD_TYPE.TIMESTAMP:
+        return 'I', datetime.datetime.fromtimestamp
+    elif column.type == FIELD_TYPE.TIMESTAMP2 and not column.fsp:
+        return '4s', timestamp2_value
+    return None
+
+
+def _unpack_reader(fmt):
+    fixed = struct.Struct(fmt)
+
+    def read(packet):
+        return packet.unpack(fixed)[0]
+    return read
+
+
+def _string_reader(size, column):
+    """Pascal string of `size` length bytes, decoded with the column charset"""
+    encoding = None
+    if column.character_set_name is not None:
+        encoding = charset_to_encoding(column.character_set_name)
+    length_struct = LENGTH_STRUCTS.get(size)
+
+    def read(packet):
+        if length_struct is not None:
+            length = packet.unpack(length_struct)[0]
+        else:
+            length = packet.read_uint_by_size(size)
+        string = packet.read(length)
+        if encoding is not None:
+            string = string.decode(encoding)
+        return string
+    return read
+
+
+class Literal(object):
+    """SQL text of a value, written to SQL as is"""
+
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return 'Literal(%r)' % self.text
+
+    def __eq__(self, other):
+        return isinstance(other, Literal) and self.text == other.text
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.text)
+
+
+_decimal_layouts = {}
+
+
+def decimal_layout(precision, decimals):
+    """Return (struct, joins, masks, format, sign, strip) reading DECIMAL(precision, decimals).
+
+    Digits are stored in groups of 9 digits in 4 bytes big endian, the
+    leading integral and trailing fractional digits in as few bytes as they
+    take. A group of 3 bytes is unpacked as 1 and 2 bytes, joins tells which
+    struct items start such a group, None if there is none. masks invert the
+    groups of a negative value, sign is the sign bit of the first group and
+    format prints the groups as a digit string, with leading zeros if strip.
+    """
+    key = (precision, decimals)
+    layout = _decimal_layouts.get(key)
+    if layout is None:
+        uncomp_integral, comp_integral = divmod(precision - decimals, DIGITS_PER_INTEGER)
+        uncomp_fractional, comp_fractional = divmod(decimals, DIGITS_PER_INTEGER)
+
+        integral = [4] * uncomp_integral
+        if comp_integral:
+            integral.insert(0, COMPRESSED_BYTES[comp_integral])
+        fractional = [4] * uncomp_fractional
+        if comp_fractional:
+            fractional.append(COMPRESSED_BYTES[comp_fractional])
+        sizes = integral + fractional
+
+        text = '%d' + '%09d' * (len(integral) - 1) if integral else '0'
+        if fractional:
+            text += '.' + '%09d' * uncomp_fractional
+            if comp_fractional:
+                text += '%%0%dd' % comp_fractional
+
+        fmt = '>' + ''.join({1: 'B', 2: 'H', 3: 'BH', 4: 'I'}[size] for size in sizes)
+        joins = None
+        if 3 in sizes:
+            joins, index = [], 0
+            for size in sizes:
+                joins.append((index, size == 3))
+                index += 2 if size == 3 else 1
+            joins = tuple(joins)
+        masks = tuple((1 << size * 8) - 1 for size in sizes)
+        sign = 0x80 << (sizes[0] - 1) * 8
+        layout = _decimal_layouts[key] = (struct.Struct(fmt), joins, masks, text, sign, len(integral) > 1)
+    return layout
+
+
+def _new_decimal_reader(column, literal_values=False):
+    """Read MySQL's new decimal format introduced in MySQL 5"""
+
+    # This project was a great source of inspiration for
+    # understanding this storage format.
+    # https://github.com/jeremycole/mysql_binlog
+
+    fixed, joins, masks, text, sign, strip = decimal_layout(column.precision, column.decimals)
+    convert = Literal if literal_values else decimal.Decimal
+
+    def read(packet):
+        values = packet.unpack(fixed)
+        if joins is not None:
+            values = tuple([values[i] << 16 | values[i + 1] if join else values[i] for i, join in joins])
+        # The sign is encoded in the high bit of the first group, the bits
+        # of a negative value are inverted
+        first = values[0]
+        values = (first ^ sign,) + values[1:]
+        if first & sign:
+            res = text % values
+        else:
+            res = '-' + text % tuple([value ^ mask for value, mask in zip(values, masks)])
+        if strip:
+            res = _strip_integral(res)
+        return convert(res)
+    return read
+
+
+def _strip_integral(text):
+    """Drop the leading zeros of the integral part of a decimal digit string"""
+    sign = '-' if text[0] == '-' else ''
+    digits = text[len(sign):].lstrip('0')
+    if not digits or digits[0] == '.':
+        digits = '0' + digits
+    return sign + digits
+
+
+def _bit_reader(column):
+    """Read MySQL BIT type"""
+    def read(packet):
+        resp = ""
+        for byte in range(0, column.bytes):
+            current_byte = ""
+            data = packet.read_uint8()
+            if byte == 0:
+                if column.bytes == 1:
+                    end = column.bits
+                else:
+                    end = column.bits % 8
+                    if end == 0:
+                        end = 8
+            else:
+                end = 8
+            for bit in range(0, end):
+                if data & (1 << bit):
+                    current_byte += "1"
+                else:
+                    current_byte += "0"
+            resp += current_byte[::-1]
+        return resp
+    return read
+
+
+def _enum_reader(column):
+    def read(packet):
+        return column.enum_values[packet.read_uint_by_size(column.size)]
+    return read
+
+
+def _set_reader(column):
+    # We read set columns as a bitmap telling us which options
+    # are enabled
+    def read(packet):
+        bit_mask = packet.read_uint_by_size(column.size)
+        return set(
+            val for idx, val in enumerate(column.set_values)
+            if bit_mask & 2 ** idx
+        ) or None
+    return read
+
+
+def _not_implemented_reader(column):
+    def read(packet):
+        raise NotImplementedError("Unknown MySQL column type: %d" %
+                                  (column.type))
+    return read
+
+
+def column_reader(column, literal_values=False):
+    """Return a callable reading one non NULL value of column from a packet.
+
+    With literal_values, DECIMAL and DATETIME2 values are read as their Literal SQL text,
+    JSON values as their JSON text.
+    """
+    fmt = fixed_format(column)
+    if fmt:
+        return _unpack_reader('<' + fmt)
+    elif column.type == FIELD_TYPE.INT24:
+        return methodcaller('read_uint24' if column.unsigned else 'read_int24')
+    elif column.type == FIELD_TYPE.VARCHAR or \
+            column.type == FIELD_TYPE.STRING:
+        return _string_reader(2 if column.max_length > 255 else 1, column)
+    elif column.type == FIELD_TYPE.NEWDECIMAL:
+        return _new_decimal_reader(column, literal_values)
+    elif column.type == FIELD_TYPE.BLOB:
+        return _string_reader(column.length_size, column)
+    elif column.type == FIELD_TYPE.DATETIME:
+        return read_datetime
+    elif column.type == FIELD_TYPE.TIME:
+        return read_time
+    elif column.type == FIELD_TYPE.DATE:
+        return read_date
+    elif column.type == FIELD_TYPE.TIMESTAMP:
+        return read_timestamp
+
+    # For new date format:
+    elif column.type == FIELD_TYPE.DATETIME2:
+        return datetime2_reader(column.fsp, Literal if literal_values else None)
+    elif column.type == FIELD_TYPE.TIME2:
+        return time2_reader(column.fsp)
+    elif column.type == FIELD_TYPE.TIMESTAMP2:
+        return timestamp2_reader(column.fsp)
+    elif column.type == FIELD_TYPE.YEAR:
+        return lambda packet: packet.read_uint8() + 1900
+    elif column.type == FIELD_TYPE.ENUM:
+        return _enum_reader(column)
+    elif column.type == FIELD_TYPE.SET:
+        return _set_reader(column)
+    elif column.type == FIELD_TYPE.BIT:
+        return _bit_reader(column)
+    elif column.type == FIELD_TYPE.GEOMETRY:
+        return lambda packet: packet.read_length_coded_pascal_string(column.length_size)
+    elif column.type == FIELD_TYPE.JSON:
+        return lambda packet: packet.read_binary_json(column.length_size, literal_values)
+    # a row image may leave the column out, so fail only when a value is read
+    return _not_implemented_reader(column)
+
+
+class DecoderPlan(object):
+    """Column readers of one table definition.
+
+    Which columns a row image has depends on the columns-present bitmap of
+    the event, which of them are NULL on the NULL bitmap of the row. Every
+    pair of bitmaps is compiled once into the steps reading the non NULL
+    columns of the row, where consecutive fixed width columns are read with a
+    single struct. At most MAX_ROW_LAYOUTS of them are kept, a full cache
+    evicts the least recently used one. Python 2 only tracks recency once
+    the cache is full, its OrderedDict is pure python.
+    """
+
+    def __init__(self, columns, literal_values=False):
+        self.columns = [(column.name, column_reader(column, literal_values), row_format(column))
+                        for column in columns]
+        self.names = tuple(column.name for column in columns)
+        self.__present = {}
+        self.__row_layouts = OrderedDict()
+
+    def present(self, cols_bitmap):
+        """Return the NULL bitmap length and the indexes of the columns of a row image"""
+        present = self.__present.get(cols_bitmap)
+        if present is None:
+            # null bitmap length = (bits set in 'columns-present-bitmap'+7)/8
+            # See http://dev.mysql.com/doc/internals/en/rows-event.html
+            null_bitmap_length = (BitCount(cols_bitmap) + 7) // 8
+            indexes = tuple(i for i in BitIndexes(cols_bitmap) if i < len(self.columns))
+            present = self.__present[cols_bitmap] = (null_bitmap_length, indexes)
+        return present
+
+    def row_layout(self, cols_bitmap, null_bitmap):
+        """Return the steps and converters reading a row image.
+
+        A step is (struct, names, None) reading a run of fixed width columns,
+        or (None, name, reader) reading one column. A converter (name,
+        convert) turns a value unpacked by a struct into the column value.
+        """
+        key = cols_bitmap + null_bitmap
+        layout = self.__row_layouts.get(key)
+        if layout is not None:
+            if not PY2:
+                self.__row_layouts.move_to_end(key)
+            elif len(self.__row_layouts) >= MAX_ROW_LAYOUTS:
+                self.__row_layouts[key] = self.__row_layouts.pop(key)
+            return layout
+
+        nulls = frozenset(BitIndexes(null_bitmap))
+        steps, converters, run = [], [], []
+        for index, i in enumerate(self.present(cols_bitmap)[1]):
+            if index in nulls:
+                continue
+            column = self.columns[i]
+            if column[2] is None:
+                self.__add_run(steps, converters, run)
+                run = []
+                steps.append((None, column[0], column[1]))
+            else:
+                run.append(column)
+        self.__add_run(steps, converters, run)
+
+        if len(self.__row_layouts) >= MAX_ROW_LAYOUTS:
+            self.__row_layouts.popitem(last=False)
+        layout = self.__row_layouts[key] = (tuple(steps), tuple(converters))
+        return layout
+
+    @staticmethod
+    def __add_run(steps, converters, run):
+        if len(run) == 1:
+            name, reader, _ = run[0]
+            steps.append((None, name, reader))
+        elif run:
+            steps.append((struct.Struct('<' + ''.join(fmt for _, _, (fmt, _) in run)),
+                          tuple(name for name, _, _ in run), None))
+            converters.extend((name, convert) for name, _, (_, convert) in run if convert is not None)
+
+    def read_row(self, packet, cols_bitmap):
+        """Read one row image, return a dict of column values"""
+        steps, converters = self.row_layout(cols_bitmap, packet.read(self.present(cols_bitmap)[0]))
+        # NULL and absent columns keep None, values stay in column order
+        values = dict.fromkeys(self.names)
+        for fixed, names, reader in steps:
+            if fixed is None:
+                values[names] = reader(packet)
+            else:
+                values.update(zip(names, packet.unpack(fixed)))
+        for name, convert in converters:
+            values[name] = convert(values[name])
+        return values
+
+
+_plans = {}
+
+
+def column_signature(column):
+    return tuple(sorted((k, tuple(v) if isinstance(v, list) else v)
+                        for k, v in column.data.items()))
+
+
+def decoder_plan(table, literal_values=False):
+    """Return the DecoderPlan of table, shared by tables of the same table id and columns"""
+    key = (table.table_id, tuple(column_signature(column) for column in table.columns), literal_values)
+    plan = _plans.get(key)
+    if plan is None:
+        if len(_plans) >= MAX_PLANS:
+            _plans.clear()
+        plan = _plans[key] = DecoderPlan(table.columns, literal_values)
+    return plan
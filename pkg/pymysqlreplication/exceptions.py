@@ -6,3 +6,13 @@ class TableMetadataUnavailableError(Exception):
 class BinLogNotEnabled(Exception):
     def __init__(self):
         Exception.__init__(self, "MySQL binary logging is not enabled.")
+
+
+class BinLogChecksumError(Exception):
+    def __init__(self, log_file, log_pos):
+        Exception.__init__(self, "Binlog checksum mismatch in {0} at {1}".format(log_file, log_pos))
+        self.log_file, self.log_pos = log_file, log_pos
+
+    def __reduce__(self):
+        # raised in the worker processes of --parallel, pickled back to the parent
+        return self.__class__, (self.log_file, self.log_pos)
@@ -334,3 +334,40 @@ class GtidSet(object):
 
     def __eq__(self, other):
         return self.gtids == other.gtids
+
+
+class GtidFilter(object):
+    """Transactions to read by their GTID, tested on the raw sid and gno of
+    a GtidEvent so the events of other transactions are dropped unparsed.
+
+    include: GtidSet or its text, only transactions in it are read
+    exclude: GtidSet or its text, transactions in it are not read
+    Transactions without GTID, of an ANONYMOUS_GTID_LOG_EVENT, are read
+    unless include is given.
+    """
+    def __init__(self, include=None, exclude=None):
+        self.include = self._intervals(include)
+        self.exclude = self._intervals(exclude)
+
+    @staticmethod
+    def _intervals(gtid_set):
+        """{sid as 16 bytes: [intervals]} of gtid_set"""
+        if gtid_set is None:
+            return None
+        if not isinstance(gtid_set, GtidSet):
+            gtid_set = GtidSet(gtid_set)
+        intervals = {}
+        for gtid in gtid_set.gtids:
+            sid = binascii.unhexlify(str(gtid.sid).replace('-', ''))
+            intervals.setdefault(sid, []).extend(gtid.intervals)
+        return intervals
+
+    @staticmethod
+    def _contains(intervals, sid, gno):
+        return any(start <= gno < end for start, end in intervals.get(sid, ()))
+
+    def match(self, sid, gno):
+        """True if the transaction of sid, 16 bytes, and gno is read"""
+        if self.include is not None and not self._contains(self.include, sid, gno):
+            return False
+        return self.exclude is None or not self._contains(self.exclude, sid, gno)
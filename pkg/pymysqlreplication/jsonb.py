@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""JSON column codec.
+
+MySQL 5.7 stores a JSON value as a type byte followed by the value. An
+object or array holds its element count and its size in bytes, an entry
+per key and per value, then the keys and values the entries point at, with
+offsets from the start of the object or array. Small scalars are inlined in
+their value entry.
+
+The decoder reads every entry at its absolute position in the buffer of the
+event, and keeps the objects and arrays left to read on a stack instead of
+recursing into them, so deeply nested documents do not run into the
+recursion limit.
+"""
+
+import re
+import struct
+from json.encoder import encode_basestring, encode_basestring_ascii
+
+from ..pymysql._compat import PY2
+
+JSONB_TYPE_SMALL_OBJECT = 0x0
+JSONB_TYPE_LARGE_OBJECT = 0x1
+JSONB_TYPE_SMALL_ARRAY = 0x2
+JSONB_TYPE_LARGE_ARRAY = 0x3
+JSONB_TYPE_LITERAL = 0x4
+JSONB_TYPE_INT16 = 0x5
+JSONB_TYPE_UINT16 = 0x6
+JSONB_TYPE_INT32 = 0x7
+JSONB_TYPE_UINT32 = 0x8
+JSONB_TYPE_INT64 = 0x9
+JSONB_TYPE_UINT64 = 0xA
+JSONB_TYPE_DOUBLE = 0xB
+JSONB_TYPE_STRING = 0xC
+JSONB_TYPE_OPAQUE = 0xF
+
+JSONB_LITERAL_NULL = 0x0
+JSONB_LITERAL_TRUE = 0x1
+JSONB_LITERAL_FALSE = 0x2
+
+LITERALS = {
+    JSONB_LITERAL_NULL: None,
+    JSONB_LITERAL_TRUE: True,
+    JSONB_LITERAL_FALSE: False,
+}
+LITERAL_TEXTS = {
+    JSONB_LITERAL_NULL: 'null',
+    JSONB_LITERAL_TRUE: 'true',
+    JSONB_LITERAL_FALSE: 'false',
+}
+
+# scalars stored at an offset and read as is
+SCALAR_STRUCTS = {
+    JSONB_TYPE_INT16: struct.Struct('<h'),
+    JSONB_TYPE_UINT16: struct.Struct('<H'),
+    JSONB_TYPE_INT32: struct.Struct('<i'),
+    JSONB_TYPE_UINT32: struct.Struct('<I'),
+    JSONB_TYPE_INT64: struct.Struct('<q'),
+    JSONB_TYPE_UINT64: struct.Struct('<Q'),
+    JSONB_TYPE_DOUBLE: struct.Struct('<d'),
+}
+
+# (count and size, key entry format, value entry format, inlined types) of
+# small and large objects and arrays. The low bit of the type tells them apart
+LAYOUTS = (
+    (struct.Struct('<HH'), 'HH', 'BH',
+     frozenset([JSONB_TYPE_LITERAL, JSONB_TYPE_INT16, JSONB_TYPE_UINT16])),
+    (struct.Struct('<II'), 'IH', 'BI',
+     frozenset([JSONB_TYPE_LITERAL, JSONB_TYPE_INT16, JSONB_TYPE_UINT16,
+                JSONB_TYPE_INT32, JSONB_TYPE_UINT32])),
+)
+
+# entry structs and key texts kept at the same time
+MAX_ENTRY_STRUCTS = 1024
+MAX_KEY_TEXTS = 4096
+
+NON_ASCII = re.compile(b'[\x80-\xff]')
+
+# (entry format, count): struct of count entries
+_entry_structs = {}
+# raw key: its quoted json text followed by ': '
+_key_texts = {}
+
+if PY2:
+    def _uint8(data, pos):
+        return ord(data[pos])
+
+    def _bytes(data, start, end):
+        return data[start:end]
+
+    def _quote(data, start, end):
+        string = data[start:end]
+        # the C encoder of json escapes ascii strings alike
+        if NON_ASCII.search(string) is None:
+            return encode_basestring_ascii(string)
+        return encode_basestring(string.decode('utf-8'))
+else:
+    def _uint8(data, pos):
+        return data[pos]
+
+    def _bytes(data, start, end):
+        return data[start:end].tobytes()
+
+    def _quote(data, start, end):
+        return encode_basestring(str(data[start:end], 'utf-8'))
+
+
+def _string(data, pos):
+    """(start, end) of the string at pos, after its variable length: 7 bits
+    per byte, the high bit set on every byte but the last one"""
+    length = shift = 0
+    while True:
+        byte = _uint8(data, pos)
+        pos += 1
+        length |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return pos, pos + length
+        shift += 7
+
+
+def _inlined(t, value):
+    """Value of type t inlined in the unsigned offset of a value entry"""
+    if t == JSONB_TYPE_LITERAL:
+        return LITERALS.get(value & 0xff)
+    elif t == JSONB_TYPE_INT16:
+        value &= 0xffff
+        return value - 0x10000 if value & 0x8000 else value
+    elif t == JSONB_TYPE_UINT16:
+        return value & 0xffff
+    elif t == JSONB_TYPE_INT32:
+        return value - 0x100000000 if value & 0x80000000 else value
+    return value
+
+
+def _scalar(data, t, pos):
+    fixed = SCALAR_STRUCTS.get(t)
+    if fixed is not None:
+        return fixed.unpack_from(data, pos)[0]
+    elif t == JSONB_TYPE_STRING:
+        start, end = _string(data, pos)
+        return _bytes(data, start, end)
+    elif t == JSONB_TYPE_LITERAL:
+        return LITERALS.get(_uint8(data, pos))
+    raise ValueError('Json type %d is not handled' % t)
+
+
+def _scalar_text(data, t, pos):
+    if t == JSONB_TYPE_STRING:
+        start, end = _string(data, pos)
+        return _quote(data, start, end)
+    elif t == JSONB_TYPE_DOUBLE:
+        return float.__repr__(SCALAR_STRUCTS[t].unpack_from(data, pos)[0])
+    elif t == JSONB_TYPE_LITERAL:
+        return LITERAL_TEXTS.get(_uint8(data, pos), 'null')
+    return '%d' % _scalar(data, t, pos)
+
+
+def _key_text(data, start, end):
+    key = _bytes(data, start, end)
+    text = _key_texts.get(key)
+    if text is None:
+        if len(_key_texts) >= MAX_KEY_TEXTS:
+            _key_texts.clear()
+        text = _key_texts[key] = _quote(data, start, end) + ': '
+    return text
+
+
+def _entry_struct(fmt, count):
+    fixed = _entry_structs.get((fmt, count))
+    if fixed is None:
+        if len(_entry_structs) >= MAX_ENTRY_STRUCTS:
+            _entry_structs.clear()
+        fixed = _entry_structs[fmt, count] = struct.Struct('<' + fmt * count)
+    return fixed
+
+
+def _entries(data, t, start, end, key):
+    """Keys and value entries of the object or array of type t at start.
+
+    keys is None for an array, or key(data, key start, key end) of every key.
+    The value entries are a flat (type, offset or inlined value, ...) tuple.
+    """
+    head, key_entry, value_entry, inlined = LAYOUTS[t & 1]
+    count, size = head.unpack_from(data, start)
+    if start + size > end:
+        raise ValueError('Json length is larger than packet length')
+    pos = start + head.size
+    keys = None
+    if t <= JSONB_TYPE_LARGE_OBJECT:
+        fixed = _entry_struct(key_entry, count)
+        offsets = fixed.unpack_from(data, pos)
+        pos += fixed.size
+        keys = [key(data, start + offsets[i], start + offsets[i] + offsets[i + 1])
+                for i in range(0, 2 * count, 2)]
+    return keys, _entry_struct(value_entry, count).unpack_from(data, pos), inlined
+
+
+def decode_value(data, offset, length):
+    """Value of the JSON document of length bytes at offset of data, None if it is empty.
+
+    Objects are read as dicts, arrays as lists and strings as bytes, keys
+    included.
+    """
+    if not length:
+        return None
+    if not PY2:
+        data = memoryview(data)
+    end = offset + length
+    t = _uint8(data, offset)
+    if t > JSONB_TYPE_LARGE_ARRAY:
+        return _scalar(data, t, offset + 1)
+
+    root = {} if t <= JSONB_TYPE_LARGE_OBJECT else []
+    # objects and arrays created but not read yet, filled in any order
+    pending = [(root, t, offset + 1)]
+    while pending:
+        out, t, start = pending.pop()
+        keys, entries, inlined = _entries(data, t, start, end, _bytes)
+        values = []
+        for i in range(0, len(entries), 2):
+            value_type, value = entries[i], entries[i + 1]
+            if value_type in inlined:
+                value = _inlined(value_type, value)
+            elif value_type <= JSONB_TYPE_LARGE_ARRAY:
+                pending.append(([] if value_type & 2 else {}, value_type, start + value))
+                value = pending[-1][0]
+            else:
+                value = _scalar(data, value_type, start + value)
+            values.append(value)
+        if keys is None:
+            out.extend(values)
+        else:
+            out.update(zip(keys, values))
+    return root
+
+
+def decode_text(data, offset, length):
+    """JSON text of the JSON document of length bytes at offset of data, None if it is empty.
+
+    The text is the one of json.dumps(value, ensure_ascii=False), with the
+    keys of an object in their stored order.
+    """
+    if not length:
+        return None
+    if not PY2:
+        data = memoryview(data)
+    end = offset + length
+    t = _uint8(data, offset)
+    if t > JSONB_TYPE_LARGE_ARRAY:
+        return _scalar_text(data, t, offset + 1)
+
+    parts = []
+    # texts to write and (type, start) of objects and arrays to read, the next one last
+    pending = [(t, offset + 1)]
+    while pending:
+        item = pending.pop()
+        if type(item) is not tuple:
+            parts.append(item)
+            continue
+        t, start = item
+        keys, entries, inlined = _entries(data, t, start, end, _key_text)
+        tokens = []
+        for i in range(0, len(entries), 2):
+            value_type, value = entries[i], entries[i + 1]
+            if keys is None:
+                prefix = ', ' if i else ''
+            else:
+                prefix = ', ' + keys[i // 2] if i else keys[0]
+            if value_type == JSONB_TYPE_LITERAL:
+                tokens.append(prefix + LITERAL_TEXTS.get(value & 0xff, 'null'))
+            elif value_type in inlined:
+                tokens.append(prefix + '%d' % _inlined(value_type, value))
+            elif value_type <= JSONB_TYPE_LARGE_ARRAY:
+                tokens.append(prefix)
+                tokens.append((value_type, start + value))
+            else:
+                tokens.append(prefix + _scalar_text(data, value_type, start + value))
+        if t & 2:
+            parts.append('[')
+            tokens.append(']')
+        else:
+            parts.append('{')
+            tokens.append('}')
+        tokens.reverse()
+        pending.extend(tokens)
+    return u''.join(parts)
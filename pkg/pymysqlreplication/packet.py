@@ -2,8 +2,10 @@
 
 import struct
 
+from ..pymysql._compat import PY2
 from ..pymysql.util import byte2int
-import constants, event, row_event
+from . import constants, event, row_event
+from .jsonb import decode_text, decode_value
 #from pymysqlreplication import constants, event, row_event
 
 # Constants from PyMYSQL source code
@@ -18,38 +20,62 @@ UNSIGNED_INT24_LENGTH = 3
 UNSIGNED_INT64_LENGTH = 8
 
 
-JSONB_TYPE_SMALL_OBJECT = 0x0
-JSONB_TYPE_LARGE_OBJECT = 0x1
-JSONB_TYPE_SMALL_ARRAY = 0x2
-JSONB_TYPE_LARGE_ARRAY = 0x3
-JSONB_TYPE_LITERAL = 0x4
-JSONB_TYPE_INT16 = 0x5
-JSONB_TYPE_UINT16 = 0x6
-JSONB_TYPE_INT32 = 0x7
-JSONB_TYPE_UINT32 = 0x8
-JSONB_TYPE_INT64 = 0x9
-JSONB_TYPE_UINT64 = 0xA
-JSONB_TYPE_DOUBLE = 0xB
-JSONB_TYPE_STRING = 0xC
-JSONB_TYPE_OPAQUE = 0xF
-
-JSONB_LITERAL_NULL = 0x0
-JSONB_LITERAL_TRUE = 0x1
-JSONB_LITERAL_FALSE = 0x2
-
-
-def read_offset_or_inline(packet, large):
-    t = packet.read_uint8()
-
-    if t in (JSONB_TYPE_LITERAL,
-             JSONB_TYPE_INT16, JSONB_TYPE_UINT16):
-        return (t, None, packet.read_binary_json_type_inlined(t))
-    if large and t in (JSONB_TYPE_INT32, JSONB_TYPE_UINT32):
-        return (t, None, packet.read_binary_json_type_inlined(t))
-
-    if large:
-        return (t, packet.read_uint32(), None)
-    return (t, packet.read_uint16(), None)
+HEADER = struct.Struct('<cIcIIIH')
+INT8 = struct.Struct('<b')
+UINT8 = struct.Struct('<B')
+INT16 = struct.Struct('<h')
+UINT16 = struct.Struct('<H')
+UINT24 = struct.Struct('<HB')
+INT32 = struct.Struct('<i')
+UINT32 = struct.Struct('<I')
+UINT40 = struct.Struct('<BI')
+UINT48 = struct.Struct('<HHH')
+UINT56 = struct.Struct('<BHI')
+INT64 = struct.Struct('<q')
+UINT64 = struct.Struct('<Q')
+DOUBLE = struct.Struct('<d')
+INT8_BE = struct.Struct('>b')
+INT16_BE = struct.Struct('>h')
+INT24_BE = struct.Struct('>BH')
+INT32_BE = struct.Struct('>i')
+INT40_BE = struct.Struct('>IB')
+INT64_BE = struct.Struct('>q')
+TABLE_ID = struct.Struct('<IH')
+
+# timestamp, event_type and log_pos of the header, after the OK byte
+PEEK_HEADER = struct.Struct('<IBxxxxxxxxI')
+# events starting with the 6 bytes table id
+TABLE_EVENTS = frozenset([
+    constants.TABLE_MAP_EVENT,
+    constants.WRITE_ROWS_EVENT_V1, constants.UPDATE_ROWS_EVENT_V1, constants.DELETE_ROWS_EVENT_V1,
+    constants.WRITE_ROWS_EVENT_V2, constants.UPDATE_ROWS_EVENT_V2, constants.DELETE_ROWS_EVENT_V2])
+# events starting a transaction, with the sid and gno of its GTID
+GTID_EVENTS = frozenset([constants.GTID_LOG_EVENT, constants.ANONYMOUS_GTID_LOG_EVENT])
+# events outside of transactions, read in transactions skipped by GTID too
+NON_TRANSACTION_EVENTS = frozenset([
+    constants.ROTATE_EVENT, constants.FORMAT_DESCRIPTION_EVENT, constants.STOP_EVENT,
+    constants.HEARTBEAT_LOG_EVENT, constants.PREVIOUS_GTIDS_LOG_EVENT])
+# sid and gno of an event of GTID_EVENTS, after the commit flag
+PEEK_GTID = struct.Struct('<16sQ')
+
+
+# Readers peek at the raw packet to drop events without building any event
+# object. offset is the position of the OK byte before the event header,
+# like BinLogPacketWrapper.
+def peek_header(data, offset=0):
+    """(timestamp, event_type, log_pos) of the event"""
+    return PEEK_HEADER.unpack_from(data, offset + 1)
+
+
+def peek_table_id(data, offset=0):
+    """Table id of an event of TABLE_EVENTS"""
+    low, high = TABLE_ID.unpack_from(data, offset + 20)
+    return low | high << 32
+
+
+def peek_gtid(data, offset=0):
+    """(sid, gno) of an event of GTID_EVENTS, the sid as its 16 bytes"""
+    return PEEK_GTID.unpack_from(data, offset + 21)
 
 
 class BinLogPacketWrapper(object):
@@ -92,11 +118,15 @@ class BinLogPacketWrapper(object):
                  only_schemas,
                  ignored_schemas,
                  freeze_schema,
-                 fail_on_table_metadata_unavailable):
-        # -1 because we ignore the ok byte
-        self.read_bytes = 0
-        # Used when we want to override a value in the data buffer
-        self.__data_buffer = b''
+                 fail_on_table_metadata_unavailable,
+                 literal_values=False):
+        # Events are read in place from the data of the packet, with a
+        # cursor instead of slicing the data for every read. A local binlog
+        # packet starts at `offset`, the byte before it stands for the OK byte.
+        data = from_packet.get_all_data()
+        self.__position = getattr(from_packet, 'offset', 0)
+        # py2 memoryview can not wrap mmap, and a str slice is the value itself
+        self.__data = data if PY2 else memoryview(data)
 
         self.packet = from_packet
         self.charset = ctl_connection.charset
@@ -107,7 +137,9 @@ class BinLogPacketWrapper(object):
         # server_id
         # log_pos
         # flags
-        unpack = struct.unpack('<cIcIIIH', self.packet.read(20))
+        unpack = self.unpack(HEADER)
+        # read_bytes counts the bytes of the event body
+        self.__start = self.__position
 
         # Header
         self.timestamp = unpack[1]
@@ -136,39 +168,40 @@ class BinLogPacketWrapper(object):
                                  only_schemas=only_schemas,
                                  ignored_schemas=ignored_schemas,
                                  freeze_schema=freeze_schema,
-                                 fail_on_table_metadata_unavailable=fail_on_table_metadata_unavailable)
+                                 fail_on_table_metadata_unavailable=fail_on_table_metadata_unavailable,
+                                 literal_values=literal_values)
         if self.event._processed == False:
             self.event = None
 
-    def read(self, size):
-        size = int(size)
-        self.read_bytes += size
-        if len(self.__data_buffer) > 0:
-            data = self.__data_buffer[:size]
-            self.__data_buffer = self.__data_buffer[size:]
-            if len(data) == size:
-                return data
-            else:
-                return data + self.packet.read(size - len(data))
-        return self.packet.read(size)
+    @property
+    def read_bytes(self):
+        return self.__position - self.__start
+
+    if PY2:
+        def read(self, size):
+            position = self.__position
+            self.__position = position + int(size)
+            return self.__data[position:self.__position]
+    else:
+        def read(self, size):
+            position = self.__position
+            self.__position = position + int(size)
+            return self.__data[position:self.__position].tobytes()
+
+    def unpack(self, fixed):
+        """Read the values of struct.Struct `fixed`"""
+        values = fixed.unpack_from(self.__data, self.__position)
+        self.__position += fixed.size
+        return values
 
     def unread(self, data):
-        '''Push again data in data buffer. It's use when you want
+        '''Move back over data, the bytes just read. It's use when you want
         to extract a bit from a value a let the rest of the code normally
         read the datas'''
-        self.read_bytes -= len(data)
-        self.__data_buffer += data
+        self.__position -= len(data)
 
     def advance(self, size):
-        size = int(size)
-        self.read_bytes += size
-        buffer_len = len(self.__data_buffer)
-        if buffer_len > 0:
-            self.__data_buffer = self.__data_buffer[size:]
-            if size > buffer_len:
-                self.packet.advance(size - buffer_len)
-        else:
-            self.packet.advance(size)
+        self.__position += int(size)
 
     def read_length_coded_binary(self):
         """Read a 'Length Coded Binary' number from the data buffer.
@@ -178,17 +211,17 @@ class BinLogPacketWrapper(object):
 
         From PyMYSQL source code
         """
-        c = byte2int(self.read(1))
+        c = self.read_uint8()
         if c == NULL_COLUMN:
             return None
         if c < UNSIGNED_CHAR_COLUMN:
             return c
         elif c == UNSIGNED_SHORT_COLUMN:
-            return self.unpack_uint16(self.read(UNSIGNED_SHORT_LENGTH))
+            return self.read_uint16()
         elif c == UNSIGNED_INT24_COLUMN:
-            return self.unpack_int24(self.read(UNSIGNED_INT24_LENGTH))
+            return self.read_uint24()
         elif c == UNSIGNED_INT64_COLUMN:
-            return self.unpack_int64(self.read(UNSIGNED_INT64_LENGTH))
+            return self.read_uint64()
 
     def read_length_coded_string(self):
         """Read a 'Length Coded String' from the data buffer.
@@ -214,17 +247,17 @@ class BinLogPacketWrapper(object):
     def read_int_be_by_size(self, size):
         '''Read a big endian integer values based on byte number'''
         if size == 1:
-            return struct.unpack('>b', self.read(size))[0]
+            return self.unpack(INT8_BE)[0]
         elif size == 2:
-            return struct.unpack('>h', self.read(size))[0]
+            return self.unpack(INT16_BE)[0]
         elif size == 3:
             return self.read_int24_be()
         elif size == 4:
-            return struct.unpack('>i', self.read(size))[0]
+            return self.unpack(INT32_BE)[0]
         elif size == 5:
             return self.read_int40_be()
         elif size == 8:
-            return struct.unpack('>l', self.read(size))[0]
+            return self.unpack(INT64_BE)[0]
 
     def read_uint_by_size(self, size):
         '''Read a little endian integer values based on byte number'''
@@ -263,65 +296,64 @@ class BinLogPacketWrapper(object):
         length = 0
         bits_read = 0
         while byte & 0x80 != 0:
-            byte = byte2int(self.read(1))
+            byte = self.read_uint8()
             length = length | ((byte & 0x7f) << bits_read)
             bits_read = bits_read + 7
         return self.read(length)
 
     def read_int24(self):
-        a, b, c = struct.unpack("BBB", self.read(3))
-        res = a | (b << 8) | (c << 16)
+        res = self.read_uint24()
         if res >= 0x800000:
             res -= 0x1000000
         return res
 
     def read_int24_be(self):
-        a, b, c = struct.unpack('BBB', self.read(3))
-        res = (a << 16) | (b << 8) | c
+        a, b = self.unpack(INT24_BE)
+        res = (a << 16) | b
         if res >= 0x800000:
             res -= 0x1000000
         return res
 
     def read_uint8(self):
-        return struct.unpack('<B', self.read(1))[0]
+        return self.unpack(UINT8)[0]
 
     def read_int16(self):
-        return struct.unpack('<h', self.read(2))[0]
+        return self.unpack(INT16)[0]
 
     def read_uint16(self):
-        return struct.unpack('<H', self.read(2))[0]
+        return self.unpack(UINT16)[0]
 
     def read_uint24(self):
-        a, b, c = struct.unpack("<BBB", self.read(3))
-        return a + (b << 8) + (c << 16)
+        a, b = self.unpack(UINT24)
+        return a + (b << 16)
 
     def read_uint32(self):
-        return struct.unpack('<I', self.read(4))[0]
+        return self.unpack(UINT32)[0]
 
     def read_int32(self):
-        return struct.unpack('<i', self.read(4))[0]
+        return self.unpack(INT32)[0]
 
     def read_uint40(self):
-        a, b = struct.unpack("<BI", self.read(5))
+        a, b = self.unpack(UINT40)
         return a + (b << 8)
 
     def read_int40_be(self):
-        a, b = struct.unpack(">IB", self.read(5))
+        a, b = self.unpack(INT40_BE)
         return b + (a << 8)
 
     def read_uint48(self):
-        a, b, c = struct.unpack("<HHH", self.read(6))
+        a, b, c = self.unpack(UINT48)
         return a + (b << 16) + (c << 32)
 
     def read_uint56(self):
-        a, b, c = struct.unpack("<BHI", self.read(7))
+        a, b, c = self.unpack(UINT56)
         return a + (b << 8) + (c << 24)
 
     def read_uint64(self):
-        return struct.unpack('<Q', self.read(8))[0]
+        return self.unpack(UINT64)[0]
 
     def read_int64(self):
-        return struct.unpack('<q', self.read(8))[0]
+        return self.unpack(INT64)[0]
 
     def unpack_uint16(self, n):
         return struct.unpack('<H', n[0:2])[0]
@@ -343,123 +375,11 @@ class BinLogPacketWrapper(object):
         except TypeError:
             return n[0] + (n[1] << 8) + (n[2] << 16) + (n[3] << 24)
 
-    def read_binary_json(self, size):
+    def read_binary_json(self, size, text=False):
+        """Read a JSON value of `size` length bytes, as its JSON text with text"""
         length = self.read_uint_by_size(size)
-        payload = self.read(length)
-        self.unread(payload)
-        t = self.read_uint8()
-
-        return self.read_binary_json_type(t, length)
-
-    def read_binary_json_type(self, t, length):
-        large = (t in (JSONB_TYPE_LARGE_OBJECT, JSONB_TYPE_LARGE_ARRAY))
-        if t in (JSONB_TYPE_SMALL_OBJECT, JSONB_TYPE_LARGE_OBJECT):
-            return self.read_binary_json_object(length - 1, large)
-        elif t in (JSONB_TYPE_SMALL_ARRAY, JSONB_TYPE_LARGE_ARRAY):
-            return self.read_binary_json_array(length - 1, large)
-        elif t in (JSONB_TYPE_STRING,):
-            return self.read_variable_length_string()
-        elif t in (JSONB_TYPE_LITERAL,):
-            value = self.read_uint8()
-            if value == JSONB_LITERAL_NULL:
-                return None
-            elif value == JSONB_LITERAL_TRUE:
-                return True
-            elif value == JSONB_LITERAL_FALSE:
-                return False
-        elif t == JSONB_TYPE_INT16:
-            return self.read_int16()
-        elif t == JSONB_TYPE_UINT16:
-            return self.read_uint16()
-        elif t in (JSONB_TYPE_DOUBLE,):
-            return struct.unpack('<d', self.read(8))[0]
-        elif t == JSONB_TYPE_INT32:
-            return self.read_int32()
-        elif t == JSONB_TYPE_UINT32:
-            return self.read_uint32()
-        elif t == JSONB_TYPE_INT64:
-            return self.read_int64()
-        elif t == JSONB_TYPE_UINT64:
-            return self.read_uint64()
-
-        raise ValueError('Json type %d is not handled' % t)
-
-    def read_binary_json_type_inlined(self, t):
-        if t == JSONB_TYPE_LITERAL:
-            value = self.read_uint16()
-            if value == JSONB_LITERAL_NULL:
-                return None
-            elif value == JSONB_LITERAL_TRUE:
-                return True
-            elif value == JSONB_LITERAL_FALSE:
-                return False
-        elif t == JSONB_TYPE_INT16:
-            return self.read_int16()
-        elif t == JSONB_TYPE_UINT16:
-            return self.read_uint16()
-        elif t == JSONB_TYPE_INT32:
-            return self.read_int32()
-        elif t == JSONB_TYPE_UINT32:
-            return self.read_uint32()
-
-        raise ValueError('Json type %d is not handled' % t)
-
-    def read_binary_json_object(self, length, large):
-        if large:
-            elements = self.read_uint32()
-            size = self.read_uint32()
-        else:
-            elements = self.read_uint16()
-            size = self.read_uint16()
-
-        if size > length:
-            raise ValueError('Json length is larger than packet length')
-
-        if large:
-            key_offset_lengths = [(
-                self.read_uint32(),  # offset (we don't actually need that)
-                self.read_uint16()   # size of the key
-                ) for _ in range(elements)]
-        else:
-            key_offset_lengths = [(
-                self.read_uint16(),  # offset (we don't actually need that)
-                self.read_uint16()   # size of key
-                ) for _ in range(elements)]
-
-        value_type_inlined_lengths = [read_offset_or_inline(self, large)
-                                      for _ in range(elements)]
-
-        keys = [self.read(x[1]) for x in key_offset_lengths]
-
-        out = {}
-        for i in range(elements):
-            if value_type_inlined_lengths[i][1] is None:
-                data = value_type_inlined_lengths[i][2]
-            else:
-                t = value_type_inlined_lengths[i][0]
-                data = self.read_binary_json_type(t, length)
-            out[keys[i]] = data
-
-        return out
-
-    def read_binary_json_array(self, length, large):
-        if large:
-            elements = self.read_uint32()
-            size = self.read_uint32()
-        else:
-            elements = self.read_uint16()
-            size = self.read_uint16()
-
-        if size > length:
-            raise ValueError('Json length is larger than packet length')
-
-        values_type_offset_inline = [
-            read_offset_or_inline(self, large)
-            for _ in range(elements)]
-
-        def _read(x):
-            if x[1] is None:
-                return x[2]
-            return self.read_binary_json_type(x[0], length)
-
-        return [_read(x) for x in values_type_offset_inline]
+        position = self.__position
+        self.__position = position + length
+        if text:
+            return decode_text(self.__data, position, length)
+        return decode_value(self.__data, position, length)
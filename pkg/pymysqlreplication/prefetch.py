@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""Packet prefetching for BinLogStreamReader.
+
+A thread reads the packets of the binlog dump connection into a bounded
+queue while the events of the previous packets are decoded. Socket reads
+release the GIL, so waiting for the network overlaps with decoding. The
+thread stops reading when the queue is full until the reader catches up.
+"""
+
+import threading
+import time
+
+try:
+    from queue import Queue, Empty, Full
+except ImportError:
+    from Queue import Queue, Empty, Full
+
+# seconds between checks of a stop request while the queue is full or empty
+POLL_INTERVAL = 0.1
+
+
+class StageStats(object):
+    """Throughput of one stage of a pipeline.
+
+    items: items the stage passed on
+    busy: seconds spent on its own work
+    waited: seconds spent waiting on the queues to the stages around it
+    """
+
+    def __init__(self):
+        self.items = 0
+        self.busy = 0.0
+        self.waited = 0.0
+
+    def report(self):
+        return {
+            'items': self.items,
+            'busy': round(self.busy, 3),
+            'waited': round(self.waited, 3),
+            'items_per_sec': int(self.items / self.busy) if self.busy > 0 else 0,
+        }
+
+
+class PacketPrefetcher(object):
+    """Read packets with read() in a thread, up to size packets ahead of get().
+
+    The thread ends after the EOF packet or an error of read(); get() raises
+    the error in the thread of the caller, after the packets read before it.
+    stats counts the packets read, the seconds in read() and the seconds
+    waiting for room in the queue.
+    """
+
+    def __init__(self, read, size, stats=None):
+        self.read = read
+        self.queue = Queue(max(size, 1))
+        self.stats = stats if stats is not None else StageStats()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='binlog-prefetch')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        stats = self.stats
+        while not self._stopped:
+            start = time.time()
+            try:
+                packet = self.read()
+            except Exception as error:
+                self._put(error)
+                return
+            read = time.time()
+            stats.busy += read - start
+            stats.items += 1
+            self._put(packet)
+            stats.waited += time.time() - read
+            if packet.is_eof_packet():
+                return
+
+    def _put(self, item):
+        while not self._stopped:
+            try:
+                self.queue.put(item, timeout=POLL_INTERVAL)
+                return
+            except Full:
+                pass
+
+    def get(self):
+        """Return the next packet"""
+        while True:
+            try:
+                item = self.queue.get(timeout=POLL_INTERVAL)
+                break
+            except Empty:
+                if not self._thread.is_alive() and self.queue.empty():
+                    raise RuntimeError('binlog prefetch thread stopped')
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def stop(self, timeout=None):
+        """Stop the thread. A thread blocked in read() ends once the
+        connection is closed"""
+        self._stopped = True
+        self._thread.join(timeout)
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+
+import binascii
+import io
+import json
+import os
+import re
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    # no file locks on windows, parallel workers may then lose entries of each other
+    fcntl = None
+
+from .. import pymysql
+from ..pymysql.cursors import DictCursor
+
+COLUMNS_QUERY = """
+    SELECT
+        TABLE_SCHEMA, TABLE_NAME,
+        COLUMN_NAME, COLLATION_NAME, CHARACTER_SET_NAME,
+        COLUMN_COMMENT, COLUMN_TYPE, COLUMN_KEY, ORDINAL_POSITION
+    FROM
+        information_schema.columns
+    WHERE
+        table_schema NOT IN ('information_schema', 'mysql', 'performance_schema', 'sys')
+    """
+
+IDENTIFIER = r'(?:`(?:[^`]|``)+`|[\w$]+)'
+TABLE_NAME = re.compile(r'(%s)(?:\s*\.\s*(%s))?' % (IDENTIFIER, IDENTIFIER))
+LEADING_COMMENTS = re.compile(r'^(?:\s+|/\*.*?\*/|(?:--|#)[^\n]*)*', re.S)
+# statements changing the columns or keys of the tables they name
+TABLE_DDL = [re.compile(pattern % {'name': TABLE_NAME.pattern}, re.I | re.S) for pattern in (
+    r'ALTER\s+(?:ONLINE\s+|OFFLINE\s+)?(?:IGNORE\s+)?TABLE\s+(?P<tables>%(name)s)',
+    r'CREATE\s+(?:TEMPORARY\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(?P<tables>%(name)s)',
+    r'DROP\s+(?:TEMPORARY\s+)?TABLES?\s+(?:IF\s+EXISTS\s+)?(?P<tables>%(name)s(?:\s*,\s*%(name)s)*)',
+    r'RENAME\s+TABLES?\s+(?P<tables>%(name)s\s+TO\s+%(name)s(?:\s*,\s*%(name)s\s+TO\s+%(name)s)*)',
+    r'(?:CREATE|DROP)\s+(?:ONLINE\s+|OFFLINE\s+)?(?:UNIQUE\s+|FULLTEXT\s+|SPATIAL\s+)?INDEX\s+\S+\s+'
+    r'(?:USING\s+\w+\s+)?ON\s+(?P<tables>%(name)s)',
+)]
+DROP_DATABASE = re.compile(r'DROP\s+(?:DATABASE|SCHEMA)\s+(?:IF\s+EXISTS\s+)?(%s)' % IDENTIFIER, re.I)
+DDL = re.compile(r'(?:ALTER|CREATE|DROP|RENAME)\s', re.I)
+
+
+def unquote(name):
+    if name.startswith('`'):
+        return name[1:-1].replace('``', '`')
+    return name
+
+
+def ddl_tables(query, schema):
+    """Tables whose columns may be changed by query, as (schema, table) pairs.
+
+    table is None when a whole schema is dropped, and the result is None for
+    a DDL statement on tables that is not understood. Other statements give [].
+    """
+    query = query[LEADING_COMMENTS.match(query).end():]
+    if not DDL.match(query):
+        return []
+    for ddl in TABLE_DDL:
+        match = ddl.match(query)
+        if match:
+            tables = []
+            for name, qualified in TABLE_NAME.findall(match.group('tables')):
+                if name.upper() == 'TO':
+                    continue
+                if qualified:
+                    tables.append((unquote(name), unquote(qualified)))
+                else:
+                    tables.append((schema, unquote(name)))
+            return tables
+    match = DROP_DATABASE.match(query)
+    if match:
+        return [(unquote(match.group(1)), None)]
+    if re.search(r'\bTABLES?\b', query[:query.find('(') if '(' in query else len(query)], re.I):
+        return None
+    return []
+
+
+def fetch_columns(cursor, only_schemas=None, only_tables=None):
+    """Columns of the tables matching the filters in one query, as {schema: {table: [columns]}}"""
+    query, args = COLUMNS_QUERY, []
+    for column, names in (("TABLE_SCHEMA", only_schemas), ("TABLE_NAME", only_tables)):
+        if names is None:
+            continue
+        if not names:
+            return {}
+        query += " AND %s IN (%s)" % (column, ", ".join(["%s"] * len(names)))
+        args.extend(names)
+    cursor.execute(query + " ORDER BY TABLE_SCHEMA, TABLE_NAME, ORDINAL_POSITION", args)
+
+    tables = {}
+    for row in cursor.fetchall():
+        schema = row.pop("TABLE_SCHEMA")
+        table = row.pop("TABLE_NAME")
+        tables.setdefault(schema, {}).setdefault(table, []).append(row)
+    return tables
+
+
+class SchemaSnapshot(object):
+    """Column definitions of information_schema.columns saved to a file.
+
+    It replaces the ctl connection when binlog files are read without a
+    mysql server: TableMapEvent only needs ``charset`` and
+    ``_get_table_information`` from it.
+
+    File format (json):
+        {"schema": {"table": [{"COLUMN_NAME": ..., "ORDINAL_POSITION": 1}, ...]}}
+    """
+
+    charset = "utf8"
+
+    def __init__(self, tables=None):
+        self.tables = tables or {}
+
+    @classmethod
+    def load(cls, path):
+        with io.open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def save(self, path):
+        data = json.dumps(self.tables, ensure_ascii=False, indent=1, sort_keys=True)
+        if not isinstance(data, type(u"")):
+            data = data.decode("utf-8")
+        with io.open(path, "w", encoding="utf-8") as f:
+            f.write(data)
+
+    @classmethod
+    def dump(cls, connection_settings, only_schemas=None, only_tables=None):
+        """Take a snapshot of the columns of all tables of a mysql server"""
+        settings = dict(connection_settings)
+        settings["db"] = "information_schema"
+        settings["cursorclass"] = DictCursor
+        settings.setdefault("charset", "utf8")
+        connection = pymysql.connect(**settings)
+        try:
+            cur = connection.cursor()
+            tables = fetch_columns(cur, only_schemas, only_tables)
+            cur.close()
+        finally:
+            connection.close()
+        return cls(tables)
+
+    def _get_table_information(self, schema, table, signature=None):
+        return self.tables.get(schema, {}).get(table, [])
+
+
+class SchemaCache(object):
+    """Columns of information_schema.columns kept across binlog files and runs.
+
+    Entries are keyed by (schema, table, signature), the signature being the
+    column types and metadata of the TableMapEvent, so a table whose column
+    types changed gets a new entry. Renaming a column keeps the signature:
+    DDL QueryEvents read from the binlog invalidate the tables they change,
+    otherwise invalidate() them or remove the file.
+
+    Parallel workers share the file: save() locks it, reads it again and
+    applies only the puts and invalidations of this cache since the last
+    save, so the entries of other workers are kept. Invalidations are saved
+    with the next save(), not one by one per DDL.
+
+    File format (json):
+        {"schema": {"table": {"signature in hex": [{"COLUMN_NAME": ...}, ...]}}}
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.tables = {}
+        # columns fetched from the server for any signature, see prefetch
+        self.current = {}
+        # puts and invalidations not saved yet, in order
+        self.__changes = []
+        if path and os.path.exists(path):
+            with io.open(path, "r", encoding="utf-8") as f:
+                self.tables = json.load(f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.save()
+
+    @staticmethod
+    def signature_key(signature):
+        return binascii.hexlify(signature).decode("ascii")
+
+    def get(self, schema, table, signature):
+        columns = self.tables.get(schema, {}).get(table, {}).get(self.signature_key(signature))
+        if columns is None:
+            columns = self.current.get(schema, {}).get(table)
+            if columns is not None:
+                self.put(schema, table, signature, columns)
+        return columns
+
+    def prefetch(self, tables):
+        """Add the current columns of tables {schema: {table: [columns]}}, used for any signature"""
+        for schema, columns in tables.items():
+            self.current.setdefault(schema, {}).update(columns)
+
+    def put(self, schema, table, signature, columns):
+        columns = list(columns)
+        self.tables.setdefault(schema, {}).setdefault(table, {})[self.signature_key(signature)] = columns
+        self.__changes.append((self.__put, (schema, table, self.signature_key(signature), columns)))
+
+    @staticmethod
+    def __put(tables, schema, table, key, columns):
+        tables.setdefault(schema, {}).setdefault(table, {})[key] = columns
+
+    @property
+    def dirty(self):
+        """There are puts or invalidations to save"""
+        return bool(self.__changes)
+
+    @property
+    def invalidated(self):
+        """There are invalidations to save"""
+        return any(change is self.__invalidate for change, args in self.__changes)
+
+    def invalidate(self, schema=None, table=None):
+        """Forget the columns of a table, of a schema when table is None, or all of them.
+
+        Names are compared case-insensitively. The invalidation is saved with
+        the next save(), see invalidated.
+        """
+        for tables in (self.tables, self.current):
+            self.__invalidate(tables, schema, table)
+        # applied to the file even when this cache had no entry, another worker may have added one
+        self.__changes.append((self.__invalidate, (schema, table)))
+
+    @staticmethod
+    def __invalidate(tables, schema, table):
+        if schema is None:
+            changed = bool(tables)
+            tables.clear()
+            return changed
+        changed = False
+        for s in [s for s in tables if s.lower() == schema.lower()]:
+            if table is None:
+                del tables[s]
+                changed = True
+                continue
+            for t in [t for t in tables[s] if t.lower() == table.lower()]:
+                del tables[s][t]
+                changed = True
+        return changed
+
+    def invalidate_query(self, query, schema):
+        """Invalidate the tables changed by the DDL query run in schema"""
+        if isinstance(schema, bytes):
+            schema = schema.decode("utf-8")
+        tables = ddl_tables(query, schema)
+        if tables is None:
+            self.invalidate()
+        for schema, table in tables or []:
+            self.invalidate(schema, table)
+
+    def save(self):
+        """Apply the puts and invalidations since the last save to the file"""
+        if not self.path or not self.__changes:
+            return
+        with open(self.path + ".lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            tables = {}
+            if os.path.exists(self.path):
+                with io.open(self.path, "r", encoding="utf-8") as f:
+                    tables = json.load(f)
+            for change, args in self.__changes:
+                change(tables, *args)
+            data = json.dumps(tables, ensure_ascii=False, indent=1, sort_keys=True)
+            if not isinstance(data, type(u"")):
+                data = data.decode("utf-8")
+            # readers without the lock see the old or the new file, never a part of it
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)))
+            with io.open(fd, "w", encoding="utf-8") as f:
+                f.write(data)
+            getattr(os, "replace", os.rename)(tmp, self.path)
+        self.__changes = []
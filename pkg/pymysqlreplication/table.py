@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 
+from .decoder import decoder_plan
+
 
 class Table(object):
-    def __init__(self, column_schemas, table_id, schema, table, columns, primary_key=None):
+    def __init__(self, column_schemas, table_id, schema, table, columns, primary_key=None, literal_values=False):
         if primary_key is None:
             primary_key = [c.data["name"] for c in columns if c.data["is_primary"]]
             if len(primary_key) == 0:
@@ -20,6 +22,16 @@ class Table(object):
             "columns": columns,
             "primary_key": primary_key
         })
+        # read values as their sql text, see decoder.column_reader
+        self._literal_values = literal_values
+
+    @property
+    def decoder_plan(self):
+        """DecoderPlan of the columns, looked up once per table map"""
+        plan = self.__dict__.get("_decoder_plan")
+        if plan is None:
+            plan = self._decoder_plan = decoder_plan(self, self._literal_values)
+        return plan
 
     @property
     def data(self):
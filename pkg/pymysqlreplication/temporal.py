@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""Temporal column codecs.
+
+DATETIME2, TIME2 and TIMESTAMP2 of MySQL 5.6.4+ store a big endian bit
+field followed by 0 to 3 bytes of fractional seconds. A reader unpacks the
+field and the fraction with one struct chosen per column, and takes the
+parts of the field with constant shifts and masks.
+"""
+
+import struct
+import calendar
+import datetime
+
+INT32_BE = struct.Struct('>i')
+
+# struct format of the fractional seconds, by their size in bytes. A signed
+# 3 bytes integer is unpacked as a signed byte and 2 bytes
+FRACTION_FORMATS = ['', 'b', 'h', 'bH']
+
+# DATETIME2 texts kept at the same time
+MAX_DATETIME_TEXTS = 65536
+
+# year * 13 + month: days in the month, 0 for an invalid year or month
+_month_days = {}
+# (high, low) unpacked DATETIME2: its 'YYYY-MM-DD hh:mm:ss text, '' if invalid
+_datetime_texts = {}
+
+
+def _fraction(fsp, index):
+    """Return the struct format of fsp fractional digits unpacked at item
+    index and a function of the unpacked values giving them in microseconds,
+    None without fractional digits"""
+    size = (fsp + 1) // 2
+    if size == 0:
+        return '', None
+    scale = 10 ** (6 - fsp)
+    odd = fsp % 2
+
+    def fraction(values):
+        if size == 3:
+            microsecond = values[index] << 16 | values[index + 1]
+        else:
+            microsecond = values[index]
+        if odd:
+            microsecond = int(microsecond / 10)
+        return microsecond * scale
+    return FRACTION_FORMATS[size], fraction
+
+
+def month_days(year_month):
+    """Days in the month of year * 13 + month of DATETIME2, 0 if there is no such month"""
+    days = _month_days.get(year_month)
+    if days is None:
+        year, month = divmod(year_month, 13)
+        days = 0
+        if datetime.MINYEAR <= year <= datetime.MAXYEAR and month:
+            days = calendar.monthrange(year, month)[1]
+        _month_days[year_month] = days
+    return days
+
+
+def datetime2_text(high, low):
+    """'YYYY-MM-DD hh:mm:ss SQL text of DATETIME2 unpacked as (high, low), without the closing quote,
+    '' for an invalid date"""
+    key = (high, low)
+    text = _datetime_texts.get(key)
+    if text is None:
+        year_month = high >> 14 & 0x1ffff
+        day, hour, minute, second = high >> 9 & 31, high >> 4 & 31, (high & 15) << 2 | low >> 6, low & 63
+        text = ''
+        if 0 < day <= month_days(year_month) and hour < 24 and minute < 60 and second < 60:
+            text = "'%04d-%02d-%02d %02d:%02d:%02d" % (year_month // 13, year_month % 13, day, hour, minute, second)
+        if len(_datetime_texts) >= MAX_DATETIME_TEXTS:
+            _datetime_texts.clear()
+        _datetime_texts[key] = text
+    return text
+
+
+def datetime2_reader(fsp, literal=None):
+    """DATETIME
+
+    1 bit  sign           (1= non-negative, 0= negative)
+    17 bits year*13+month  (year 0-9999, month 0-12)
+     5 bits day            (0-31)
+     5 bits hour           (0-23)
+     6 bits minute         (0-59)
+     6 bits second         (0-59)
+    ---------------------------
+    40 bits = 5 bytes
+
+    Unpacked as 4 bytes and 1 byte. Given literal, a callable, the reader
+    returns literal of the 'YYYY-MM-DD hh:mm:ss[.ffffff]' SQL text instead
+    of a datetime. Invalid dates, 0000-00-00 among them, are read as None.
+    """
+    fmt, fraction = _fraction(fsp, 2)
+    fixed = struct.Struct('>IB' + fmt)
+
+    def read(packet):
+        values = packet.unpack(fixed)
+        high, low = values[0], values[1]
+        microsecond = fraction(values) if fraction is not None else 0
+        if literal is not None:
+            text = _datetime_texts.get((high, low)) or datetime2_text(high, low)
+            if not text:
+                return None
+            if microsecond > 0:
+                return literal("%s.%06d'" % (text, microsecond))
+            return literal(text + "'")
+        year_month = high >> 14 & 0x1ffff
+        try:
+            t = datetime.datetime(year_month // 13, year_month % 13, high >> 9 & 31,
+                                  high >> 4 & 31, (high & 15) << 2 | low >> 6, low & 63)
+        except ValueError:
+            return None
+        if microsecond > 0:
+            t = t.replace(microsecond=microsecond)
+        return t
+    return read
+
+
+def time2_reader(fsp):
+    """TIME encoding for nonfractional part:
+
+     1 bit sign    (1= non-negative, 0= negative)
+     1 bit unused  (reserved for future extensions)
+    10 bits hour   (0-838)
+     6 bits minute (0-59)
+     6 bits second (0-59)
+    ---------------------
+    24 bits = 3 bytes
+    """
+    fmt, fraction = _fraction(fsp, 2)
+    fixed = struct.Struct('>bH' + fmt)
+
+    def read(packet):
+        values = packet.unpack(fixed)
+        data = values[0] << 16 | values[1]
+        if data & 0x800000:
+            sign = 1
+        else:
+            sign = -1
+            # negative integers are stored as 2's compliment
+            # hence take 2's compliment again to get the right value.
+            data = ~data + 1
+        return datetime.timedelta(
+            hours=sign * (data >> 12 & 0x3ff),
+            minutes=data >> 6 & 0x3f,
+            seconds=data & 0x3f,
+            microseconds=fraction(values) if fraction is not None else 0
+        )
+    return read
+
+
+def timestamp2_reader(fsp):
+    fmt, fraction = _fraction(fsp, 1)
+    fixed = struct.Struct('>i' + fmt)
+
+    def read(packet):
+        values = packet.unpack(fixed)
+        t = datetime.datetime.fromtimestamp(values[0])
+        microsecond = fraction(values) if fraction is not None else 0
+        if microsecond > 0:
+            t = t.replace(microsecond=microsecond)
+        return t
+    return read
+
+
+def timestamp2_value(data):
+    """Value of the 4 bytes of a TIMESTAMP2 without fractional seconds"""
+    return datetime.datetime.fromtimestamp(INT32_BE.unpack(data)[0])
+
+
+def read_time(packet):
+    time = packet.read_uint24()
+    date = datetime.timedelta(
+        hours=int(time / 10000),
+        minutes=int((time % 10000) / 100),
+        seconds=int(time % 100))
+    return date
+
+
+def read_date(packet):
+    time = packet.read_uint24()
+    if time == 0:  # nasty mysql 0000-00-00 dates
+        return None
+
+    year = (time & ((1 << 15) - 1) << 9) >> 9
+    month = (time & ((1 << 4) - 1) << 5) >> 5
+    day = (time & ((1 << 5) - 1))
+    if year == 0 or month == 0 or day == 0:
+        return None
+
+    date = datetime.date(
+        year=year,
+        month=month,
+        day=day
+    )
+    return date
+
+
+def read_datetime(packet):
+    value = packet.read_uint64()
+    if value == 0:  # nasty mysql 0000-00-00 dates
+        return None
+
+    date = value / 1000000
+    time = int(value % 1000000)
+
+    year = int(date / 10000)
+    month = int((date % 10000) / 100)
+    day = int(date % 100)
+    if year == 0 or month == 0 or day == 0:
+        return None
+
+    date = datetime.datetime(
+        year=year,
+        month=month,
+        day=day,
+        hour=int(time / 10000),
+        minute=int((time % 10000) / 100),
+        second=int(time % 100))
+    return date
+
+
+def read_timestamp(packet):
+    return datetime.datetime.fromtimestamp(packet.read_uint32())
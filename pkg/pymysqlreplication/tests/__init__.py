@@ -1,8 +1,19 @@
 # -*- coding: utf-8 -*-
+import sys
 
 from pymysqlreplication.tests.test_basic import *
 from pymysqlreplication.tests.test_data_type import *
 from pymysqlreplication.tests.test_data_objects import *
+from pymysqlreplication.tests.test_binlogfile import *
+from pymysqlreplication.tests.test_decoder import *
+from pymysqlreplication.tests.test_jsonb import *
+from pymysqlreplication.tests.test_packet import *
+from pymysqlreplication.tests.test_prefetch import *
+from pymysqlreplication.tests.test_schema import *
+from pymysqlreplication.tests.test_temporal import *
+
+if sys.version_info >= (3, 5):
+    from pymysqlreplication.tests.test_aio import *
 
 if __name__ == "__main__":
     if sys.version_info < (2, 7):
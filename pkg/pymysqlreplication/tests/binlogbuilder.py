@@ -0,0 +1,126 @@
+'''Build synthetic binlog files and events'''
+import struct
+import zlib
+
+BINLOG_MAGIC = b'\xfebin'
+
+FORMAT_DESCRIPTION_EVENT = 0x0f
+QUERY_EVENT = 0x02
+ROTATE_EVENT = 0x04
+XID_EVENT = 0x10
+TABLE_MAP_EVENT = 0x13
+WRITE_ROWS_EVENT_V2 = 0x1e
+UPDATE_ROWS_EVENT_V2 = 0x1f
+DELETE_ROWS_EVENT_V2 = 0x20
+GTID_LOG_EVENT = 0x21
+
+
+def lenenc_int(i):
+    '''Length coded binary'''
+    if i < 251:
+        return struct.pack('<B', i)
+    elif i < 2 ** 16:
+        return b'\xfc' + struct.pack('<H', i)
+    elif i < 2 ** 24:
+        return b'\xfd' + struct.pack('<I', i)[:3]
+    return b'\xfe' + struct.pack('<Q', i)
+
+
+def bitmap(bits):
+    '''Pack a list of booleans, first one in the lowest bit'''
+    data = bytearray((len(bits) + 7) // 8)
+    for i, bit in enumerate(bits):
+        if bit:
+            data[i // 8] |= 1 << (i % 8)
+    return bytes(data)
+
+
+def table_id_bytes(table_id):
+    return struct.pack('<Q', table_id)[:6]
+
+
+def format_description_body(server_version='5.7.26-log', checksum=True):
+    '''FormatDescriptionEvent body, the checksum algorithm is in the last 5 bytes'''
+    body = struct.pack('<H', 4)
+    body += server_version.encode().ljust(50, b'\x00')
+    body += struct.pack('<IB', 0, 19)
+    body += b'\x00' * 38
+    body += struct.pack('<B', 1 if checksum else 0)
+    return body
+
+
+def query_body(query, schema=''):
+    schema = schema.encode()
+    return struct.pack('<IIBHH', 1, 0, len(schema), 0, 0) + schema + b'\x00' + query.encode()
+
+
+def table_map_body(table_id, schema, table, column_types, metadata=b''):
+    '''column_types: FIELD_TYPE values, metadata: packed column metadata'''
+    schema = schema.encode()
+    table = table.encode()
+    body = table_id_bytes(table_id) + struct.pack('<H', 1)
+    body += struct.pack('<B', len(schema)) + schema + b'\x00'
+    body += struct.pack('<B', len(table)) + table + b'\x00'
+    body += lenenc_int(len(column_types)) + struct.pack('<%dB' % len(column_types), *column_types)
+    body += lenenc_int(len(metadata)) + metadata
+    body += bitmap([True] * len(column_types))
+    return body
+
+
+def rows_body(table_id, column_count, rows, update=False):
+    '''rows: list of packed rows, each one is null bitmap + values'''
+    body = table_id_bytes(table_id) + struct.pack('<HH', 1, 2)
+    body += lenenc_int(column_count)
+    body += bitmap([True] * column_count)
+    if update:
+        body += bitmap([True] * column_count)
+    return body + b''.join(rows)
+
+
+class BinLogBuilder(object):
+    '''Append events and keep their positions like mysqld does'''
+
+    def __init__(self, server_version='5.7.26-log', checksum=True, server_id=1, timestamp=1554602400):
+        self.checksum = checksum
+        self.server_id = server_id
+        self.timestamp = timestamp
+        self.data = bytearray(BINLOG_MAGIC)
+        self.positions = []
+        self.add_event(FORMAT_DESCRIPTION_EVENT, format_description_body(server_version, checksum))
+
+    def add_event(self, event_type, body, timestamp=None):
+        if timestamp is None:
+            timestamp = self.timestamp
+        start = len(self.data)
+        size = 19 + len(body) + (4 if self.checksum else 0)
+        event = struct.pack('<IBIIIH', timestamp, event_type, self.server_id, size, start + size, 0) + body
+        if self.checksum:
+            event += struct.pack('<I', zlib.crc32(event) & 0xffffffff)
+        self.data += event
+        self.positions.append(start)
+        return start
+
+    def add_query(self, query, schema='', timestamp=None):
+        return self.add_event(QUERY_EVENT, query_body(query, schema), timestamp)
+
+    def add_table_map(self, table_id, schema, table, column_types, metadata=b'', timestamp=None):
+        return self.add_event(TABLE_MAP_EVENT, table_map_body(table_id, schema, table, column_types, metadata),
+                              timestamp)
+
+    def add_rows(self, event_type, table_id, column_count, rows, timestamp=None):
+        body = rows_body(table_id, column_count, rows, update=event_type == UPDATE_ROWS_EVENT_V2)
+        return self.add_event(event_type, body, timestamp)
+
+    def add_xid(self, xid, timestamp=None):
+        return self.add_event(XID_EVENT, struct.pack('<Q', xid), timestamp)
+
+    def add_gtid(self, sid, gno, timestamp=None):
+        '''sid: 16 bytes, logical timestamps of 5.7 follow the gtid'''
+        return self.add_event(GTID_LOG_EVENT, struct.pack('<B16sQBQQ', 1, sid, gno, 2, 0, 0), timestamp)
+
+    def add_rotate(self, next_binlog, timestamp=None):
+        return self.add_event(ROTATE_EVENT, struct.pack('<Q', 4) + next_binlog.encode(), timestamp)
+
+    def write(self, path):
+        with open(path, 'wb') as f:
+            f.write(bytes(self.data))
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import struct
+import unittest
+
+from pymysqlreplication.aio import AsyncBinLogStreamReader
+from pymysqlreplication.event import QueryEvent, XidEvent
+from pymysqlreplication.row_event import WriteRowsEvent
+from pymysqlreplication.schema import SchemaSnapshot
+from pymysqlreplication.tests import binlogbuilder
+from pymysqlreplication.tests.test_binlogfile import COLUMNS, row
+
+__all__ = ["TestAsyncBinLogStreamReader"]
+
+
+def dump_packets(builder):
+    """Packets of the binlog dump of the events of builder, then EOF"""
+    data = bytes(builder.data)
+    packets = []
+    for start in builder.positions:
+        size = struct.unpack_from("<I", data, start + 9)[0]
+        packets.append(b"\x00" + data[start:start + size])
+    packets.append(b"\xfe\x00\x00\x02\x00")
+    return b"".join(struct.pack("<HBB", len(packet) & 0xffff, len(packet) >> 16, (seq + 1) % 256) + packet
+                    for seq, packet in enumerate(packets))
+
+
+class TestAsyncBinLogStreamReader(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def reader(self, data, **kwargs):
+        stream = AsyncBinLogStreamReader({}, 1, loop=self.loop, **kwargs)
+        stream.stream._ctl_connection = SchemaSnapshot({"test": {"test": COLUMNS}})
+        # as if connected, COM_BINLOG_DUMP was packet 0
+        stream._reader = asyncio.StreamReader(loop=self.loop)
+        stream._reader.feed_data(data)
+        stream._reader.feed_eof()
+        stream._next_seq_id = 1
+        return stream
+
+    def events(self, stream):
+        async def read():
+            async with stream:
+                return [event async for event in stream]
+        return self.loop.run_until_complete(read())
+
+    def test_events(self):
+        builder = binlogbuilder.BinLogBuilder(checksum=False)
+        builder.add_query("BEGIN", "test")
+        builder.add_table_map(1, "test", "test", [3, 15], struct.pack("<H", 150))
+        builder.add_rows(binlogbuilder.WRITE_ROWS_EVENT_V2, 1, 2, [row(1, u"Hello"), row(2, u"World")])
+        end = builder.add_xid(1)
+        stream = self.reader(dump_packets(builder), only_events=[QueryEvent, WriteRowsEvent, XidEvent])
+        events = self.events(stream)
+        self.assertEqual([type(e) for e in events], [QueryEvent, WriteRowsEvent, XidEvent])
+        self.assertEqual(events[1].rows, [{"values": {"id": 1, "data": u"Hello"}},
+                                          {"values": {"id": 2, "data": u"World"}}])
+        self.assertEqual(stream.log_pos, len(builder.data))
+        self.assertGreater(stream.log_pos, end)
+
+    def test_large_packet(self):
+        builder = binlogbuilder.BinLogBuilder(checksum=False)
+        data = dump_packets(builder)
+        # a packet of MAX_PACKET_LEN bytes is followed by an empty one
+        packet = b"\x00" + bytes(builder.data[4:]).ljust(0xffffff - 1, b"\x00")
+        stream = self.reader(struct.pack("<HBB", 0xffff, 0xff, 1) + packet + struct.pack("<HBB", 0, 0, 2) + data[4:])
+        packet = self.loop.run_until_complete(stream._read_packet())
+        self.assertEqual(len(packet.get_all_data()), 0xffffff)
+
+    def test_sequence(self):
+        data = dump_packets(binlogbuilder.BinLogBuilder(checksum=False))
+        stream = self.reader(data[:3] + b"\x05" + data[4:])
+        self.assertRaises(Exception, self.events, stream)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+import binascii
+import os
+import shutil
+import struct
+import sys
+import tempfile
+
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+from pymysqlreplication.binlogfile import BinLogFileReader, binlog_files, first_event_timestamp, seek_timestamp
+from pymysqlreplication.event import GtidEvent, QueryEvent, RotateEvent, XidEvent
+from pymysqlreplication.exceptions import BinLogChecksumError
+from pymysqlreplication.row_event import TableMapEvent, WriteRowsEvent
+from pymysqlreplication.schema import SchemaCache, SchemaSnapshot
+from pymysqlreplication.tests import binlogbuilder
+
+__all__ = ["TestBinLogFileReader"]
+
+COLUMNS = [
+    {"COLUMN_NAME": "id", "COLLATION_NAME": None, "CHARACTER_SET_NAME": None,
+     "COLUMN_COMMENT": "", "COLUMN_TYPE": "int(11)", "COLUMN_KEY": "PRI", "ORDINAL_POSITION": 1},
+    {"COLUMN_NAME": "data", "COLLATION_NAME": "utf8_general_ci", "CHARACTER_SET_NAME": "utf8",
+     "COLUMN_COMMENT": "", "COLUMN_TYPE": "varchar(50)", "COLUMN_KEY": "", "ORDINAL_POSITION": 2},
+]
+
+
+SID = "3e11fa47-71ca-11e1-9e33-c80aa9429562"
+
+
+def row(id, data):
+    data = data.encode("utf-8")
+    return binlogbuilder.bitmap([False, False]) + struct.pack("<iB", id, len(data)) + data
+
+
+class TestBinLogFileReader(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.snapshot = SchemaSnapshot({"test": {"test": COLUMNS}})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_binlog(self, name, first_id, checksum=True, next_binlog=None):
+        builder = binlogbuilder.BinLogBuilder(checksum=checksum)
+        builder.add_query("BEGIN", "test")
+        builder.add_table_map(first_id, "test", "test", [3, 15], struct.pack("<H", 150))
+        builder.add_rows(binlogbuilder.WRITE_ROWS_EVENT_V2, first_id, 2,
+                         [row(first_id, u"Hello"), row(first_id + 1, u"World")])
+        builder.add_xid(first_id)
+        if next_binlog:
+            builder.add_rotate(next_binlog)
+        path = os.path.join(self.tmp_dir, name)
+        builder.write(path)
+        return path, builder
+
+    def test_binlog_files(self):
+        for name in ("mysql-bin.000010", "mysql-bin.000002", "mysql-bin.index"):
+            open(os.path.join(self.tmp_dir, name), "w").close()
+        self.assertEqual([os.path.basename(f) for f in binlog_files(self.tmp_dir)],
+                         ["mysql-bin.000002", "mysql-bin.000010"])
+
+    def test_read_files(self):
+        self.write_binlog("mysql-bin.000001", 1, checksum=True, next_binlog="mysql-bin.000002")
+        self.write_binlog("mysql-bin.000002", 10, checksum=False)
+        stream = BinLogFileReader(self.tmp_dir, schema_snapshot=self.snapshot, verify_checksum=True,
+                                  only_events=[QueryEvent, WriteRowsEvent, XidEvent, RotateEvent])
+
+        events = [(stream.log_file, event) for event in stream]
+        self.assertEqual([(f, type(e)) for f, e in events],
+                         [("mysql-bin.000001", QueryEvent), ("mysql-bin.000001", WriteRowsEvent),
+                          ("mysql-bin.000001", XidEvent), ("mysql-bin.000001", RotateEvent),
+                          ("mysql-bin.000002", QueryEvent), ("mysql-bin.000002", WriteRowsEvent),
+                          ("mysql-bin.000002", XidEvent)])
+        self.assertEqual(events[1][1].rows, [{"values": {"id": 1, "data": u"Hello"}},
+                                             {"values": {"id": 2, "data": u"World"}}])
+        self.assertEqual(events[5][1].rows[1]["values"], {"id": 11, "data": u"World"})
+        self.assertEqual(events[5][1].primary_key, "id")
+
+    def test_start_position(self):
+        path, builder = self.write_binlog("mysql-bin.000001", 1)
+        stream = BinLogFileReader(path, schema_snapshot=self.snapshot,
+                                  log_pos=builder.positions[3], only_events=[XidEvent])
+        self.assertIsInstance(stream.fetchone(), XidEvent)
+        self.assertIsNone(stream.fetchone())
+
+    def test_iter_rows(self):
+        path, builder = self.write_binlog("mysql-bin.000001", 1)
+        stream = BinLogFileReader(path, schema_snapshot=self.snapshot, only_events=[WriteRowsEvent])
+        event = stream.fetchone()
+        rows = [{"values": {"id": 1, "data": u"Hello"}}, {"values": {"id": 2, "data": u"World"}}]
+        iterator = event.iter_rows()
+        self.assertEqual(next(iterator), rows[0])
+        self.assertEqual(list(event.iter_rows()), rows)
+        self.assertEqual(event.rows, rows)
+        self.assertEqual(list(event.iter_rows()), rows)
+
+    def test_only_tables(self):
+        builder = binlogbuilder.BinLogBuilder()
+        self.snapshot.tables["test"]["other"] = COLUMNS
+        for table_id, table in ((1, "other"), (2, "test"), (1, "other")):
+            builder.add_table_map(table_id, "test", table, [3, 15], struct.pack("<H", 150))
+            builder.add_rows(binlogbuilder.WRITE_ROWS_EVENT_V2, table_id, 2, [row(table_id, u"Hello")])
+        path = os.path.join(self.tmp_dir, "mysql-bin.000001")
+        builder.write(path)
+
+        stream = BinLogFileReader(path, schema_snapshot=self.snapshot, only_tables=["test"],
+                                  only_events=[WriteRowsEvent])
+        self.assertEqual([(e.table, e.rows[0]["values"]["id"]) for e in stream], [("test", 2)])
+        self.assertEqual(list(stream.table_map), [2])
+
+    def test_skip_to_timestamp(self):
+        builder = binlogbuilder.BinLogBuilder(timestamp=100)
+        for ts in (100, 110, 120):
+            builder.add_table_map(ts, "test", "test", [3, 15], struct.pack("<H", 150), timestamp=ts)
+            builder.add_rows(binlogbuilder.WRITE_ROWS_EVENT_V2, ts, 2, [row(ts, u"Hello")], timestamp=ts)
+        path = os.path.join(self.tmp_dir, "mysql-bin.000001")
+        builder.write(path)
+
+        stream = BinLogFileReader(path, schema_snapshot=self.snapshot, skip_to_timestamp=110,
+                                  only_events=[WriteRowsEvent])
+        self.assertEqual([e.rows[0]["values"]["id"] for e in stream], [110, 120])
+        self.assertEqual(sorted(stream.table_map), [110, 120])
+
+    def write_gtid_binlog(self):
+        builder = binlogbuilder.BinLogBuilder()
+        for gno in (1, 2, 3):
+            builder.add_gtid(binascii.unhexlify(SID.replace("-", "")), gno)
+            builder.add_query("BEGIN", "test")
+            builder.add_table_map(gno, "test", "test", [3, 15], struct.pack("<H", 150))
+            builder.add_rows(binlogbuilder.WRITE_ROWS_EVENT_V2, gno, 2, [row(gno, u"Hello")])
+            builder.add_xid(gno)
+        builder.add_gtid(binascii.unhexlify(SID.replace("-", "")), 4)
+        builder.add_query("ALTER TABLE test ADD COLUMN c int", "test")
+        path = os.path.join(self.tmp_dir, "mysql-bin.000001")
+        builder.write(path)
+        return path
+
+    def test_include_gtids(self):
+        stream = BinLogFileReader(self.write_gtid_binlog(), schema_snapshot=self.snapshot,
+                                  include_gtids=SID + ":2")
+        # events outside of transactions are read
+        events = list(stream)[1:]
+        self.assertEqual([type(e) for e in events],
+                         [GtidEvent, QueryEvent, TableMapEvent, WriteRowsEvent, XidEvent])
+        self.assertEqual(events[0].gtid, SID + ":2")
+        self.assertEqual(events[3].rows[0]["values"]["id"], 2)
+        # the TableMapEvents of skipped transactions are not read
+        self.assertEqual(list(stream.table_map), [2])
+        self.assertEqual(stream.log_pos, os.path.getsize(stream.log_files[0]))
+
+    def test_exclude_gtids(self):
+        schema_cache = SchemaCache()
+        schema_cache.put("test", "test", b"\x03", COLUMNS)
+        stream = BinLogFileReader(self.write_gtid_binlog(), schema_snapshot=self.snapshot,
+                                  exclude_gtids=SID + ":1-2:4", schema_cache=schema_cache,
+                                  only_events=[QueryEvent, WriteRowsEvent])
+        self.assertEqual([e.rows[0]["values"]["id"] if isinstance(e, WriteRowsEvent) else e.query for e in stream],
+                         ["BEGIN", 3])
+        # DDL of a skipped transaction still invalidates the schema cache
+        self.assertEqual(schema_cache.tables, {"test": {}})
+
+    def test_checksum_mismatch(self):
+        path, builder = self.write_binlog("mysql-bin.000001", 1)
+        with open(path, "r+b") as f:
+            f.seek(builder.positions[1] + 19 + 13)
+            f.write(b"X")
+        stream = BinLogFileReader(path, schema_snapshot=self.snapshot, verify_checksum=True)
+        self.assertRaises(BinLogChecksumError, list, stream)
+
+    def test_seek_timestamp(self):
+        builder = binlogbuilder.BinLogBuilder(timestamp=100)
+        for ts in (100, 110, 120):
+            builder.add_query("BEGIN", "test", timestamp=ts)
+            builder.add_table_map(1, "test", "test", [3, 15], struct.pack("<H", 150), timestamp=ts)
+            builder.add_rows(binlogbuilder.WRITE_ROWS_EVENT_V2, 1, 2, [row(ts, u"Hello")], timestamp=ts + 1)
+            builder.add_xid(ts, timestamp=ts + 1)
+        builder.add_query("CREATE TABLE t (id int)", "test", timestamp=130)
+        path = os.path.join(self.tmp_dir, "mysql-bin.000001")
+        builder.write(path)
+
+        self.assertEqual(first_event_timestamp(path), 100)
+        self.assertEqual(seek_timestamp(path, 50), 4)
+        # the transaction of the first event at 111 starts at BEGIN of 110
+        self.assertEqual(seek_timestamp(path, 111), builder.positions[5])
+        self.assertEqual(seek_timestamp(path, 125), builder.positions[13])
+        self.assertEqual(seek_timestamp(path, 200), len(builder.data))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+import datetime
+import decimal
+import struct
+import sys
+
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+from pymysqlreplication.column import Column
+from pymysqlreplication.constants import FIELD_TYPE
+from pymysqlreplication import decoder
+from pymysqlreplication.bitmap import BitCount, BitIndexes
+from pymysqlreplication.decoder import DecoderPlan, Literal, decoder_plan
+from pymysqlreplication.table import Table
+from pymysqlreplication.tests import binlogbuilder
+
+__all__ = ["TestDecoderPlan"]
+
+
+class Packet(object):
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+
+    def read(self, size):
+        position = self.position
+        self.position += size
+        return self.data[position:self.position]
+
+    def unpack(self, fixed):
+        values = fixed.unpack_from(self.data, self.position)
+        self.position += fixed.size
+        return values
+
+
+def column(name, type, unsigned=False, **kwargs):
+    return Column(name=name, type=type, unsigned=unsigned, is_primary=name == "id",
+                  character_set_name=None, **kwargs)
+
+
+COLUMNS = [
+    column("id", FIELD_TYPE.LONG, unsigned=True),
+    column("a", FIELD_TYPE.SHORT),
+    column("b", FIELD_TYPE.DOUBLE),
+    column("name", FIELD_TYPE.VARCHAR, max_length=20),
+    column("c", FIELD_TYPE.LONGLONG),
+]
+
+
+def decimal_bytes(groups, negative=False):
+    """Stored DECIMAL of (digits, size) groups, see decoder.decimal_layout"""
+    data = bytearray(b"".join(struct.pack(">I", digits)[4 - size:] for digits, size in groups))
+    if negative:
+        data = bytearray(byte ^ 0xff for byte in data)
+    data[0] ^= 0x80
+    return bytes(data)
+
+
+class TestDecoderPlan(unittest.TestCase):
+    def test_bitmap(self):
+        bitmap = binlogbuilder.bitmap([True, False, True] + [False] * 6 + [True] * 3)
+        self.assertEqual(BitCount(bitmap), 5)
+        self.assertEqual(BitIndexes(bitmap), (0, 2, 9, 10, 11))
+        self.assertEqual((BitCount(b""), BitIndexes(b"")), (0, ()))
+
+    def test_fixed_width_run(self):
+        plan = DecoderPlan(COLUMNS)
+        self.assertEqual(plan.present(b"\x1f"), (1, (0, 1, 2, 3, 4)))
+        steps, converters = plan.row_layout(b"\x1f", b"\x00")
+        self.assertEqual([names for _, names, _ in steps], [("id", "a", "b"), "name", "c"])
+        self.assertEqual(steps[0][0].format, "<Ihd")
+        self.assertEqual(converters, ())
+
+        data = binlogbuilder.bitmap([False] * 5) + struct.pack("<Ihd", 1, -2, 0.5) + b"\x03abc" + \
+            struct.pack("<q", -3)
+        packet = Packet(data)
+        self.assertEqual(plan.read_row(packet, b"\x1f"), {"id": 1, "a": -2, "b": 0.5, "name": b"abc", "c": -3})
+        self.assertEqual(packet.position, len(data))
+
+    def test_null_in_run(self):
+        plan = DecoderPlan(COLUMNS)
+        steps, _ = plan.row_layout(b"\x1f", b"\x0a")
+        # only the non NULL columns are read, runs go on over NULL columns of any type
+        self.assertEqual([names for _, names, _ in steps], [("id", "b", "c")])
+        data = binlogbuilder.bitmap([False, True, False, True, False]) + struct.pack("<Id", 1, 0.5) + \
+            struct.pack("<q", 3)
+        self.assertEqual(plan.read_row(Packet(data), b"\x1f"), {"id": 1, "a": None, "b": 0.5, "name": None, "c": 3})
+
+    def test_columns_not_present(self):
+        plan = DecoderPlan(COLUMNS)
+        cols_bitmap = binlogbuilder.bitmap([True, False, True, False, True])
+        self.assertEqual(plan.present(cols_bitmap), (1, (0, 2, 4)))
+        steps, _ = plan.row_layout(cols_bitmap, b"\x02")
+        self.assertEqual([names for _, names, _ in steps], [("id", "c")])
+
+        data = binlogbuilder.bitmap([False, True, False]) + struct.pack("<Iq", 1, 3)
+        self.assertEqual(plan.read_row(Packet(data), cols_bitmap), {"id": 1, "a": None, "b": None, "name": None, "c": 3})
+
+    def test_decimal(self):
+        columns = [column("a", FIELD_TYPE.NEWDECIMAL, precision=20, decimals=6),
+                   column("b", FIELD_TYPE.NEWDECIMAL, precision=5, decimals=5),
+                   column("c", FIELD_TYPE.NEWDECIMAL, precision=10, decimals=0)]
+        rows = [
+            (decimal_bytes([(12345, 3), (678901234, 4), (5678, 3)]) + decimal_bytes([(1, 3)]) +
+             decimal_bytes([(1, 1), (0, 4)]),
+             ("12345678901234.005678", "0.00001", "1000000000")),
+            (decimal_bytes([(0, 3), (42, 4), (500000, 3)], True) + decimal_bytes([(99999, 3)], True) +
+             decimal_bytes([(0, 1), (7, 4)], True),
+             ("-42.500000", "-0.99999", "-7")),
+        ]
+        for literal_values in (False, True):
+            plan = DecoderPlan(columns, literal_values)
+            for data, values in rows:
+                data = binlogbuilder.bitmap([False] * 3) + data
+                packet = Packet(data)
+                row = plan.read_row(packet, b"\x07")
+                self.assertEqual(packet.position, len(data))
+                if literal_values:
+                    self.assertEqual(row, dict(zip("abc", map(Literal, values))))
+                else:
+                    self.assertEqual(row, dict(zip("abc", map(decimal.Decimal, values))))
+                    self.assertEqual([str(row[name]) for name in "abc"], list(values))
+
+    def test_plan_cache(self):
+        table = Table([], 1, "test", "test", COLUMNS)
+        self.assertIs(table.decoder_plan, Table([], 1, "test", "test", list(COLUMNS)).decoder_plan)
+        self.assertIsNot(table.decoder_plan, Table([], 2, "test", "test", COLUMNS).decoder_plan)
+        changed = COLUMNS[:-1] + [column("c", FIELD_TYPE.LONGLONG, unsigned=True)]
+        self.assertIsNot(table.decoder_plan, decoder_plan(Table([], 1, "test", "test", changed)))
+        self.assertNotIn("_decoder_plan", table.data)
+        literal = Table([], 1, "test", "test", COLUMNS, literal_values=True)
+        self.assertIsNot(table.decoder_plan, literal.decoder_plan)
+        self.assertEqual(table, literal)
+
+    def test_fixed_width_table(self):
+        columns = [column("id", FIELD_TYPE.LONG), column("a", FIELD_TYPE.DOUBLE),
+                   column("t", FIELD_TYPE.TIMESTAMP2, fsp=0), column("b", FIELD_TYPE.TINY, unsigned=True)]
+        plan = DecoderPlan(columns)
+        (fixed, names, _), = plan.row_layout(b"\x0f", b"\x02")[0]
+        self.assertEqual((fixed.format, names), ("<i4sB", ("id", "t", "b")))
+
+        data = binlogbuilder.bitmap([False, True, False, False]) + struct.pack("<i", 1) + \
+            struct.pack(">i", 1554602400) + struct.pack("<B", 255)
+        packet = Packet(data)
+        row = plan.read_row(packet, b"\x0f")
+        self.assertEqual(row, {"id": 1, "a": None, "t": datetime.datetime.fromtimestamp(1554602400), "b": 255})
+        # same order as the values read column by column
+        self.assertEqual(list(row), list(dict((name, None) for name in ["id", "a", "t", "b"])))
+        self.assertEqual(packet.position, len(data))
+
+        cols_bitmap = binlogbuilder.bitmap([False, True, False, True])
+        data = binlogbuilder.bitmap([False, False]) + struct.pack("<dB", 0.5, 1)
+        self.assertEqual(plan.read_row(Packet(data), cols_bitmap), {"id": None, "a": 0.5, "t": None, "b": 1})
+
+    def test_row_layout_lru(self):
+        plan = DecoderPlan([column("c%d" % i, FIELD_TYPE.TINY) for i in range(8)])
+        size, decoder.MAX_ROW_LAYOUTS = decoder.MAX_ROW_LAYOUTS, 2
+        try:
+            first = plan.row_layout(b"\xff", b"\x01")
+            second = plan.row_layout(b"\xff", b"\x02")
+            self.assertIs(plan.row_layout(b"\xff", b"\x01"), first)
+            # the least recently used one goes
+            plan.row_layout(b"\xff", b"\x03")
+            self.assertIs(plan.row_layout(b"\xff", b"\x01"), first)
+            self.assertIsNot(plan.row_layout(b"\xff", b"\x02"), second)
+        finally:
+            decoder.MAX_ROW_LAYOUTS = size
+
+    @unittest.skipIf(sys.version_info < (3,), "python 2 tracks recency once the cache is full")
+    def test_row_layout_lru_while_filling(self):
+        plan = DecoderPlan([column("c%d" % i, FIELD_TYPE.TINY) for i in range(8)])
+        size, decoder.MAX_ROW_LAYOUTS = decoder.MAX_ROW_LAYOUTS, 3
+        try:
+            first = plan.row_layout(b"\xff", b"\x01")
+            second = plan.row_layout(b"\xff", b"\x02")
+            # a hit before the cache is full counts too
+            self.assertIs(plan.row_layout(b"\xff", b"\x01"), first)
+            plan.row_layout(b"\xff", b"\x03")
+            plan.row_layout(b"\xff", b"\x04")
+            self.assertIs(plan.row_layout(b"\xff", b"\x01"), first)
+            self.assertIsNot(plan.row_layout(b"\xff", b"\x02"), second)
+        finally:
+            decoder.MAX_ROW_LAYOUTS = size
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import struct
+import sys
+
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+from pymysqlreplication.jsonb import decode_text, decode_value
+
+__all__ = ["TestJsonb"]
+
+
+def container(entries, keys=None, large=False):
+    """Body of an object or array of (type, inlined bytes or value bytes) entries"""
+    offset, entry = ("I", 4) if large else ("H", 2)
+    position = 2 * entry + (entry + 2) * len(keys or ()) + (1 + entry) * len(entries)
+    key_entries = b""
+    for key in keys or ():
+        key_entries += struct.pack("<" + offset + "H", position, len(key))
+        position += len(key)
+    value_entries, values = b"", b""
+    for t, data in entries:
+        if t in (0x4, 0x5, 0x6) or large and t in (0x7, 0x8):
+            value_entries += struct.pack("<B", t) + data.ljust(entry, b"\x00")
+        else:
+            value_entries += struct.pack("<B" + offset, t, position)
+            values += data
+            position += len(data)
+    return struct.pack("<" + offset * 2, len(entries), position) + key_entries + value_entries + \
+        b"".join(keys or ()) + values
+
+
+def document(t, body):
+    return struct.pack("<B", t) + body
+
+
+class TestJsonb(unittest.TestCase):
+    def assertDecoded(self, data, value, text):
+        self.assertEqual(decode_value(data, 0, len(data)), value)
+        self.assertEqual(decode_text(data, 0, len(data)), text)
+
+    def test_scalars(self):
+        self.assertDecoded(document(0xc, b"\x03abc"), b"abc", u'"abc"')
+        self.assertDecoded(document(0x4, b"\x01"), True, u"true")
+        self.assertDecoded(document(0x5, struct.pack("<h", -2)), -2, u"-2")
+        self.assertDecoded(document(0xa, struct.pack("<Q", 2 ** 64 - 1)), 2 ** 64 - 1, u"18446744073709551615")
+        self.assertDecoded(document(0xb, struct.pack("<d", 0.1)), 0.1, u"0.1")
+        # length of 7 bits per byte
+        self.assertDecoded(document(0xc, b"\x81\x01" + b"x" * 129), b"x" * 129, u'"%s"' % (u"x" * 129))
+        self.assertIsNone(decode_value(b"", 0, 0))
+        self.assertRaises(ValueError, decode_value, document(0xf, b"\x00"), 0, 2)
+
+    def test_object(self):
+        nested = container([(0x4, b"\x00"), (0xc, b"\x02\xc3\xa9")])
+        body = container([(0x5, struct.pack("<h", -1)), (0x7, struct.pack("<i", 70000)),
+                          (0x2, nested), (0x0, container([]))], keys=[b"a", b"bb", b"c\"", b"d"])
+        data = document(0x0, body)
+        self.assertDecoded(data, {b"a": -1, b"bb": 70000, b'c"': [None, u"é".encode("utf-8")], b"d": {}},
+                           u'{"a": -1, "bb": 70000, "c\\"": [null, "é"], "d": {}}')
+        # values are read at their offsets from the start of the document
+        self.assertEqual(decode_text(b"\xff\xff" + data, 2, len(data)),
+                         u'{"a": -1, "bb": 70000, "c\\"": [null, "é"], "d": {}}')
+
+    def test_large(self):
+        body = container([(0x7, struct.pack("<i", -70000)), (0x6, struct.pack("<H", 65535)), (0x4, b"\x02"),
+                          (0xc, b"\x01x")], large=True)
+        self.assertDecoded(document(0x3, body), [-70000, 65535, False, b"x"], u'[-70000, 65535, false, "x"]')
+
+    def test_length(self):
+        data = document(0x2, container([(0x5, b"\x01\x00")]))
+        self.assertRaises(ValueError, decode_value, data, 0, len(data) - 1)
+
+    def test_deep_nesting(self):
+        depth = sys.getrecursionlimit() * 2
+        body = container([])
+        for _ in range(depth):
+            body = container([(0x2, body)])
+        data = document(0x2, body)
+        self.assertEqual(decode_text(data, 0, len(data)), u"[" * (depth + 1) + u"]" * (depth + 1))
+        value = decode_value(data, 0, len(data))
+        for _ in range(depth):
+            value, = value
+        self.assertEqual(value, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
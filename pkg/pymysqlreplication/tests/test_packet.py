@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import socket
+import struct
+import sys
+
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+from pymysql import connections
+from pymysqlreplication.packet import BinLogPacketWrapper, peek_header, peek_table_id
+from pymysqlreplication.schema import SchemaSnapshot
+
+__all__ = ["TestBinLogPacketWrapper", "TestLargePacket"]
+
+
+class Packet(object):
+    def __init__(self, data, offset=0):
+        self.data = data
+        self.offset = offset
+
+    def get_all_data(self):
+        return self.data
+
+
+def wrapper(body, prefix=b"\x00"):
+    header = struct.pack("<IBIIIH", 1554602400, 0x02, 1, 19 + len(body), 0, 0)
+    packet = Packet(prefix + header + body, len(prefix) - 1)
+    return BinLogPacketWrapper(packet, {}, SchemaSnapshot(), False, frozenset(),
+                               None, None, None, None, False, False)
+
+
+class TestBinLogPacketWrapper(unittest.TestCase):
+    def test_header(self):
+        packet = wrapper(b"", prefix=b"\xfebin")
+        self.assertEqual((packet.timestamp, packet.event_type, packet.event_size), (1554602400, 0x02, 19))
+        self.assertEqual(packet.read_bytes, 0)
+
+    def test_integers(self):
+        body = b"\x01\x02\x03" + b"\xff\xff\xfe" + b"\x01\x02\x03\x04\x05" + b"\x01\x02\x03\x04\x05\x06\x07" + \
+            struct.pack("<q", -2)
+        packet = wrapper(body)
+        self.assertEqual(packet.read_uint24(), 0x030201)
+        self.assertEqual(packet.read_int24_be(), -2)
+        self.assertEqual(packet.read_int40_be(), 0x0102030405)
+        self.assertEqual(packet.read_uint56(), 0x07060504030201)
+        self.assertEqual(packet.read_int64(), -2)
+        self.assertEqual(packet.read_bytes, len(body))
+
+    def test_length_coded_binary(self):
+        body = b"\xfa" + b"\xfb" + b"\xfc\x01\x02" + b"\xfd\x01\x02\x03" + b"\xfe" + struct.pack("<Q", 2 ** 40)
+        packet = wrapper(body)
+        self.assertEqual([packet.read_length_coded_binary() for _ in range(5)],
+                         [250, None, 0x0201, 0x030201, 2 ** 40])
+
+    def test_unread(self):
+        packet = wrapper(b"abcdef")
+        data = packet.read(4)
+        packet.unread(data[2:])
+        self.assertEqual(packet.read_bytes, 2)
+        self.assertEqual(packet.read(4), b"cdef")
+        packet.advance(-3)
+        self.assertEqual(packet.read(1), b"d")
+
+    def test_peek(self):
+        data = b"bin" + struct.pack("<IBIIIH", 1554602400, 0x1e, 1, 40, 1234, 0) + struct.pack("<Q", 2 ** 40 + 5)[:6]
+        self.assertEqual(peek_header(data, 2), (1554602400, 0x1e, 1234))
+        self.assertEqual(peek_table_id(data, 2), 2 ** 40 + 5)
+
+
+
+class TestLargePacket(unittest.TestCase):
+    """Packets of more than MAX_PACKET_LEN bytes, with MAX_PACKET_LEN made small"""
+
+    def setUp(self):
+        self.max_packet_len = connections.MAX_PACKET_LEN
+        connections.MAX_PACKET_LEN = 7
+        self.server, client = socket.socketpair()
+        self.connection = connections.Connection(defer_connect=True)
+        self.connection._sock, self.connection._sock_timeout = client, client.gettimeout()
+        self.connection._rfile = connections._makefile(client, "rb")
+
+    def tearDown(self):
+        connections.MAX_PACKET_LEN = self.max_packet_len
+        self.server.close()
+        self.connection._sock.close()
+
+    def send(self, payload, chunks=None):
+        """Send payload in chunks of MAX_PACKET_LEN bytes up to a shorter one"""
+        starts = list(range(0, len(payload) + 1, 7))
+        for seq, start in enumerate(starts[:chunks]):
+            chunk = payload[start:start + 7]
+            self.server.sendall(struct.pack("<HBB", len(chunk), 0, seq) + chunk)
+
+    def read_packet(self):
+        self.connection._next_seq_id = 0
+        return self.connection._read_packet().get_all_data()
+
+    def test_read_packet(self):
+        for payload in (b"\x00small", b"\x00" * 7, b"\x00" + b"y" * 12, b"\x00large" + b"x" * 30,
+                        b"\x00" + b"z" * 20):
+            self.send(payload)
+            self.assertEqual(self.read_packet(), payload)
+
+    def test_lost_connection(self):
+        self.send(b"\x00" + b"x" * 20, chunks=2)
+        self.server.close()
+        self.assertRaises(connections.err.OperationalError, self.read_packet)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import sys
+import threading
+
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+from pymysqlreplication.prefetch import PacketPrefetcher
+
+__all__ = ["TestPacketPrefetcher"]
+
+
+class Packet(object):
+    def __init__(self, number, eof=False):
+        self.number = number
+        self.eof = eof
+
+    def is_eof_packet(self):
+        return self.eof
+
+
+class TestPacketPrefetcher(unittest.TestCase):
+    def test_order(self):
+        packets = iter([Packet(i) for i in range(100)] + [Packet(100, eof=True)])
+        prefetcher = PacketPrefetcher(lambda: next(packets), 4)
+        self.assertEqual([prefetcher.get().number for _ in range(101)], list(range(101)))
+        prefetcher.stop(1)
+        self.assertEqual(prefetcher.stats.items, 101)
+
+    def test_error(self):
+        def read():
+            if not packets:
+                raise IOError("lost connection")
+            return packets.pop(0)
+        packets = [Packet(0), Packet(1)]
+        prefetcher = PacketPrefetcher(read, 4)
+        self.assertEqual(prefetcher.get().number, 0)
+        self.assertEqual(prefetcher.get().number, 1)
+        self.assertRaises(IOError, prefetcher.get)
+
+    def test_backpressure(self):
+        read = threading.Semaphore(0)
+        count = [0]
+
+        def packet():
+            count[0] += 1
+            read.release()
+            return Packet(count[0])
+        prefetcher = PacketPrefetcher(packet, 2)
+        # two packets queued and a third one waiting for room
+        for _ in range(3):
+            read.acquire()
+        self.assertEqual(prefetcher.get().number, 1)
+        read.acquire()
+        self.assertEqual(count[0], 4)
+        prefetcher.stop(1)
+        self.assertFalse(prefetcher._thread.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import sys
+import tempfile
+
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+from pymysqlreplication.binlogfile import BinLogFileReader
+from pymysqlreplication.schema import SchemaCache, SchemaSnapshot, ddl_tables, fetch_columns
+from pymysqlreplication.tests import binlogbuilder
+from pymysqlreplication.tests.test_binlogfile import COLUMNS
+
+__all__ = ["TestSchemaCache"]
+
+
+class Cursor(object):
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, query, args):
+        self.query, self.args = query, args
+
+    def fetchall(self):
+        return [dict(row) for row in self.rows]
+
+
+class TestSchemaCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "schema.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_ddl_tables(self):
+        self.assertEqual(ddl_tables("BEGIN", "db"), [])
+        self.assertEqual(ddl_tables("ALTER TABLE t ADD c INT", "db"), [("db", "t")])
+        self.assertEqual(ddl_tables("/* app */ alter online ignore table `d``b`.`t 1` drop c", "db"),
+                         [("d`b", "t 1")])
+        self.assertEqual(ddl_tables("CREATE TABLE IF NOT EXISTS t (id INT)", "db"), [("db", "t")])
+        self.assertEqual(ddl_tables("DROP TABLE IF EXISTS `t1`, db2.t2 /* generated by server */", "db"),
+                         [("db", "t1"), ("db2", "t2")])
+        self.assertEqual(ddl_tables("RENAME TABLE a TO b, db2.c TO `to`", "db"),
+                         [("db", "a"), ("db", "b"), ("db2", "c"), ("db", "to")])
+        self.assertEqual(ddl_tables("CREATE UNIQUE INDEX idx USING BTREE ON t (c)", "db"), [("db", "t")])
+        self.assertEqual(ddl_tables("DROP DATABASE IF EXISTS `db2`", "db"), [("db2", None)])
+        self.assertEqual(ddl_tables("CREATE VIEW v AS SELECT * FROM t", "db"), [])
+        self.assertEqual(ddl_tables("TRUNCATE TABLE t", "db"), [])
+        self.assertIsNone(ddl_tables("DROP TABLE /* t1 */ t2", "db"))
+
+    def test_save_and_load(self):
+        cache = SchemaCache(self.path)
+        self.assertIsNone(cache.get("test", "test", b"\x03\x0f"))
+        cache.put("test", "test", b"\x03\x0f", COLUMNS)
+        cache.save()
+        cache = SchemaCache(self.path)
+        self.assertEqual(cache.get("test", "test", b"\x03\x0f"), COLUMNS)
+        self.assertIsNone(cache.get("test", "test", b"\x03\x03"))
+
+    def test_invalidate(self):
+        cache = SchemaCache(self.path)
+        for table in ("a", "b"):
+            cache.put("test", table, b"\x03", COLUMNS)
+        cache.put("other", "a", b"\x03", COLUMNS)
+        cache.invalidate_query(u"ALTER TABLE A ADD c INT", b"TEST")
+        self.assertIsNone(cache.get("test", "a", b"\x03"))
+        self.assertIsNotNone(cache.get("test", "b", b"\x03"))
+        self.assertTrue(cache.invalidated)
+        cache.save()
+        self.assertFalse(cache.invalidated)
+        self.assertEqual(sorted(SchemaCache(self.path).tables["test"]), ["b"])
+        cache.invalidate_query(u"DROP DATABASE test", b"other")
+        self.assertEqual(list(cache.tables), ["other"])
+        cache.invalidate()
+        cache.save()
+        self.assertEqual(SchemaCache(self.path).tables, {})
+
+    def test_shared_file(self):
+        cache = SchemaCache(self.path)
+        for table in ("a", "b"):
+            cache.put("test", table, b"\x03", COLUMNS)
+        cache.save()
+        # two workers start from the same file
+        first, second = SchemaCache(self.path), SchemaCache(self.path)
+        first.put("test", "c", b"\x03", COLUMNS)
+        first.invalidate("test", "a")
+        first.save()
+        second.put("test", "d", b"\x03", COLUMNS)
+        second.save()
+        # the puts of both are kept, "a" invalidated by the first is not saved again by the second
+        self.assertEqual(sorted(SchemaCache(self.path).tables["test"]), ["b", "c", "d"])
+        second.put("test", "a", b"\x04", COLUMNS)
+        first.invalidate("test", "a")
+        second.save()
+        first.save()
+        self.assertEqual(sorted(SchemaCache(self.path).tables["test"]), ["b", "c", "d"])
+
+    def test_fetch_columns(self):
+        rows = [dict(column, TABLE_SCHEMA="test", TABLE_NAME="test") for column in COLUMNS]
+        cursor = Cursor(rows + [dict(COLUMNS[0], TABLE_SCHEMA="test", TABLE_NAME="other")])
+        self.assertEqual(fetch_columns(cursor, ["test"], ["test", "other"]),
+                         {"test": {"test": COLUMNS, "other": COLUMNS[:1]}})
+        self.assertIn("AND TABLE_SCHEMA IN (%s) AND TABLE_NAME IN (%s, %s)", cursor.query)
+        self.assertEqual(cursor.args, ["test", "test", "other"])
+        self.assertEqual(fetch_columns(Cursor(rows), None, []), {})
+
+    def test_prefetch(self):
+        cache = SchemaCache(self.path)
+        cache.prefetch({"test": {"test": COLUMNS}})
+        self.assertEqual(cache.get("test", "test", b"\x03"), COLUMNS)
+        self.assertEqual(cache.get("test", "test", b"\x04"), COLUMNS)
+        cache.save()
+        self.assertEqual(sorted(SchemaCache(self.path).tables["test"]["test"]), ["03", "04"])
+        cache.invalidate_query(u"ALTER TABLE test ADD c INT", b"test")
+        self.assertIsNone(cache.get("test", "test", b"\x03"))
+
+    def test_invalidate_from_binlog(self):
+        cache = SchemaCache()
+        cache.put("test", "test", b"\x03", COLUMNS)
+        cache.put("test", "other", b"\x03", COLUMNS)
+        builder = binlogbuilder.BinLogBuilder()
+        builder.add_query("ALTER TABLE test ADD c INT", "test")
+        path = os.path.join(self.tmp_dir, "mysql-bin.000001")
+        builder.write(path)
+
+        stream = BinLogFileReader(path, schema_snapshot=SchemaSnapshot(), only_events=[], schema_cache=cache)
+        self.assertEqual(list(stream), [])
+        self.assertEqual(list(cache.tables["test"]), ["other"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import datetime
+import struct
+import sys
+
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+from pymysqlreplication.decoder import Literal
+from pymysqlreplication.temporal import datetime2_reader, month_days, time2_reader, timestamp2_reader
+
+__all__ = ["TestTemporal"]
+
+
+class Packet(object):
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+
+    def unpack(self, fixed):
+        values = fixed.unpack_from(self.data, self.position)
+        self.position += fixed.size
+        return values
+
+
+def datetime2(year, month, day, hour, minute, second, fraction=b""):
+    value = 1 << 39 | (year * 13 + month) << 22 | day << 17 | hour << 12 | minute << 6 | second
+    return struct.pack(">Q", value)[3:] + fraction
+
+
+def read(reader, data):
+    packet = Packet(data)
+    value = reader(packet)
+    assert packet.position == len(data)
+    return value
+
+
+class TestTemporal(unittest.TestCase):
+    def test_datetime2(self):
+        self.assertEqual(read(datetime2_reader(0), datetime2(2019, 4, 7, 10, 30, 15)),
+                         datetime.datetime(2019, 4, 7, 10, 30, 15))
+        self.assertEqual(read(datetime2_reader(3), datetime2(2019, 4, 7, 10, 30, 15, struct.pack(">h", 1230))),
+                         datetime.datetime(2019, 4, 7, 10, 30, 15, 123000))
+        self.assertEqual(read(datetime2_reader(5), datetime2(2019, 4, 7, 10, 30, 15, struct.pack(">i", 123450)[1:])),
+                         datetime.datetime(2019, 4, 7, 10, 30, 15, 123450))
+        self.assertIsNone(read(datetime2_reader(0), datetime2(0, 0, 0, 0, 0, 0)))
+        self.assertIsNone(read(datetime2_reader(2), datetime2(2019, 2, 29, 0, 0, 0, b"\x01")))
+
+    def test_datetime2_literal(self):
+        reader = datetime2_reader(6, Literal)
+        self.assertEqual(read(reader, datetime2(987, 4, 7, 1, 2, 3, struct.pack(">i", 45)[1:])),
+                         Literal("'0987-04-07 01:02:03.000045'"))
+        self.assertEqual(read(reader, datetime2(2020, 2, 29, 23, 59, 59, b"\x00\x00\x00")),
+                         Literal("'2020-02-29 23:59:59'"))
+        self.assertIsNone(read(reader, datetime2(2019, 2, 29, 0, 0, 0, b"\x00\x00\x00")))
+        self.assertIsNone(read(reader, datetime2(2019, 4, 7, 24, 0, 0, b"\x00\x00\x00")))
+        self.assertEqual([month_days(2019 * 13 + month) for month in (0, 2, 12)], [0, 28, 31])
+
+    def test_time2(self):
+        value = 12 << 12 | 34 << 6 | 56
+        self.assertEqual(read(time2_reader(0), struct.pack(">I", 0x800000 | value)[1:]),
+                         datetime.timedelta(hours=12, minutes=34, seconds=56))
+        self.assertEqual(read(time2_reader(1), struct.pack(">I", 0x800000 | value)[1:] + b"\x32"),
+                         datetime.timedelta(hours=12, minutes=34, seconds=56, microseconds=500000))
+
+    def test_timestamp2(self):
+        self.assertEqual(read(timestamp2_reader(4), struct.pack(">ih", 1554602400, 1234)),
+                         datetime.datetime.fromtimestamp(1554602400).replace(microsecond=123400))
+
+
+if __name__ == "__main__":
+    unittest.main()
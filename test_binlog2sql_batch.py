@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import datetime
+import unittest
+
+sys.path.append("..")
+from binlog2sql_batch import InsertBatch
+
+HEAD = 'INSERT INTO `test`.`tbl`(`id`, `data`) VALUES '
+OTHER = 'INSERT INTO `test`.`other`(`id`) VALUES '
+TIMESTAMP = 1554602400
+TIME = datetime.datetime.fromtimestamp(TIMESTAMP)
+
+
+class Lines(list):
+    write = list.append
+
+
+class TestInsertBatch(unittest.TestCase):
+
+    def test_merge(self):
+        lines = Lines()
+        batch = InsertBatch(lines, 3)
+        for i in range(4):
+            batch.add(HEAD, "(%d, 'x')" % i, 4, 100 + i, TIMESTAMP)
+        batch.add(OTHER, '(9)', 4, 200, TIMESTAMP)
+        batch.write('DELETE FROM `test`.`tbl` WHERE `id`=1 LIMIT 1;')
+        batch.flush()
+        self.assertEqual(lines, [
+            HEAD + "(0, 'x'), (1, 'x'), (2, 'x'); #start 4 end 102 time %s rows 3" % TIME,
+            HEAD + "(3, 'x'); #start 4 end 103 time %s" % TIME,
+            OTHER + '(9); #start 4 end 200 time %s' % TIME,
+            'DELETE FROM `test`.`tbl` WHERE `id`=1 LIMIT 1;',
+        ])
+
+    def test_max_length(self):
+        lines = Lines()
+        batch = InsertBatch(lines, 100, max_length=len(HEAD) + len("(0, 'x'), (1, 'x');"))
+        for i in range(3):
+            batch.add(HEAD, "(%d, 'x')" % i, 4, 100 + i, TIMESTAMP)
+        batch.flush()
+        self.assertEqual([line.split(';')[0] for line in lines], [HEAD + "(0, 'x'), (1, 'x')", HEAD + "(2, 'x')"])
+
+    def test_reverse(self):
+        lines = Lines()
+        batch = InsertBatch(lines, 10, reverse=True)
+        for i in range(3):
+            batch.add(HEAD, "(%d, 'x')" % i, 4, 100 + i, TIMESTAMP)
+        batch.flush()
+        batch.flush()
+        self.assertEqual(lines, [HEAD + "(2, 'x'), (1, 'x'), (0, 'x'); #start 4 end 102 time %s rows 3" % TIME])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import shutil
+import tempfile
+import functools
+import unittest
+
+sys.path.append("..")
+from binlog2sql_checkpoint import Checkpoint
+from binlog2sql_output import OutputSink, SinkWriter
+
+SID = '3e11fa47-71ca-11e1-9e33-c80aa9429562'
+OTHER_SID = '19d69c1e-ae97-4b8c-a1ef-9e12ba966457'
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'checkpoint.json')
+        self.output_file = os.path.join(self.tmp_dir, 'out.sql')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_save_load(self):
+        checkpoint = Checkpoint(self.path)
+        self.assertIsNone(checkpoint.log_file)
+        for gtid in (SID + ':1', SID + ':2', OTHER_SID + ':7'):
+            checkpoint.begin(gtid)
+            state = checkpoint.end('mysql-bin.000003', 1234)
+        # a DDL without GtidEvent keeps the set
+        self.assertEqual(checkpoint.end('mysql-bin.000003', 1300)['gtid_set'], state['gtid_set'])
+        checkpoint.save(state, self.output_file, 42)
+
+        checkpoint = Checkpoint(self.path)
+        self.assertEqual((checkpoint.log_file, checkpoint.log_pos), ('mysql-bin.000003', 1234))
+        self.assertEqual(str(checkpoint.gtid_set), '%s:1-2,%s:7' % (SID, OTHER_SID))
+        self.assertEqual((checkpoint.output_file, checkpoint.output_offset), (self.output_file, 42))
+        self.assertEqual(os.listdir(self.tmp_dir), ['checkpoint.json'])
+        self.assertIsNone(Checkpoint(self.path, load=False).log_file)
+
+    def test_start_gtid_set(self):
+        checkpoint = Checkpoint(self.path, load=False, gtid_set=SID + ':1-5')
+        checkpoint.begin(SID + ':6')
+        checkpoint.save(checkpoint.end('mysql-bin.000003', 1234))
+        self.assertEqual(str(Checkpoint(self.path).gtid_set), SID + ':1-6')
+        # a loaded checkpoint keeps its own set
+        self.assertEqual(str(Checkpoint(self.path, gtid_set=OTHER_SID + ':1').gtid_set), SID + ':1-6')
+
+    def test_rewind(self):
+        with open(self.output_file, 'w') as f:
+            f.write('SELECT 1;\nSELECT 2;\n')
+        checkpoint = Checkpoint(self.path)
+        checkpoint.save(checkpoint.end('mysql-bin.000001', 4), self.output_file, len('SELECT 1;\n'))
+        self.assertFalse(checkpoint.rewind(os.path.join(self.tmp_dir, 'other.sql')))
+
+        self.assertTrue(Checkpoint(self.path).rewind(self.output_file))
+        with open(self.output_file) as f:
+            self.assertEqual(f.read(), 'SELECT 1;\n')
+
+    def commit(self, sink):
+        checkpoint = Checkpoint(self.path)
+        sink.write('SELECT 1;')
+        sink.write("INSERT INTO `t` VALUES ('中');")
+        sink.mark(functools.partial(checkpoint.save, checkpoint.end('mysql-bin.000001', 100)))
+        sink.write('DELETE FROM `t`;')
+        sink.commit()
+        sink.close()
+        checkpoint = Checkpoint(self.path)
+        self.assertEqual(checkpoint.log_pos, 100)
+        with open(self.output_file, 'rb') as f:
+            self.assertEqual(f.read()[:checkpoint.output_offset].decode('utf-8'),
+                             u"SELECT 1;\nINSERT INTO `t` VALUES ('中');\n")
+
+    def test_commit(self):
+        self.commit(OutputSink(self.output_file, stdout=False, flush_interval=None))
+
+    def test_commit_writer(self):
+        self.commit(SinkWriter(OutputSink(self.output_file, stdout=False, flush_interval=None), 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
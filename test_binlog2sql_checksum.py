@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import struct
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+sys.path.append("..")
+from pkg.pymysqlreplication.schema import SchemaSnapshot
+
+# the tests package of pymysqlreplication imports it by its own name, load the builder alone
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pkg', 'pymysqlreplication', 'tests'))
+import binlogbuilder
+
+BINLOG2SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'binlog2sql.py')
+# binlog2sql.py logs to this directory
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
+COLUMNS = [
+    {"COLUMN_NAME": "id", "COLLATION_NAME": None, "CHARACTER_SET_NAME": None,
+     "COLUMN_COMMENT": "", "COLUMN_TYPE": "int(11)", "COLUMN_KEY": "PRI", "ORDINAL_POSITION": 1},
+    {"COLUMN_NAME": "data", "COLLATION_NAME": "utf8_general_ci", "CHARACTER_SET_NAME": "utf8",
+     "COLUMN_COMMENT": "", "COLUMN_TYPE": "varchar(50)", "COLUMN_KEY": "", "ORDINAL_POSITION": 2},
+]
+
+
+class TestChecksum(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.log_dir = None
+        if not os.path.isdir(LOG_DIR):
+            os.mkdir(LOG_DIR)
+            self.log_dir = LOG_DIR
+        self.binlog_dir = os.path.join(self.tmp_dir, 'binlog')
+        os.mkdir(self.binlog_dir)
+        self.snapshot = os.path.join(self.tmp_dir, 'schema.json')
+        SchemaSnapshot({'test': {'test': COLUMNS}}).save(self.snapshot)
+        for n in (1, 2):
+            builder = binlogbuilder.BinLogBuilder()
+            builder.add_query('BEGIN', 'test')
+            builder.add_table_map(n, 'test', 'test', [3, 15], struct.pack('<H', 150))
+            data = b'hello'
+            rows_pos = builder.add_rows(binlogbuilder.WRITE_ROWS_EVENT_V2, n, 2, [
+                binlogbuilder.bitmap([False, False]) + struct.pack('<iB', n, len(data)) + data])
+            builder.add_xid(n)
+            if n == 1:
+                builder.add_rotate('mysql-bin.000002')
+            path = os.path.join(self.binlog_dir, 'mysql-bin.%06d' % n)
+            builder.write(path)
+        # 'hello' -> 'hellX' in the rows event of the second file, before its 4 bytes CRC32 left as it was
+        rows_end = builder.positions[builder.positions.index(rows_pos) + 1]
+        with open(path, 'r+b') as f:
+            f.seek(rows_end - 4 - 1)
+            f.write(b'X')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        if self.log_dir:
+            shutil.rmtree(self.log_dir)
+
+    def run_binlog2sql(self, *args):
+        process = subprocess.Popen([sys.executable, BINLOG2SQL, '--binlog-path', self.binlog_dir,
+                                    '--schema-snapshot', self.snapshot] + list(args),
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout, stderr = process.communicate()
+        return process.returncode, stdout.decode('utf-8'), stderr.decode('utf-8')
+
+    def test_corrupted_event(self):
+        for args in ([], ['--parallel', '2']):
+            returncode, stdout, stderr = self.run_binlog2sql(*args)
+            self.assertNotEqual(returncode, 0)
+            self.assertIn('BinLogChecksumError: Binlog checksum mismatch in mysql-bin.000002', stderr)
+            self.assertNotIn('hellX', stdout)
+
+    def test_no_verify_checksum(self):
+        returncode, stdout, stderr = self.run_binlog2sql('--no-verify-checksum')
+        self.assertEqual(returncode, 0, stderr)
+        self.assertIn("'hellX'", stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import subprocess
+import unittest
+
+sys.path.append("..")
+from binlog2sql_flashback import FlashbackBuffer
+
+# write `count` statements through a FlashbackBuffer, read them back, print peak rss in KB
+PEAK_RSS_SCRIPT = """
+import sys, resource
+from binlog2sql_flashback import FlashbackBuffer
+if sys.version_info[0] < 3:
+    range = xrange
+count = int(sys.argv[1])
+sql = "DELETE FROM `test`.`tbl` WHERE `id`=%d AND `data`='" + "x" * 100 + "' LIMIT 1;"
+with FlashbackBuffer(memory_limit=1024 * 1024) as buf:
+    for i in range(count):
+        buf.write(sql % i)
+    last = count
+    for line in buf:
+        last -= 1
+        assert line == sql % last
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+class TestFlashbackBuffer(unittest.TestCase):
+
+    def test_reverse_in_memory(self):
+        with FlashbackBuffer() as buf:
+            for i in range(3):
+                buf.write('SELECT %d;' % i)
+            self.assertEqual(list(buf), ['SELECT 2;', 'SELECT 1;', 'SELECT 0;'])
+            self.assertEqual(buf.chunks, [])
+
+    def test_reverse_with_chunks(self):
+        with FlashbackBuffer(memory_limit=25) as buf:
+            for i in range(10):
+                buf.write('SELECT %d;' % i)
+            self.assertEqual(len(buf.chunks), 3)
+            chunks = list(buf.chunks)
+            self.assertEqual(list(buf), ['SELECT %d;' % i for i in range(9, -1, -1)])
+            self.assertFalse([chunk for chunk in chunks if os.path.exists(chunk)])
+
+    def test_unicode(self):
+        with FlashbackBuffer(memory_limit=1) as buf:
+            buf.write(u"INSERT INTO `t`(`a`) VALUES ('你好');")
+            self.assertEqual([line if isinstance(line, type(u'')) else line.decode('utf-8') for line in buf],
+                             [u"INSERT INTO `t`(`a`) VALUES ('你好');"])
+
+    def peak_rss(self, count):
+        cwd = os.path.dirname(os.path.abspath(__file__))
+        output = subprocess.check_output([sys.executable, '-c', PEAK_RSS_SCRIPT, str(count)], cwd=cwd)
+        return int(output.strip())
+
+    def test_peak_rss_is_flat(self):
+        # ~15M and ~150M of undo sql with a 1M memory limit
+        small, large = self.peak_rss(100000), self.peak_rss(1000000)
+        self.assertLess(large - small, 8 * 1024, 'peak rss %dKB -> %dKB' % (small, large))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.append("..")
+from binlog2sql_output import OutputSink, SinkWriter
+
+
+class TestOutputSink(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.output_file = os.path.join(self.tmp_dir, 'out.sql')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def read_output(self):
+        with open(self.output_file) as f:
+            return f.read()
+
+    def test_flush_by_size(self):
+        sink = OutputSink(self.output_file, stdout=False, buffer_size=16, flush_interval=None)
+        sink.write('SELECT 1;')
+        self.assertEqual(self.read_output(), '')
+        sink.write('SELECT 2;')
+        self.assertEqual(self.read_output(), 'SELECT 1;\nSELECT 2;\n')
+        sink.close()
+
+    def test_close_flushes_and_appends(self):
+        with open(self.output_file, 'w') as f:
+            f.write('# old\n')
+        with OutputSink(self.output_file, stdout=False, flush_interval=None) as sink:
+            sink.write('SELECT 1;')
+        self.assertEqual(self.read_output(), '# old\nSELECT 1;\n')
+
+    def test_sync(self):
+        sink = OutputSink(self.output_file, stdout=False, flush_interval=None, fsync=True)
+        sink.write('SELECT 1;')
+        sink.sync()
+        self.assertEqual(self.read_output(), 'SELECT 1;\n')
+        sink.close()
+
+
+class TestSinkWriter(unittest.TestCase):
+
+    class Sink(object):
+        def __init__(self):
+            self.lines, self.flushed, self.closed = [], 0, False
+
+        def write(self, line):
+            if line == 'fail':
+                raise IOError('disk full')
+            self.lines.append(line)
+
+        def flush(self):
+            self.flushed = len(self.lines)
+
+        def close(self):
+            self.closed = True
+
+    def test_order(self):
+        sink = self.Sink()
+        with SinkWriter(sink, 2) as writer:
+            for i in range(1000):
+                writer.write('SELECT %d;' % i)
+            writer.flush()
+            writer.write('SELECT 1000;')
+        self.assertEqual(sink.lines, ['SELECT %d;' % i for i in range(1001)])
+        self.assertEqual(sink.flushed, 1000)
+        self.assertTrue(sink.closed)
+        self.assertEqual(writer.stats.items, 1001)
+
+    def test_error(self):
+        sink = self.Sink()
+        writer = SinkWriter(sink, 1)
+        writer.write('fail')
+        writer.flush()
+        self.assertRaises(IOError, writer.close)
+        self.assertTrue(sink.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
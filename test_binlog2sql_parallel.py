@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import struct
+import shutil
+import logging
+import tempfile
+import unittest
+
+sys.path.append("..")
+from binlog2sql import Binlog2sql
+from binlog2sql_output import OutputSink
+from pkg.pymysqlreplication.schema import SchemaSnapshot
+
+# the tests package of pymysqlreplication imports it by its own name, load the builder alone
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pkg', 'pymysqlreplication', 'tests'))
+import binlogbuilder
+
+COLUMNS = [
+    {"COLUMN_NAME": "id", "COLLATION_NAME": None, "CHARACTER_SET_NAME": None,
+     "COLUMN_COMMENT": "", "COLUMN_TYPE": "int(11)", "COLUMN_KEY": "PRI", "ORDINAL_POSITION": 1},
+    {"COLUMN_NAME": "data", "COLLATION_NAME": "utf8_general_ci", "CHARACTER_SET_NAME": "utf8",
+     "COLUMN_COMMENT": "", "COLUMN_TYPE": "varchar(50)", "COLUMN_KEY": "", "ORDINAL_POSITION": 2},
+]
+FILES = 6
+
+
+def row(id, data):
+    data = data.encode('utf-8')
+    return binlogbuilder.bitmap([False, False]) + struct.pack('<iB', id, len(data)) + data
+
+
+class TestParallel(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.binlog_dir = os.path.join(self.tmp_dir, 'binlog')
+        os.mkdir(self.binlog_dir)
+        self.snapshot = os.path.join(self.tmp_dir, 'schema.json')
+        SchemaSnapshot({'test': {'test': COLUMNS}}).save(self.snapshot)
+        for n in range(1, FILES + 1):
+            self.write_binlog(n)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_binlog(self, n):
+        """Inserts, an update and a delete in binlog file n, which rotates to file n + 1"""
+        builder = binlogbuilder.BinLogBuilder(timestamp=1554602400 + n * 60)
+        table_id = 100 + n
+        first_id = n * 10
+        for xid, (event_type, rows) in enumerate([
+                (binlogbuilder.WRITE_ROWS_EVENT_V2, [row(first_id + i, u'row %d' % i) for i in range(3)]),
+                (binlogbuilder.WRITE_ROWS_EVENT_V2, [row(first_id + 3, u"it's 中文")]),
+                (binlogbuilder.UPDATE_ROWS_EVENT_V2, [row(first_id, u'row 0'), row(first_id, u'updated')]),
+                (binlogbuilder.DELETE_ROWS_EVENT_V2, [row(first_id + 1, u'row 1')])]):
+            builder.add_query('BEGIN', 'test')
+            builder.add_table_map(table_id, 'test', 'test', [3, 15], struct.pack('<H', 150))
+            builder.add_rows(event_type, table_id, 2, rows)
+            builder.add_xid(n * 100 + xid)
+        if n < FILES:
+            builder.add_rotate('mysql-bin.%06d' % (n + 1))
+        builder.write(os.path.join(self.binlog_dir, 'mysql-bin.%06d' % n))
+
+    def run_binlog2sql(self, parallel, **kwargs):
+        output_file = os.path.join(self.tmp_dir, 'out-%d.sql' % parallel)
+        binlog2sql = Binlog2sql({'host': '127.0.0.1', 'port': 3306, 'user': 'root', 'passwd': ''},
+                                binlog_path=self.binlog_dir, schema_snapshot=self.snapshot, parallel=parallel,
+                                logger=logging.getLogger('binlog2sql'), **kwargs)
+        binlog2sql.process_binlog(sink=OutputSink(output_file, stdout=False, flush_interval=None))
+        with open(output_file, 'rb') as f:
+            sql = f.read()
+        os.remove(output_file)
+        return sql
+
+    def assert_same_output(self, lines_per_file=6, **kwargs):
+        serial = self.run_binlog2sql(1, **kwargs)
+        self.assertEqual(serial.count(b'\n'), FILES * lines_per_file)
+        self.assertEqual(self.run_binlog2sql(3, **kwargs), serial)
+
+    def test_parallel(self):
+        self.assert_same_output()
+
+    def test_flashback(self):
+        self.assert_same_output(flashback=True, only_dml=True)
+
+    def test_batch_insert(self):
+        # the 3 rows inserted at once go into one statement
+        self.assert_same_output(lines_per_file=4, batch_insert=100)
+
+    def test_pipeline(self):
+        self.assert_same_output(pipeline=2)
+
+    def test_flashback_batch_insert_pipeline(self):
+        self.assert_same_output(flashback=True, only_dml=True, batch_insert=100, pipeline=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
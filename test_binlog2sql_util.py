@@ -7,6 +7,9 @@ import mock
 
 sys.path.append("..")
 from binlog2sql_util import *
+from decimal import Decimal
+from collections import OrderedDict
+from pkg.pymysqlreplication.column import Column
 
 
 class TestBinlog2sqlUtil(unittest.TestCase):
@@ -93,6 +96,69 @@ class TestBinlog2sqlUtil(unittest.TestCase):
                                    'template': 'UPDATE `test`.`tbl` SET `data`=%s, `id`=%s WHERE `data`=%s AND'
                                                ' `id`=%s LIMIT 1;'})
 
+    def test_generate_row_sql(self):
+        columns = [Column(name='id', type=FIELD_TYPE.LONG), Column(name='data', type=FIELD_TYPE.VARCHAR),
+                   Column(name='amount', type=FIELD_TYPE.NEWDECIMAL), Column(name='t', type=FIELD_TYPE.DATETIME2)]
+        table = mock.Mock(decoder_plan=object())
+        row = OrderedDict([('id', 1), ('data', "it's"), ('amount', Decimal('3.14')), ('t', None)])
+        values = "(1, 'it\\'s', 3.14, NULL)"
+        where = "`id`=1 AND `data`='it\\'s' AND `amount`=3.14 AND `t` IS NULL"
+        cursor = OfflineCursor()
+        for event_class in (WriteRowsEvent, DeleteRowsEvent, UpdateRowsEvent):
+            event = mock.create_autospec(event_class)
+            event.schema, event.table, event.table_id, event.table_map = 'test', 'tbl', 1, {1: table}
+            event.columns, event.primary_key = columns, 'id'
+            if event_class is UpdateRowsEvent:
+                update = {'before_values': OrderedDict(row), 'after_values': OrderedDict(row)}
+                update['after_values']['t'] = Literal("'2019-04-07 10:00:00'")
+                self.assertEqual(generate_row_sql(cursor, event, update),
+                                 "UPDATE `test`.`tbl` SET `id`=1, `data`='it\\'s', `amount`=3.14, "
+                                 "`t`='2019-04-07 10:00:00' WHERE %s LIMIT 1;" % where)
+                continue
+            for flashback in (False, True):
+                sql = generate_row_sql(cursor, event, {'values': OrderedDict(row)}, flashback=flashback)
+                pattern = generate_sql_pattern(event, row={'values': OrderedDict(row)}, flashback=flashback)
+                self.assertEqual(sql, cursor.mogrify(pattern['template'], pattern['values']))
+                if (event_class is WriteRowsEvent) != flashback:
+                    self.assertEqual(sql, 'INSERT INTO `test`.`tbl`(`id`, `data`, `amount`, `t`) VALUES %s;' % values)
+                else:
+                    self.assertEqual(sql, 'DELETE FROM `test`.`tbl` WHERE %s LIMIT 1;' % where)
+
+    def test_generate_row_sql_where_pk(self):
+        columns = [Column(name='a', type=FIELD_TYPE.LONG), Column(name='b', type=FIELD_TYPE.VARCHAR),
+                   Column(name='u', type=FIELD_TYPE.VARCHAR, is_unique=True), Column(name='c', type=FIELD_TYPE.LONG)]
+        row = OrderedDict([('a', 1), ('b', 'x'), ('u', 'y'), ('c', None)])
+        cursor = OfflineCursor()
+
+        def rows_event(event_class, primary_key, columns=columns):
+            event = mock.create_autospec(event_class)
+            event.schema, event.table, event.table_id = 'test', 'tbl', 1
+            event.table_map = {1: mock.Mock(decoder_plan=object())}
+            event.columns, event.primary_key = columns, primary_key
+            return event
+
+        for primary_key, where in ((('a', 'b'), "`a`=1 AND `b`='x'"), ('a', '`a`=1'), ('', "`u`='y'")):
+            self.assertEqual(generate_row_sql(cursor, rows_event(DeleteRowsEvent, primary_key),
+                                              {'values': OrderedDict(row)}, where='pk'),
+                             'DELETE FROM `test`.`tbl` WHERE %s LIMIT 1;' % where)
+            self.assertEqual(generate_row_sql(cursor, rows_event(WriteRowsEvent, primary_key),
+                                              {'values': OrderedDict(row)}, flashback=True, where='pk'),
+                             'DELETE FROM `test`.`tbl` WHERE %s LIMIT 1;' % where)
+            update = {'before_values': OrderedDict(row), 'after_values': OrderedDict(row)}
+            update['after_values']['c'] = 2
+            event = rows_event(UpdateRowsEvent, primary_key)
+            self.assertEqual(generate_row_sql(cursor, event, update, where='pk'),
+                             "UPDATE `test`.`tbl` SET `a`=1, `b`='x', `u`='y', `c`=2 WHERE %s LIMIT 1;" % where)
+            self.assertEqual(generate_row_sql(cursor, event, update, flashback=True, where='pk'),
+                             "UPDATE `test`.`tbl` SET `a`=1, `b`='x', `u`='y', `c`=NULL WHERE %s LIMIT 1;" % where)
+
+        # without a key, or with a NULL unique key, every column is compared
+        row['u'] = None
+        not_unique = columns[:2] + [Column(name='u', type=FIELD_TYPE.VARCHAR)] + columns[3:]
+        for event in (rows_event(DeleteRowsEvent, ''), rows_event(DeleteRowsEvent, '', not_unique)):
+            self.assertEqual(generate_row_sql(cursor, event, {'values': OrderedDict(row)}, where='pk'),
+                             "DELETE FROM `test`.`tbl` WHERE `a`=1 AND `b`='x' AND `u` IS NULL AND `c` IS NULL "
+                             "LIMIT 1;")
 
 if __name__ == '__main__':
     unittest.main()